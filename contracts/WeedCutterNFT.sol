@@ -75,6 +75,17 @@ contract WeedCutterNFT is IERC721 {
     uint256 private nextWeaponId = 1;
     address public owner;
 
+    // 在售武器ID集合（分页查询用，避免遍历所有铸造过的武器）
+    uint256[] private saleWeaponIds;
+    mapping(uint256 => uint256) private saleWeaponIndex;  // 武器ID => 下标+1，0 表示未在售
+
+    // 分页查询单次返回的最大条数，保证 eth_call 不超出节点 gas 上限
+    uint256 public constant MAX_PAGE_SIZE = 100;
+    // 批量开箱单笔交易最多开启的箱子数，保证不超出区块 gas 上限
+    uint256 public constant MAX_OPEN_BATCH = 20;
+    // 批量结算分数单笔交易最多包含的玩家数
+    uint256 public constant MAX_SCORE_BATCH = 100;
+
     event WeaponMinted(address indexed to, uint256 weaponId, Rarity rarity, Condition condition, uint256 wear);
     event WeaponSold(address indexed from, address indexed to, uint256 weaponId);
     event WeaponListed(uint256 weaponId, uint256 price);
@@ -201,8 +212,8 @@ contract WeedCutterNFT is IERC721 {
             totalWeight += weaponConfigs[configIds[i]].weight;
         }
 
-        // 生成随机数
-        uint256 rand = uint256(keccak256(abi.encodePacked(block.timestamp, block.prevrandao, msg.sender))) % totalWeight;
+        // 生成随机数（带 nonce，同一笔交易内批量开箱每次结果不同）
+        uint256 rand = uint256(keccak256(abi.encodePacked(block.timestamp, block.prevrandao, msg.sender, nonce))) % totalWeight;
 
         // 根据权重选择武器配置
         uint256 cumulativeWeight = 0;
@@ -244,6 +255,24 @@ contract WeedCutterNFT is IERC721 {
         // 消耗一个箱子
         userCaseInventory[msg.sender][caseId] -= 1;
 
+        _openInventoryCase(caseId);
+    }
+
+    // 从库存中一次开启多个同种武器箱，每个箱子各触发一次 CaseOpened
+    function openCasesFromInventory(uint256 caseId, uint256 count) public {
+        require(caseId > 0 && caseId < nextCaseId, "Invalid case ID");
+        require(count > 0 && count <= MAX_OPEN_BATCH, "Invalid count");
+        require(userCaseInventory[msg.sender][caseId] >= count, "No cases in inventory");
+
+        userCaseInventory[msg.sender][caseId] -= count;
+
+        for (uint256 i = 0; i < count; i++) {
+            _openInventoryCase(caseId);
+        }
+    }
+
+    // 开启一个已扣除库存的箱子：随机选择武器配置和磨损度并铸造
+    function _openInventoryCase(uint256 caseId) internal returns (uint256) {
         // 获取武器箱信息
         Case storage caseInfo = cases[caseId];
 
@@ -259,6 +288,7 @@ contract WeedCutterNFT is IERC721 {
 
         // 触发事件
         emit CaseOpened(msg.sender, caseId, weaponId, selectedConfig.rarity, randomCondition, wear);
+        return weaponId;
     }
 
     // 使用ETH开启武器箱（直接开箱，不进库存）
@@ -402,6 +432,7 @@ contract WeedCutterNFT is IERC721 {
         weapon.owner = msg.sender;
         weapon.forSale = false;
         weapon.price = 0;
+        _removeFromSale(weaponId);
 
         // 更新用户武器列表
         _removeWeaponFromUser(previousOwner, weaponId);
@@ -421,23 +452,38 @@ contract WeedCutterNFT is IERC721 {
 
         weapon.forSale = true;
         weapon.price = price;
+        _addToSale(weaponId);
 
         emit WeaponListed(weaponId, price);
     }
 
 
     function recordWeedCut(uint256 points) public {
+        _recordWeedCut(msg.sender, points);
+    }
+
+    // 批量结算分数（仅管理员）：链下聚合服务汇总多个玩家的割草积分后一次上链
+    function recordWeedCutBatch(address[] calldata playerList, uint256[] calldata points) public onlyOwner {
+        require(playerList.length == points.length, "Length mismatch");
+        require(playerList.length <= MAX_SCORE_BATCH, "Batch too large");
+
+        for (uint256 i = 0; i < playerList.length; i++) {
+            _recordWeedCut(playerList[i], points[i]);
+        }
+    }
+
+    function _recordWeedCut(address player, uint256 points) internal {
         // 如果是新玩家，添加到玩家列表
-        if (!hasPlayed[msg.sender]) {
-            players.push(msg.sender);
-            hasPlayed[msg.sender] = true;
+        if (!hasPlayed[player]) {
+            players.push(player);
+            hasPlayed[player] = true;
         }
 
-        scores[msg.sender] += points;
+        scores[player] += points;
         uint256 coinsEarned = points / 5;
-        coins[msg.sender] += coinsEarned;
+        coins[player] += coinsEarned;
 
-        emit WeedCut(msg.sender, points, coinsEarned);
+        emit WeedCut(player, points, coinsEarned);
     }
 
     // 设置玩家名称
@@ -632,24 +678,82 @@ contract WeedCutterNFT is IERC721 {
 
     // 新增: 返回当前所有在售武器列表
     function getWeaponsForSale() public view returns (Weapon[] memory) {
-        uint256 total = nextWeaponId - 1;
-        uint256 count = 0;
-        for (uint256 i = 1; i <= total; i++) {
-            if (weapons[i].forSale) {
-                count++;
-            }
-        }
-        Weapon[] memory saleList = new Weapon[](count);
-        uint256 idx = 0;
-        for (uint256 i = 1; i <= total; i++) {
-            if (weapons[i].forSale) {
-                saleList[idx] = weapons[i];
-                idx++;
-            }
+        Weapon[] memory saleList = new Weapon[](saleWeaponIds.length);
+        for (uint256 i = 0; i < saleWeaponIds.length; i++) {
+            saleList[i] = weapons[saleWeaponIds[i]];
         }
         return saleList;
     }
 
+    /**
+     * @dev 分页返回在售武器，limit 最大为 MAX_PAGE_SIZE
+     * @return page 本页武器
+     * @return total 在售总数
+     */
+    function getWeaponsForSalePage(uint256 offset, uint256 limit) public view returns (Weapon[] memory page, uint256 total) {
+        total = saleWeaponIds.length;
+        uint256 end = _pageEnd(offset, limit, total);
+        page = new Weapon[](end > offset ? end - offset : 0);
+        for (uint256 i = offset; i < end; i++) {
+            page[i - offset] = weapons[saleWeaponIds[i]];
+        }
+    }
+
+    /**
+     * @dev 批量查询武器详情，不存在的ID返回 id 为 0 的空记录（不会 revert）
+     */
+    function getWeaponDetailsBatch(uint256[] memory weaponIds) public view returns (Weapon[] memory result) {
+        require(weaponIds.length <= MAX_PAGE_SIZE, "Too many ids");
+        result = new Weapon[](weaponIds.length);
+        for (uint256 i = 0; i < weaponIds.length; i++) {
+            result[i] = weapons[weaponIds[i]];
+        }
+    }
+
+    /**
+     * @dev 分页返回用户持有的武器（含已上架的），limit 最大为 MAX_PAGE_SIZE
+     * @return page 本页武器
+     * @return total 用户武器总数
+     */
+    function getUserWeaponsPage(address user, uint256 offset, uint256 limit) public view returns (Weapon[] memory page, uint256 total) {
+        uint256[] storage ids = userWeapons[user];
+        total = ids.length;
+        uint256 end = _pageEnd(offset, limit, total);
+        page = new Weapon[](end > offset ? end - offset : 0);
+        for (uint256 i = offset; i < end; i++) {
+            page[i - offset] = weapons[ids[i]];
+        }
+    }
+
+    function _pageEnd(uint256 offset, uint256 limit, uint256 total) internal pure returns (uint256) {
+        if (limit > MAX_PAGE_SIZE) {
+            limit = MAX_PAGE_SIZE;
+        }
+        if (offset >= total) {
+            return offset;
+        }
+        return total - offset < limit ? total : offset + limit;
+    }
+
+    function _addToSale(uint256 weaponId) internal {
+        if (saleWeaponIndex[weaponId] == 0) {
+            saleWeaponIds.push(weaponId);
+            saleWeaponIndex[weaponId] = saleWeaponIds.length;
+        }
+    }
+
+    function _removeFromSale(uint256 weaponId) internal {
+        uint256 index = saleWeaponIndex[weaponId];
+        if (index == 0) {
+            return;
+        }
+        uint256 lastId = saleWeaponIds[saleWeaponIds.length - 1];
+        saleWeaponIds[index - 1] = lastId;
+        saleWeaponIndex[lastId] = index;
+        saleWeaponIds.pop();
+        delete saleWeaponIndex[weaponId];
+    }
+
     function _removeWeaponFromUser(address user, uint256 weaponId) internal {
         uint256[] storage weaponsList = userWeapons[user];
         for (uint256 i = 0; i < weaponsList.length; i++) {
@@ -748,6 +852,7 @@ contract WeedCutterNFT is IERC721 {
         weapon.owner = msg.sender;
         weapon.forSale = false;
         weapon.price = 0;
+        _removeFromSale(weaponId);
 
         // 更新用户武器列表
         _removeWeaponFromUser(previousOwner, weaponId);
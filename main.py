@@ -6,6 +6,10 @@
 import argparse
 import os
 import sys
+import time
+
+_STARTUP_T0 = time.perf_counter()  # 启动计时起点（导入 pygame 和游戏模块之前）
+
 import pygame
 import logging
 
@@ -14,6 +18,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 from src.config import WIDTH, HEIGHT, WHITE
 from src.game import BlockchainGame
+from src.startup import StartupProfile
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s %(message)s")
@@ -28,13 +33,40 @@ def parse_args():
         default=int(os.getenv("PLAYER_ACCOUNT_INDEX", 0)),
         help="Hardhat 账户索引 (默认 0，可用 PLAYER_ACCOUNT_INDEX 环境变量覆盖)"
     )
+    parser.add_argument(
+        "--simulate",
+        action="store_true",
+        default=os.getenv("SIMULATE_CHAIN", "") == "1",
+        help="使用进程内模拟链，不需要 Hardhat 节点 (也可设置 SIMULATE_CHAIN=1)"
+    )
+    parser.add_argument(
+        "--sim-latency",
+        type=float,
+        default=float(os.getenv("SIM_LATENCY_MS", 0)),
+        help="模拟链每个 RPC 请求的人工延迟，毫秒 (默认 0)"
+    )
+    parser.add_argument(
+        "--sim-seed",
+        type=int,
+        default=int(os.getenv("SIM_SEED", 0)),
+        help="模拟链随机种子，相同种子的开箱结果相同 (默认 0)"
+    )
+    parser.add_argument(
+        "--sim-block-time",
+        type=float,
+        default=0.0,
+        help="模拟链定时出空块的间隔，秒 (默认 0，只在交易时出块)"
+    )
     return parser.parse_args()
 
 
 def main():
     """主函数"""
     args = parse_args()
-    
+    game = None
+    profile = StartupProfile(_STARTUP_T0)
+    profile.mark("导入模块")
+
     try:
         print("🚀 开始初始化游戏...")
         
@@ -48,9 +80,24 @@ def main():
         loading_text = font.render("Loading...", True, (0, 0, 0))
         screen.blit(loading_text, (WIDTH // 2 - loading_text.get_width() // 2, HEIGHT // 2 - 20))
         pygame.display.flip()
+        profile.mark("创建窗口")
 
         # 创建游戏实例
-        game = BlockchainGame(account_index=args.account_index)
+        blockchain_manager = None
+        if args.simulate:
+            from src.sim_chain import SimulatedChainBackend
+            blockchain_manager = SimulatedChainBackend(
+                args.account_index,
+                latency=args.sim_latency / 1000,
+                seed=args.sim_seed,
+                block_time=args.sim_block_time,
+            )
+        game = BlockchainGame(
+            account_index=args.account_index,
+            blockchain_manager=blockchain_manager,
+            startup_profile=profile,
+        )
+        profile.mark("其余初始化")
         print("✅ 游戏初始化完成，开始主循环...")
 
         clock = pygame.time.Clock()
@@ -157,6 +204,9 @@ def main():
             screen.fill(WHITE)
             game.draw(screen)
             pygame.display.flip()
+            if not profile.reported:
+                profile.mark("首帧渲染")
+                profile.report()
             clock.tick(60)
 
     except Exception as e:
@@ -164,6 +214,9 @@ def main():
         import traceback
         traceback.print_exc()
     finally:
+        stats = game.blockchain_manager.view_cache.stats() if game else {'hits': 0, 'misses': 0}
+        if stats['hits'] or stats['misses']:
+            print(f"📊 合约读缓存: 命中 {stats['hits']} / 未命中 {stats['misses']} ({stats['hit_rate']:.0%})")
         pygame.quit()
         sys.exit()
 
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线执行用户数据迁移 - 大数据量时可在启动游戏前单独运行
+
+用法:
+    python scripts/migrate_user_data.py              # 执行所有未应用的迁移
+    python scripts/migrate_user_data.py --status     # 只查看版本和待执行的迁移
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.user_manager import UserManager, SCHEMA_VERSION
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="用户数据 schema 迁移")
+    parser.add_argument("--data-file", default="user_data.json", help="用户数据文件")
+    parser.add_argument("--status", action="store_true", help="只显示当前版本和待执行的迁移")
+    return parser.parse_args()
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+    if not os.path.exists(args.data_file):
+        print(f"❌ 找不到数据文件: {args.data_file}")
+        return 1
+
+    manager = UserManager(args.data_file, key_pool_size=0, auto_migrate=False)
+    current = manager.schema.get('version', 0)
+    pending = manager.pending_migrations()
+    print(f"📦 {args.data_file}: 版本 v{current} / 最新 v{SCHEMA_VERSION}，{len(manager.users)} 个用户")
+    for record in manager.schema.get('applied', []):
+        print(f"   ✅ v{record['version']} {record['name']} ({record['applied_at']})")
+    for version, name in pending:
+        print(f"   ⏳ v{version} {name}")
+
+    if args.status or not pending:
+        if not pending:
+            print("✅ 数据已是最新版本")
+        return 0
+
+    manager.run_migrations()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量注册测试账户 - 用于压测和快速搭建多人测试环境
+
+用法:
+    python scripts/seed_users.py --count 120 --prefix bot
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.user_manager import UserManager
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="批量注册测试账户")
+    parser.add_argument("--count", type=int, default=100, help="注册账户数量 (默认 100)")
+    parser.add_argument("--prefix", default="bot", help="用户名前缀 (默认 bot)")
+    parser.add_argument("--password", default="password123", help="统一密码 (默认 password123)")
+    parser.add_argument("--data-file", default="user_data.json", help="用户数据文件")
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=None,
+        help="RSA 密钥池容量 (默认与 --count 相同，注册前预热)"
+    )
+    parser.add_argument("--no-warmup", action="store_true", help="不等待密钥池预热，直接开始注册")
+    return parser.parse_args()
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+    pool_size = args.pool_size if args.pool_size is not None else args.count
+
+    manager = UserManager(args.data_file, key_pool_size=pool_size)
+    if not args.no_warmup:
+        print(f"⏳ 预热 RSA 密钥池 ({pool_size} 对)...")
+        start = time.perf_counter()
+        manager.key_pool.wait_until_full()
+        print(f"✅ 密钥池就绪，用时 {time.perf_counter() - start:.1f}s")
+
+    latencies = []
+    created = 0
+    for i in range(args.count):
+        username = f"{args.prefix}{i:04d}"
+        start = time.perf_counter()
+        success, message, _ = manager.register_user(username, f"{username}@example.com", args.password)
+        latencies.append(time.perf_counter() - start)
+        if success:
+            created += 1
+        else:
+            print(f"⚠️ {username}: {message}")
+
+    manager.key_pool.stop()
+    if not latencies:
+        return
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"✅ 注册完成: {created}/{args.count}")
+    print(f"   注册耗时 p50={p50 * 1000:.1f}ms p95={p95 * 1000:.1f}ms max={latencies[-1] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
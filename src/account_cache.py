@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+账户状态快照缓存 - 最近使用过的账户切换回来时不用重新加载
+"""
+from collections import OrderedDict
+
+
+class AccountStateCache:
+    """
+    按地址保存切走账户的状态快照（分数、金币、武器、箱子库存、名称、排名等），LRU 淘汰
+    快照在后台仍由事件流增量更新（见 BlockchainGame.apply_chain_events），切换回来时可直接使用
+    """
+
+    def __init__(self, capacity=4):
+        self.capacity = capacity
+        self._states = OrderedDict()  # 小写地址 -> (原始地址, 状态字典)
+
+    def put(self, account, state):
+        key = account.lower()
+        self._states[key] = (account, state)
+        self._states.move_to_end(key)
+        while len(self._states) > self.capacity:
+            evicted, _ = self._states.popitem(last=False)
+            print(f"ℹ️ 账户快照缓存已满，移除 {evicted[:10]}...")
+
+    def pop(self, account):
+        """取出账户的快照（取出后由游戏持有，不在缓存中）"""
+        entry = self._states.pop(account.lower(), None)
+        return entry[1] if entry else None
+
+    def items(self):
+        """[(地址, 状态字典)]，从最久未用到最近使用"""
+        return list(self._states.values())
+
+    def clear(self):
+        self._states.clear()
+
+    def __contains__(self, account):
+        return account.lower() in self._states
+
+    def __len__(self):
+        return len(self._states)
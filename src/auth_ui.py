@@ -61,6 +61,20 @@ def draw_shadow_rect(surface, rect, color, offset=3):
 class AuthUIRenderer:
     """用户认证UI渲染器"""
 
+    # 登录/注册界面用到的字号
+    FONT_SIZES = (56, 32, 28, 22, 20, 16)
+
+    @staticmethod
+    def preload_fonts():
+        """预加载登录/注册界面字体（启动时与其他初始化任务并发执行，首帧不再卡在字体扫描上）"""
+        from .utils import load_chinese_font
+
+        try:
+            for size in AuthUIRenderer.FONT_SIZES:
+                load_chinese_font(size)
+        except Exception as e:
+            print(f"⚠️ 预加载登录界面字体失败，将在绘制时加载: {e}")
+
     @staticmethod
     def draw_login_screen(surface, game):
         """绘制登录界面 - 现代化设计"""
@@ -190,7 +204,9 @@ class AuthUIRenderer:
         draw_shadow_rect(surface, login_button, THEME["success"], offset=3)
         pygame.draw.rect(surface, THEME["success"], login_button, border_radius=12)
 
-        login_text = header_font.render("登录", True, THEME["white"])
+        login_pending = game.is_auth_pending("login")
+        login_label = "登录中" + "." * (pygame.time.get_ticks() // 300 % 4) if login_pending else "登录"
+        login_text = header_font.render(login_label, True, THEME["white"])
         surface.blit(login_text, (login_button.centerx - login_text.get_width() // 2,
                                  login_button.centery - login_text.get_height() // 2))
 
@@ -343,7 +359,9 @@ class AuthUIRenderer:
         draw_shadow_rect(surface, confirm_button, THEME["success"], offset=3)
         pygame.draw.rect(surface, THEME["success"], confirm_button, border_radius=10)
 
-        confirm_text = header_font.render("注册", True, THEME["white"])
+        register_pending = game.is_auth_pending("register")
+        confirm_label = "注册中" + "." * (pygame.time.get_ticks() // 300 % 4) if register_pending else "注册"
+        confirm_text = header_font.render(confirm_label, True, THEME["white"])
         surface.blit(confirm_text, (confirm_button.centerx - confirm_text.get_width() // 2,
                                    confirm_button.centery - confirm_text.get_height() // 2))
 
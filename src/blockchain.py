@@ -3,10 +3,48 @@
 区块链交互模块
 """
 import json
+import math
 import os
+import threading
+import time
 import traceback
+from eth_utils import function_abi_to_4byte_selector
 from web3 import Web3
-from .enums import Rarity
+from web3.exceptions import TransactionNotFound, ContractLogicError
+from .weapon_record import decode_weapon
+from .view_cache import ViewCache, CachedContract, event_topics
+from .chain_events import ChainEventTransport
+from .rpc_provider import build_provider, CircuitBreaker
+from .gas_profile import GasProfiles, GAS_MARGIN
+from .startup import StartupGraph
+
+# 分页读取时每次 eth_call 的条数（合约 MAX_PAGE_SIZE 为 100）
+WEAPON_PAGE_SIZE = 50
+# 单次 eth_getLogs 查询的区块跨度
+LOG_CHUNK_BLOCKS = 5000
+# 批量开箱单笔交易开启的箱子数（合约 MAX_OPEN_BATCH 为 20）
+OPEN_CASE_BATCH = 20
+# 批量结算分数单笔交易包含的玩家数（合约 MAX_SCORE_BATCH 为 100）
+SCORE_BATCH_SIZE = 100
+
+
+def deployed_functions(abi, code):
+    """
+    ABI 中确实存在于已部署字节码里的函数名
+    solc 的函数分发表用 PUSHn <选择器> 比较调用数据（选择器的前导 0 字节会省略，用 PUSH3/PUSH2…），
+    运行时字节码里找不到对应的 PUSH 指令，说明部署的是没有该函数的旧合约
+    """
+    code = bytes(code or b"")
+    names = set()
+    for entry in abi:
+        if entry.get('type') != 'function':
+            continue
+        selector = function_abi_to_4byte_selector(entry).lstrip(b"\x00")
+        if bytes([0x5f + len(selector)]) + selector in code:
+            names.add(entry['name'])
+    return names
+
+
 class BlockchainManager:
     """区块链管理器"""
     def __init__(self, account_index: int = 0):
@@ -15,13 +53,33 @@ class BlockchainManager:
         self.w3 = None
         self.contract = None
         self.contract_abi = None
+        self.abi_functions = set()
         self.account = "0x0000000000000000000000000000000000000000"
         self.contract_address = "N/A"
-        self.rpc_url = os.getenv("RPC_URL", "http://127.0.0.1:8545")
+        # RPC_URLS 为逗号分隔的多个节点，第一个是主节点（写请求）；未设置时使用单个 RPC_URL
+        self.rpc_urls = [url.strip() for url in os.getenv("RPC_URLS", "").split(",") if url.strip()] \
+            or [os.getenv("RPC_URL", "http://127.0.0.1:8545")]
+        self.rpc_url = self.rpc_urls[0]
         self.account_index = account_index
         self.contract_owner = None
         self.contract_owner_available = False
         self.available_accounts = []
+        self.view_cache = ViewCache()  # 同一区块内的 view 调用只发一次 RPC
+        self.event_topics = {}  # topic0 -> 事件名
+        self._tx_events = threading.local()  # 最近一笔交易回执中解码出的事件（按线程区分，见 last_tx_events）
+        self._send_lock = threading.RLock()  # 取 nonce 到发出交易之间互斥（后台结算线程也会发交易）
+        self.event_transport = None  # 新区块/合约日志推送（ChainEventTransport）
+        self.provider = None  # ResilientHTTPProvider / RPCRouter，重新连接时复用同一个连接池和熔断器
+        self.reconnecting = False  # 后台正在探测节点
+        self.reconnect_delay = 2.0  # 探测失败后的等待时间（秒），指数增长
+        self.next_probe_at = 0.0
+        self._probe_thread = None
+        self._reported_available = None  # tick_health 上次汇报的在线状态（None 表示尚未汇报）
+        # 发送前用 eth_call 预执行写交易，revert 时立即返回原因（TX_PREFLIGHT=0 关闭）
+        self.preflight_enabled = os.getenv("TX_PREFLIGHT", "1") != "0"
+        self.gas_profiles = GasProfiles()  # 按函数学习的 gas 上限
+        self.last_tx_error = ""  # 最近一次预执行失败的 revert 原因
+        self._pending_gas = {}  # 交易哈希 -> (函数名, gas 上限)，收到回执后计入 gas 画像
     def _load_json_with_fallback(self, candidates, description):
         """从多个候选路径中加载 JSON，返回 (数据, 使用的路径)"""
         errors = []
@@ -36,7 +94,7 @@ class BlockchainManager:
         detail = " | ".join(errors)
         raise FileNotFoundError(f"{description} 未找到，已尝试: {', '.join(candidates)}. {detail}")
     def _resolve_contract_address(self, candidates):
-        """寻找包含已部署合约地址的文件，返回 (checksum 地址, 合约信息, 路径)"""
+        """寻找包含已部署合约地址的文件，返回 (checksum 地址, 合约信息, 路径, 运行时字节码)"""
         errors = []
         for path in candidates:
             try:
@@ -56,37 +114,56 @@ class BlockchainManager:
                 continue
             code = self.w3.eth.get_code(checksum)
             if code and any(byte != 0 for byte in code):
-                return checksum, info, path
+                return checksum, info, path, bytes(code)
             errors.append(f"{path}: 地址 {raw_address} 上没有已部署合约")
         detail = " | ".join(errors)
         raise RuntimeError(f"无法找到可用的合约地址。请重新部署合约。详情: {detail}")
+    def _create_provider(self):
+        """创建 web3 provider（模拟链后端会覆盖）"""
+        return build_provider(self.rpc_urls)
     def setup(self):
         """设置区块链连接"""
         try:
-            print(f"🔌 正在连接区块链 RPC: {self.rpc_url}")
-            self.w3 = Web3(Web3.HTTPProvider(self.rpc_url, request_kwargs={"timeout": 1}))  # 减少超时时间
+            print(f"🔌 正在连接区块链 RPC: {', '.join(self.rpc_urls)}")
+            if self.provider is None:
+                self.provider = self._create_provider()
+            self.w3 = Web3(self.provider)
+            # 区块高度、ABI 文件、合约地址校验和账户列表互不依赖，并发获取
+            startup = StartupGraph()
+            startup.add("block_number", self.poll_block_number)
+            startup.add("abi", lambda: self._load_json_with_fallback(
+                ["WeedCutterNFT.json", "scripts/WeedCutterNFT.json"],
+                "合约 ABI"
+            ))
+            startup.add("contract_address", lambda: self._resolve_contract_address(
+                ["contract-info.json", "scripts/contract-info.json"]
+            ))
+            startup.add("accounts", lambda: self.w3.eth.accounts)
+            startup.run()
             try:
-                block_number = self.w3.eth.block_number
+                block_number = startup.result("block_number")
                 print(f"✅ 连接到区块链网络，最新区块: {block_number}")
             except Exception as block_err:
                 raise RuntimeError(f"无法获取区块高度: {block_err}") from block_err
-            abi_data, abi_path = self._load_json_with_fallback(
-                ["WeedCutterNFT.json", "scripts/WeedCutterNFT.json"],
-                "合约 ABI"
-            )
+            abi_data, abi_path = startup.result("abi")
             self.contract_abi = abi_data['abi']
             if abi_path != "WeedCutterNFT.json":
                 print(f"⚠️ 使用备用 ABI 文件: {abi_path}")
-            self.contract_address, contract_info, info_path = self._resolve_contract_address(
-                ["contract-info.json", "scripts/contract-info.json"]
-            )
+            self.contract_address, contract_info, info_path, code = startup.result("contract_address")
+            # 新增的函数以部署的字节码为准：ABI 文件可能比链上合约新（改了 .sol 但还没重新部署）
+            self.abi_functions = deployed_functions(self.contract_abi, code)
+            missing = sorted({e['name'] for e in self.contract_abi if e.get('type') == 'function'} - self.abi_functions)
+            if missing:
+                print(f"⚠️ 已部署的合约缺少 {len(missing)} 个 ABI 函数（需重新编译部署），将使用兼容接口: {', '.join(missing)}")
             if info_path != "contract-info.json":
                 print(f"⚠️ 主目录 contract-info.json 未同步，已使用 {info_path}")
-            self.contract = self.w3.eth.contract(
-                address=self.contract_address,
-                abi=self.contract_abi
+            self.contract = CachedContract(
+                self.w3.eth.contract(address=self.contract_address, abi=self.contract_abi),
+                self.view_cache
             )
-            available_accounts = self.w3.eth.accounts
+            self.event_topics = event_topics(self.contract_abi)
+            self.gas_profiles.bind(self.contract_address)
+            available_accounts = startup.result("accounts")
             if not available_accounts:
                 raise RuntimeError("当前 RPC 没有可用账户 (did you start Hardhat?)")
             self.available_accounts = available_accounts
@@ -106,64 +183,317 @@ class BlockchainManager:
                 print(f"⚠️ 无法读取合约所有者: {owner_err}")
                 self.contract_owner_available = False
             self.blockchain_available = True
+            self.offline_reason = ""
+            self.start_event_transport()
         except Exception as e:
             print(f"❌ 区块链设置失败，进入离线模式: {e}")
             traceback.print_exc()
             self.blockchain_available = False
             self.offline_reason = f"{e} (RPC: {self.rpc_url})"
-            print("提示: 请确保 Hardhat 节点运行并部署合约后再重开游戏。")
+            print("提示: 请确保 Hardhat 节点运行并部署合约，游戏会在后台自动重连。")
+    def poll_block_number(self):
+        """查询最新区块号，区块前进时让 view 缓存失效"""
+        block_number = self.w3.eth.block_number
+        self.view_cache.advance(block_number, rewind=True)
+        return block_number
+    def start_event_transport(self):
+        """启动链上事件推送，失败时保持区块轮询"""
+        if self.event_transport is not None:
+            self.event_transport.stop()
+            self.event_transport = None
+        try:
+            transport = ChainEventTransport(self.rpc_url, self.contract_address, provider=self.provider)
+            if transport.start(self.view_cache.block or 0):
+                self.event_transport = transport
+            else:
+                transport.stop()
+        except Exception as e:
+            print(f"⚠️ 启动事件推送失败，使用区块轮询: {e}")
+    def connection_health(self):
+        """RPC 连接健康状况（见 ResilientHTTPProvider.health），尚未连接时为 None"""
+        if self.provider is None:
+            return None
+        health = self.provider.health()
+        health['reconnecting'] = self.reconnecting
+        health['next_probe_in'] = max(0.0, self.next_probe_at - time.monotonic())
+        return health
+    def tick_health(self):
+        """
+        由主循环调用：熔断器打开时自动切换到离线模式，离线期间在后台线程探测节点，恢复后自动上线
+        返回 'offline' / 'online' 表示本次的状态变化，无变化时返回 None
+        """
+        provider = self.provider
+        if provider is None:
+            return None
+        health = provider.health()
+        if self.blockchain_available and health['state'] == CircuitBreaker.OPEN:
+            self.blockchain_available = False
+            self.offline_reason = f"RPC 无响应 (连续失败 {health['failures']} 次)"
+            self.next_probe_at = time.monotonic() + health['retry_in']
+            print(f"⚠️ {self.offline_reason}，进入离线模式并在后台重连")
+        if not self.blockchain_available and not self.reconnecting and time.monotonic() >= self.next_probe_at:
+            self.reconnecting = True
+            self._probe_thread = threading.Thread(target=self._probe, name="rpc-probe", daemon=True)
+            self._probe_thread.start()
+        change = None
+        if self._reported_available is None:
+            self._reported_available = self.blockchain_available
+        elif self.blockchain_available != self._reported_available:
+            change = 'online' if self.blockchain_available else 'offline'
+            self._reported_available = self.blockchain_available
+        return change
+    def _probe(self):
+        """后台探测节点；首次连接失败过则重新执行 setup"""
+        try:
+            if self.contract is None:
+                self.setup()
+                if not self.blockchain_available:
+                    raise RuntimeError(self.offline_reason)
+            else:
+                self.poll_block_number()
+                if self.event_transport is None or not self.event_transport.active:
+                    self.start_event_transport()
+                self.offline_reason = ""
+                self.blockchain_available = True
+            self.reconnect_delay = 2.0
+            print("✅ 区块链连接已恢复")
+        except Exception as e:
+            delay = max(self.reconnect_delay, self.provider.health()['retry_in'] if self.provider else 0)
+            self.next_probe_at = time.monotonic() + delay
+            self.reconnect_delay = min(30.0, self.reconnect_delay * 2)
+            print(f"⏳ 区块链仍不可用，{delay:.0f} 秒后重试: {e}")
+        finally:
+            self.reconnecting = False
+    def _preflight(self, function, params):
+        """
+        用 eth_estimateGas 在 'latest' 上预执行写交易（其他玩家刚改过的状态也能发现）
+        返回 (revert 原因, 估算 gas)：可以执行时原因为 None；预执行本身出错（节点不支持等）时
+        两者都为 None，交由正常发送处理
+        """
+        try:
+            return None, function.estimate_gas(params, 'latest')
+        except ContractLogicError as e:
+            return str(e), None
+        except Exception as e:
+            print(f"⚠️ 交易预执行出错，直接发送: {e}")
+        return None, None
+
+    @property
+    def last_tx_events(self):
+        """当前线程最近一笔交易回执中的事件；后台线程发出的交易不会混入主线程的 pop_tx_events"""
+        return getattr(self._tx_events, 'events', [])
+
+    @last_tx_events.setter
+    def last_tx_events(self, events):
+        self._tx_events.events = events
+
+    def _send_transaction(self, function, account, default_gas, value=0, nonce=None, preflight=True,
+                          profile_key=None):
+        """
+        发送合约写交易，返回交易哈希
+        先预执行：会 revert 的交易不发送，打印原因后返回 None（只花一次 RPC，不用等回执）
+        gas 上限取预执行估算值 × GAS_MARGIN 与该函数（或 profile_key）学到的上限中的较大者，
+        首次写入存储等比样本更贵的分支也不会 gas 不足；不预执行时只用学到的值（没有样本时为 default_gas）
+        nonce 为 None 时查询账户的 pending nonce（持 _send_lock，与其它线程的发送串行）；
+        流水线连续发送时由调用方持锁指定
+        """
+        name = function.fn_name
+        profile_key = profile_key or name
+        params = {'from': account}
+        if value:
+            params['value'] = value
+        self.last_tx_error = ""
+        estimate = None
+        if preflight and self.preflight_enabled:
+            reason, estimate = self._preflight(function, params)
+            if reason is not None:
+                self.last_tx_error = reason
+                print(f"❌ 交易预执行失败 ({name}): {reason}")
+                return None
+        gas_limit = self.gas_profiles.gas_limit(profile_key, default_gas)
+        if estimate is not None:
+            gas_limit = max(gas_limit, int(math.ceil(estimate * GAS_MARGIN)))
+        with self._send_lock:
+            tx = function.build_transaction(dict(
+                params,
+                gas=gas_limit,
+                gasPrice=self.w3.to_wei('2', 'gwei'),
+                nonce=self.w3.eth.get_transaction_count(account, 'pending') if nonce is None else nonce,
+            ))
+            tx_hash = self.w3.eth.send_transaction(tx)
+        self._pending_gas[tx_hash] = (profile_key, gas_limit)
+        return tx_hash
+
+    def _get_receipt_or_none(self, tx_hash):
+        try:
+            return self.w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return None
+    def _wait_receipt(self, tx_hash, timeout=120, decode=True):
+        """
+        等待交易回执，按回执中的区块和事件让 view 缓存失效，并记录解码后的事件供 pop_tx_events 读取
+        WebSocket 推送可用时在新区块到达后再查回执，而不是定时轮询
+        decode=False 时不解码日志，由调用方把多笔回执的日志一起交给 _apply_receipt_logs
+        """
+        # gas 画像的登记在任何情况下都要移除（超时/RPC 出错时不计入样本）
+        pending = self._pending_gas.pop(tx_hash, None)
+        receipt = self._get_receipt_or_none(tx_hash)
+        transport = self.event_transport
+        if receipt is None and transport is not None and transport.active and transport.mode == 'ws':
+            deadline = time.monotonic() + timeout
+            while receipt is None and time.monotonic() < deadline:
+                known_block = transport.last_block
+                receipt = self._get_receipt_or_none(tx_hash)
+                if receipt is None:
+                    transport.wait_for_block(known_block, min(5, max(0, deadline - time.monotonic())))
+        if receipt is None:
+            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+        self.view_cache.advance(receipt['blockNumber'])
+        if pending is not None:
+            name, gas_limit = pending
+            self.gas_profiles.record(name, receipt['gasUsed'], gas_limit, receipt.get('status', 1) == 1)
+        if decode:
+            self._apply_receipt_logs(receipt.get('logs', []))
+        return receipt
+
+    def _apply_receipt_logs(self, logs):
+        """解码回执日志：记录为最近的交易事件，并让相关 view 缓存失效"""
+        self.last_tx_events = self.decode_logs(logs)
+        for event in self.last_tx_events:
+            self.view_cache.invalidate_event(event['event'])
+    def pop_tx_events(self):
+        """取出最近一笔交易回执中的合约事件（取出后清空）"""
+        events, self.last_tx_events = self.last_tx_events, []
+        return events
+    def decode_logs(self, logs):
+        """
+        解码本合约的日志
+        返回: [{'event': 事件名, 'args': 参数, 'key': (交易哈希, logIndex), 'block': 区块号}]
+        """
+        events = []
+        for log in logs:
+            topics = log.get('topics') or []
+            if not topics or str(log.get('address', '')).lower() != str(self.contract_address).lower():
+                continue
+            name = self.event_topics.get(topics[0].hex().lower())
+            if not name:
+                continue
+            try:
+                decoded = getattr(self.contract.events, name)().process_log(log)
+            except Exception:
+                continue  # 同名 topic 但参数不匹配（如 ERC721 Transfer 的不同索引方式）
+            events.append({
+                'event': name,
+                'args': decoded['args'],
+                'key': (log['transactionHash'].hex(), log['logIndex']),
+                'block': log['blockNumber'],
+            })
+        return events
+    def get_contract_events(self, from_block, to_block, event_names=None, chunk_size=LOG_CHUNK_BLOCKS):
+        """
+        查询区间内本合约的事件（每段只发一次 eth_getLogs，按 topic0 过滤多个事件）
+        返回按链上顺序排列的解码事件，格式同 decode_logs
+        """
+        topics = None
+        if event_names is not None:
+            wanted = set(event_names)
+            topics = [[topic for topic, name in self.event_topics.items() if name in wanted]]
+        events = []
+        for start in range(from_block, to_block + 1, chunk_size):
+            end = min(start + chunk_size - 1, to_block)
+            params = {'address': self.contract_address, 'fromBlock': start, 'toBlock': end}
+            if topics is not None:
+                params['topics'] = topics
+            events.extend(self.decode_logs(self.w3.eth.get_logs(params)))
+        return events
+    def has_function(self, name) -> bool:
+        """已部署的合约是否包含该函数（兼容未重新部署的旧合约）"""
+        return name in self.abi_functions
+    def _iter_pages(self, fetch_page, page_size):
+        """按页调用 fetch_page(offset, limit) -> (本页, 总数)，逐条产出"""
+        offset = 0
+        while True:
+            page, total = fetch_page(offset, page_size)
+            yield from page
+            offset += len(page)
+            if not page or offset >= total:
+                return
+    def iter_user_weapons(self, account, weapon_display_name_func, page_size=WEAPON_PAGE_SIZE):
+        """按页懒加载玩家武器（生成器），单次 eth_call 最多返回 page_size 把"""
+        if not self.blockchain_available:
+            return
+        if self.has_function('getUserWeaponsPage'):
+            pages = self._iter_pages(
+                lambda offset, limit: self.contract.functions.getUserWeaponsPage(account, offset, limit).call(),
+                page_size
+            )
+            for raw in pages:
+                yield decode_weapon(raw, weapon_display_name_func)
+            return
+        weapon_ids = self.contract.functions.getUserWeapons(account).call()
+        yield from self.iter_weapons(weapon_ids, weapon_display_name_func, page_size)
+    def get_user_weapon_count(self, account):
+        """玩家持有的武器数量（含已上架的）"""
+        if not self.blockchain_available:
+            return 0
+        try:
+            if self.has_function('getUserWeaponsPage'):
+                _, total = self.contract.functions.getUserWeaponsPage(account, 0, 0).call()
+                return total
+            return len(self.contract.functions.getUserWeapons(account).call())
+        except Exception as e:
+            print(f"获取武器数量失败: {e}")
+            return 0
+    def load_user_weapons_page(self, account, offset, limit, weapon_display_name_func):
+        """按页加载玩家武器（按合约中的持有顺序，含已上架的）"""
+        if not self.blockchain_available:
+            return []
+        if self.has_function('getUserWeaponsPage'):
+            page, _ = self.contract.functions.getUserWeaponsPage(account, offset, limit).call()
+            return [decode_weapon(w, weapon_display_name_func) for w in page]
+        weapon_ids = self.contract.functions.getUserWeapons(account).call()[offset:offset + limit]
+        return list(self.iter_weapons(weapon_ids, weapon_display_name_func))
+    def iter_weapons(self, weapon_ids, weapon_display_name_func=None, page_size=WEAPON_PAGE_SIZE):
+        """按 ID 分批查询武器详情（生成器），跳过不存在的武器"""
+        if not self.blockchain_available:
+            return
+        batched = self.has_function('getWeaponDetailsBatch')
+        for start in range(0, len(weapon_ids), page_size):
+            chunk = list(weapon_ids[start:start + page_size])
+            if batched:
+                rows = self.contract.functions.getWeaponDetailsBatch(chunk).call()
+            else:
+                rows = [self.contract.functions.getWeaponDetails(weapon_id).call() for weapon_id in chunk]
+            for raw in rows:
+                if raw[0] != 0:
+                    yield decode_weapon(raw, weapon_display_name_func)
     def load_player_weapons(self, account, weapon_display_name_func):
         """从区块链加载玩家武器"""
         if not self.blockchain_available:
             return [], []
         try:
-            from .enums import Condition
-            weapon_ids = self.contract.functions.getUserWeapons(account).call()
-            owned = []
-            for weapon_id in weapon_ids:
-                weapon_data = self.contract.functions.getWeaponDetails(weapon_id).call()
-                display_name = weapon_display_name_func(
-                    weapon_data[1],
-                    Rarity(weapon_data[2])
-                )
-                # 解析磨损度和品相
-                wear = None
-                condition = None
-                if len(weapon_data) > 7:
-                    try:
-                        wear_raw = weapon_data[7]
-                        if isinstance(wear_raw, int):
-                            wear = wear_raw / 1e10  # 转换为0-1的浮点数
-                    except:
-                        pass
-                if len(weapon_data) > 8:
-                    try:
-                        condition = Condition(weapon_data[8])
-                    except:
-                        pass
-
-                weapon = {
-                    'id': weapon_data[0],
-                    'name': display_name,
-                    'original_name': weapon_data[1],
-                    'rarity': Rarity(weapon_data[2]),
-                    'damage_multiplier': weapon_data[3] / 100.0,
-                    'owner': weapon_data[4],
-                    'price': weapon_data[5],
-                    'for_sale': weapon_data[6],
-                    'wear': wear,
-                    'condition': condition
-                }
-                owned.append(weapon)
-            owned.sort(key=lambda w: (-w['rarity'].value, w['id']))
-            listed_weapons = [w for w in owned if w['for_sale']]
-            weapons = [w for w in owned if not w['for_sale']]
+            owned = list(self.iter_user_weapons(account, weapon_display_name_func))
+            owned.sort(key=lambda w: (-w.rarity.value, w.id))
+            listed_weapons = [w for w in owned if w.for_sale]
+            weapons = [w for w in owned if not w.for_sale]
             print(f"加载了 {len(owned)} 把武器，其中 {len(listed_weapons)} 把已上架")
             return weapons, listed_weapons
         except Exception as e:
             print(f"加载玩家武器失败: {e}")
             traceback.print_exc()
             return [], []
+    def get_weapon(self, weapon_id, weapon_display_name_func=None):
+        """查询单把武器，不存在时返回 None"""
+        if not self.blockchain_available:
+            return None
+        try:
+            weapon_data = self.contract.functions.getWeaponDetails(weapon_id).call()
+            if not weapon_data or weapon_data[0] == 0:
+                return None
+            return decode_weapon(weapon_data, weapon_display_name_func)
+        except Exception as e:
+            print(f"⚠️ 从区块链查询武器 {weapon_id} 失败: {e}")
+            return None
     def load_player_stats(self, account):
         """加载玩家统计数据"""
         if not self.blockchain_available:
@@ -178,15 +508,11 @@ class BlockchainManager:
         if not self.blockchain_available or points <= 0:
             return False
         try:
-            tx = self.contract.functions.recordWeedCut(points).build_transaction({
-                'from': account,
-                'gas': 180000,
-                'gasPrice': self.w3.to_wei('2', 'gwei'),
-                'nonce': self.w3.eth.get_transaction_count(account)
-            })
-            tx_hash = self.w3.eth.send_transaction(tx)
+            tx_hash = self._send_transaction(self.contract.functions.recordWeedCut(points), account, 180000)
+            if tx_hash is None:
+                return False
             print(f"⏳ 正在上链累计分数 {points} tx={tx_hash.hex()}")
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            receipt = self._wait_receipt(tx_hash)
             status = getattr(receipt, 'status', 1)
             if status == 1:
                 print("✅ 分数上链成功")
@@ -197,25 +523,93 @@ class BlockchainManager:
         except Exception as e:
             print(f"记录分数失败: {e}")
             return False
+    def record_score_batch(self, account, players, points):
+        """
+        批量结算多个玩家的分数（仅合约所有者可用，供链下分数聚合服务调用）
+        按 SCORE_BATCH_SIZE 分笔，连续 nonce 一次发出后统一等待回执
+        返回: (settled, unconfirmed)
+            settled 与 players 对应：True 已上链，False 未发出或 revert（可以重新结算），
+            None 交易已发出但回执未确认（不能重发，稍后用 get_transaction_status 按回执确认）
+            unconfirmed 为 {交易哈希: (起始下标, 结束下标)}
+        """
+        settled = [False] * len(players)
+        unconfirmed = {}
+        if not self.blockchain_available or not players:
+            return settled, unconfirmed
+        sent = []  # (起始下标, 交易哈希)
+        try:
+            with self._send_lock:
+                chunks = list(range(0, len(players), SCORE_BATCH_SIZE))
+                nonce = self.w3.eth.get_transaction_count(account, 'pending')
+                for i, start in enumerate(chunks):
+                    end = start + SCORE_BATCH_SIZE
+                    count = len(players[start:end])
+                    function = self.contract.functions.recordWeedCutBatch(list(players[start:end]),
+                                                                          list(points[start:end]))
+                    # 新玩家首次上榜要写入玩家列表，按每人 10 万 gas 预留
+                    tx_hash = self._send_transaction(function, account, 30000 + 100000 * count, nonce=nonce + i,
+                                                     preflight=(i == 0), profile_key=f"recordWeedCutBatch[{count}]")
+                    if tx_hash is None:
+                        break
+                    sent.append((start, tx_hash))
+        except Exception as e:
+            # 已发出的交易仍会上链，下面照常等待回执；只有没发出的部分退回重新结算
+            print(f"批量结算分数发送失败: {e}")
+        if sent:
+            print(f"⏳ 批量结算 {len(players)} 个玩家的分数: {len(sent)} 笔交易")
+        receipts = []
+        for start, tx_hash in sent:
+            end = min(len(players), start + SCORE_BATCH_SIZE)
+            try:
+                receipt = self._wait_receipt(tx_hash, decode=False)
+            except Exception as e:
+                print(f"⚠️ 结算交易 {tx_hash.hex()} 暂未确认，之后按回执结算: {e}")
+                settled[start:end] = [None] * (end - start)
+                unconfirmed[tx_hash] = (start, end)
+                continue
+            receipts.append(receipt)
+            if getattr(receipt, 'status', 1) == 1:
+                settled[start:end] = [True] * (end - start)
+        if receipts:
+            self._apply_receipt_logs([log for receipt in receipts for log in receipt.get('logs', [])])
+        print(f"✅ 分数结算完成: {sum(1 for ok in settled if ok)}/{len(players)} 个玩家")
+        return settled, unconfirmed
+
+    def get_transaction_status(self, tx_hash):
+        """
+        已发出交易的结果：True 成功；False revert，或节点已不认识这笔交易（不会再上链）；
+        None 仍在等待（或查询出错）
+        """
+        try:
+            receipt = self._get_receipt_or_none(tx_hash)
+            if receipt is None:
+                try:
+                    self.w3.eth.get_transaction(tx_hash)
+                except TransactionNotFound:
+                    return False
+                return None
+            self.view_cache.advance(receipt['blockNumber'])
+            self._apply_receipt_logs(receipt.get('logs', []))
+            return getattr(receipt, 'status', 1) == 1
+        except Exception as e:
+            print(f"⚠️ 查询交易 {tx_hash.hex()} 状态失败: {e}")
+            return None
+
     def mint_weapon(self, account, name, rarity_value, damage_multiplier):
         """铸造武器（仅合约所有者可用）"""
         if not self.blockchain_available:
             return False
         try:
-            tx = self.contract.functions.mintWeapon(
+            tx_hash = self._send_transaction(self.contract.functions.mintWeapon(
                 account,
                 name,
                 rarity_value,
                 damage_multiplier
-            ).build_transaction({
-                'from': account,
-                'gas': 350000,
-                'gasPrice': self.w3.to_wei('2', 'gwei'),
-                'nonce': self.w3.eth.get_transaction_count(account)
-            })
-            tx_hash = self.w3.eth.send_transaction(tx)
+            ), account, 350000)
+            if tx_hash is None:
+                return False
             print(f"⏳ 铸造交易发送: {tx_hash.hex()} 等待确认...")
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            receipt = self._wait_receipt(tx_hash)
             status = getattr(receipt, 'status', 1)
             if status == 1:
                 print("✅ 铸造成功")
@@ -232,16 +626,13 @@ class BlockchainManager:
         if not self.blockchain_available:
             return False
         try:
-            tx = self.contract.functions.purchaseWeapon(weapon_id).build_transaction({
-                'from': account,
-                'value': price,
-                'gas': 300000,
-                'gasPrice': self.w3.to_wei('2', 'gwei'),
-                'nonce': self.w3.eth.get_transaction_count(account)
-            })
-            tx_hash = self.w3.eth.send_transaction(tx)
+            tx_hash = self._send_transaction(
+                self.contract.functions.purchaseWeapon(weapon_id), account, 300000, value=price
+            )
+            if tx_hash is None:
+                return False
             print(f"⏳ 购买交易发送: {tx_hash.hex()} 等待确认...")
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            receipt = self._wait_receipt(tx_hash)
             status = getattr(receipt, 'status', 1)
             if status == 1:
                 print("✅ 购买成功")
@@ -258,15 +649,13 @@ class BlockchainManager:
         if not self.blockchain_available:
             return False
         try:
-            tx = self.contract.functions.listWeaponForSale(weapon_id, price_wei).build_transaction({
-                'from': account,
-                'gas': 250000,
-                'gasPrice': self.w3.to_wei('2', 'gwei'),
-                'nonce': self.w3.eth.get_transaction_count(account)
-            })
-            tx_hash = self.w3.eth.send_transaction(tx)
+            tx_hash = self._send_transaction(
+                self.contract.functions.listWeaponForSale(weapon_id, price_wei), account, 250000
+            )
+            if tx_hash is None:
+                return False
             print(f"⏳ 上架交易发送: {tx_hash.hex()} 等待确认...")
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            receipt = self._wait_receipt(tx_hash)
             status = getattr(receipt, 'status', 1)
             if status == 1:
                 print("✅ 上架成功")
@@ -277,53 +666,61 @@ class BlockchainManager:
         except Exception as err:
             print(f"上架失败: {err}")
             return False
+    def get_market_listing_count(self):
+        """在售武器数量（旧合约没有分页接口时，同时刷新在售列表快照供 load_market_page 使用）"""
+        if not self.blockchain_available:
+            return 0
+        try:
+            if self.has_function('getWeaponsForSalePage'):
+                _, total = self.contract.functions.getWeaponsForSalePage(0, 0).call()
+                return total
+            self._sale_snapshot = self.contract.functions.getWeaponsForSale().call()
+            return len(self._sale_snapshot)
+        except Exception as e:
+            print(f"获取在售数量失败: {e}")
+            self._sale_snapshot = []
+            return 0
+    def load_market_page(self, offset, limit, weapon_display_name_func):
+        """按页加载在售武器（按合约中的在售顺序）"""
+        if self.has_function('getWeaponsForSalePage'):
+            page, _ = self.contract.functions.getWeaponsForSalePage(offset, limit).call()
+            return [decode_weapon(w, weapon_display_name_func) for w in page]
+        snapshot = getattr(self, '_sale_snapshot', [])
+        return [decode_weapon(w, weapon_display_name_func) for w in snapshot[offset:offset + limit]]
+    def iter_market_weapons(self, weapon_display_name_func, page_size=WEAPON_PAGE_SIZE):
+        """按页懒加载全部在售武器（生成器），翻页期间有成交时按 ID 去重"""
+        if not self.blockchain_available:
+            return
+        if self.has_function('getWeaponsForSalePage'):
+            seen = set()
+            pages = self._iter_pages(
+                lambda offset, limit: self.contract.functions.getWeaponsForSalePage(offset, limit).call(),
+                page_size
+            )
+            for raw in pages:
+                if raw[0] not in seen:
+                    seen.add(raw[0])
+                    yield decode_weapon(raw, weapon_display_name_func)
+            return
+        try:
+            sale_list = self.contract.functions.getWeaponsForSale().call()
+        except Exception:
+            # 最旧的合约：按 ID 分批扫描
+            total_next = self.contract.functions.getNextWeaponId().call()
+            for weapon in self.iter_weapons(range(1, total_next), weapon_display_name_func, page_size):
+                if weapon.for_sale:
+                    yield weapon
+            return
+        for raw in sale_list:
+            yield decode_weapon(raw, weapon_display_name_func)
+
     def load_market_weapons(self, weapon_display_name_func):
         """加载市场武器"""
         if not self.blockchain_available:
             return []
         try:
-            from .enums import Condition
-            sale_list = []
-            try:
-                sale_list = self.contract.functions.getWeaponsForSale().call()
-            except Exception:
-                total_next = self.contract.functions.getNextWeaponId().call()
-                for weapon_id in range(1, total_next):
-                    wdata = self.contract.functions.getWeaponDetails(weapon_id).call()
-                    if wdata[6]:  # forSale
-                        sale_list.append(wdata)
-            market_weapons = []
-            for w in sale_list:
-                display_name = weapon_display_name_func(w[1], Rarity(w[2]))
-                # 解析磨损度和品相
-                wear = None
-                condition = None
-                if len(w) > 7:
-                    try:
-                        wear_raw = w[7]
-                        if isinstance(wear_raw, int):
-                            wear = wear_raw / 1e10
-                    except:
-                        pass
-                if len(w) > 8:
-                    try:
-                        condition = Condition(w[8])
-                    except:
-                        pass
-
-                market_weapons.append({
-                    'id': w[0],
-                    'name': display_name,
-                    'original_name': w[1],
-                    'rarity': Rarity(w[2]),
-                    'damage_multiplier': w[3] / 100.0,
-                    'owner': w[4],
-                    'price': w[5],
-                    'for_sale': w[6],
-                    'wear': wear,
-                    'condition': condition
-                })
-            market_weapons.sort(key=lambda w: (w['price'], -w['rarity'].value))
+            market_weapons = list(self.iter_market_weapons(weapon_display_name_func))
+            market_weapons.sort(key=lambda w: (w.price, -w.rarity.value, w.id))
             print(f"✅ 市场已刷新，当前 {len(market_weapons)} 把在售")
             return market_weapons
         except Exception as e:
@@ -336,15 +733,11 @@ class BlockchainManager:
         if not self.blockchain_available:
             return False
         try:
-            tx = self.contract.functions.setPlayerName(name).build_transaction({
-                'from': account,
-                'gas': 100000,
-                'gasPrice': self.w3.to_wei('2', 'gwei'),
-                'nonce': self.w3.eth.get_transaction_count(account)
-            })
-            tx_hash = self.w3.eth.send_transaction(tx)
+            tx_hash = self._send_transaction(self.contract.functions.setPlayerName(name), account, 100000)
+            if tx_hash is None:
+                return False
             print(f"⏳ 设置玩家名称: {tx_hash.hex()}")
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            receipt = self._wait_receipt(tx_hash)
             return getattr(receipt, 'status', 1) == 1
         except Exception as e:
             print(f"设置名称失败: {e}")
@@ -379,6 +772,31 @@ class BlockchainManager:
             print(f"获取排行榜失败: {e}")
             return []
 
+    def _get_logs(self, event_names, from_block, to_block):
+        """查询多个事件的日志，按链上顺序返回 [(事件名, args)]"""
+        return [(e['event'], e['args']) for e in self.get_contract_events(from_block, to_block, event_names)]
+
+    def load_leaderboard_events(self, from_block, to_block=None):
+        """
+        读取排行榜相关事件（WeedCut / PlayerNameSet）
+        返回: (按链上顺序排列的 [(kind, address, value)], 查询到的最新区块)，失败时返回 (None, from_block - 1)
+        """
+        if not self.blockchain_available:
+            return None, from_block - 1
+        try:
+            if to_block is None:
+                to_block = self.poll_block_number()
+            events = []
+            for name, args in self._get_logs(("WeedCut", "PlayerNameSet"), from_block, to_block):
+                if name == "WeedCut":
+                    events.append(("score", args['player'], args['score']))
+                else:
+                    events.append(("name", args['player'], args['name']))
+            return events, to_block
+        except Exception as e:
+            print(f"⚠️ 读取排行榜事件失败: {e}")
+            return None, from_block - 1
+
     def get_player_rank(self, account):
         """获取玩家排名"""
         if not self.blockchain_available:
@@ -413,16 +831,13 @@ class BlockchainManager:
         if not self.blockchain_available:
             return False
         try:
-            tx = self.contract.functions.openCaseWithETH(case_id).build_transaction({
-                'from': account,
-                'value': price,
-                'gas': 400000,
-                'gasPrice': self.w3.to_wei('2', 'gwei'),
-                'nonce': self.w3.eth.get_transaction_count(account)
-            })
-            tx_hash = self.w3.eth.send_transaction(tx)
+            tx_hash = self._send_transaction(
+                self.contract.functions.openCaseWithETH(case_id), account, 400000, value=price
+            )
+            if tx_hash is None:
+                return False
             print(f"⏳ 开箱交易发送: {tx_hash.hex()} 等待确认...")
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            receipt = self._wait_receipt(tx_hash)
             status = getattr(receipt, 'status', 1)
             if status == 1:
                 print("✅ 开箱成功")
@@ -440,15 +855,13 @@ class BlockchainManager:
         if not self.blockchain_available:
             return False
         try:
-            tx = self.contract.functions.openCaseWithCoins(case_id).build_transaction({
-                'from': account,
-                'gas': 400000,
-                'gasPrice': self.w3.to_wei('2', 'gwei'),
-                'nonce': self.w3.eth.get_transaction_count(account)
-            })
-            tx_hash = self.w3.eth.send_transaction(tx)
+            tx_hash = self._send_transaction(
+                self.contract.functions.openCaseWithCoins(case_id), account, 400000
+            )
+            if tx_hash is None:
+                return False
             print(f"⏳ 用金币开箱: {tx_hash.hex()} 等待确认...")
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            receipt = self._wait_receipt(tx_hash)
             status = getattr(receipt, 'status', 1)
             if status == 1:
                 print("✅ 用金币开箱成功")
@@ -493,20 +906,52 @@ class BlockchainManager:
             print(f"获取武器箱列表失败: {err}")
             return []
 
+    def get_case_weapon_configs(self, case_id):
+        """获取武器箱包含的武器配置（名称、稀有度、基础伤害、权重）"""
+        count = self.contract.functions.getCaseWeaponConfigCount(case_id).call()
+        configs = []
+        for index in range(count):
+            config_id = self.contract.functions.getCaseWeaponConfigIdAt(case_id, index).call()
+            name, rarity, base_damage, weight = self.contract.functions.weaponConfigs(config_id).call()
+            configs.append({
+                'id': config_id,
+                'name': name,
+                'rarity': rarity,
+                'base_damage_multiplier': base_damage,
+                'weight': weight,
+            })
+        return configs
+
+    def load_created_case_ids(self, from_block, to_block=None):
+        """
+        读取 CaseCreated 事件
+        返回: (新建的箱子ID列表, 查询到的最新区块)，失败时返回 (None, from_block - 1)
+        """
+        if not self.blockchain_available:
+            return None, from_block - 1
+        try:
+            if to_block is None:
+                to_block = self.poll_block_number()
+            if to_block < from_block:
+                return [], to_block
+            case_ids = [args['caseId'] for _, args in self._get_logs(("CaseCreated",), from_block, to_block)]
+            return case_ids, to_block
+        except Exception as e:
+            print(f"⚠️ 读取 CaseCreated 事件失败: {e}")
+            return None, from_block - 1
+
     def purchase_case(self, account, case_id, amount=1):
         """购买箱子（使用金币）"""
         if not self.blockchain_available:
             return False
         try:
-            tx = self.contract.functions.purchaseCase(case_id, amount).build_transaction({
-                'from': account,
-                'gas': 200000,
-                'gasPrice': self.w3.to_wei('2', 'gwei'),
-                'nonce': self.w3.eth.get_transaction_count(account)
-            })
-            tx_hash = self.w3.eth.send_transaction(tx)
+            tx_hash = self._send_transaction(
+                self.contract.functions.purchaseCase(case_id, amount), account, 200000
+            )
+            if tx_hash is None:
+                return False
             print(f"⏳ 购买箱子: {tx_hash.hex()} 等待确认...")
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            receipt = self._wait_receipt(tx_hash)
             status = getattr(receipt, 'status', 1)
             if status == 1:
                 print(f"✅ 购买成功，获得 {amount} 个箱子")
@@ -524,15 +969,13 @@ class BlockchainManager:
         if not self.blockchain_available:
             return None
         try:
-            tx = self.contract.functions.openCaseFromInventory(case_id).build_transaction({
-                'from': account,
-                'gas': 400000,
-                'gasPrice': self.w3.to_wei('2', 'gwei'),
-                'nonce': self.w3.eth.get_transaction_count(account)
-            })
-            tx_hash = self.w3.eth.send_transaction(tx)
+            tx_hash = self._send_transaction(
+                self.contract.functions.openCaseFromInventory(case_id), account, 400000
+            )
+            if tx_hash is None:
+                return None
             print(f"⏳ 开箱: {tx_hash.hex()} 等待确认...")
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            receipt = self._wait_receipt(tx_hash)
             status = getattr(receipt, 'status', 1)
             if status == 1:
                 print("✅ 开箱成功！")
@@ -556,6 +999,93 @@ class BlockchainManager:
             traceback.print_exc()
             return None
 
+    def _send_pipelined(self, account, calls):
+        """按连续 nonce 依次发出 [(合约函数, 默认 gas 上限, gas 画像键)]，只预执行第一笔，返回已发出的交易哈希"""
+        tx_hashes = []
+        with self._send_lock:
+            nonce = self.w3.eth.get_transaction_count(account, 'pending')
+            for i, (function, gas, profile_key) in enumerate(calls):
+                try:
+                    # 只预执行第一笔：后面的交易依赖前面尚未上链的状态（刚购买的箱子）
+                    tx_hash = self._send_transaction(function, account, gas, nonce=nonce + i,
+                                                     preflight=(i == 0), profile_key=profile_key)
+                except Exception as err:
+                    print(f"⚠️ 批量开箱第 {i + 1} 笔交易发送失败: {err}")
+                    break
+                if tx_hash is None:
+                    break
+                tx_hashes.append(tx_hash)
+        return tx_hashes
+
+    def _wait_pipelined(self, tx_hashes):
+        """等待全部回执并一次解码事件，返回 (CaseOpened 事件参数, 失败交易哈希集合)"""
+        receipts = [self._wait_receipt(tx_hash, decode=False) for tx_hash in tx_hashes]
+        self._apply_receipt_logs([log for receipt in receipts for log in receipt.get('logs', [])])
+        opened = [event['args'] for event in self.last_tx_events if event['event'] == "CaseOpened"]
+        failed = {tx_hash for tx_hash, receipt in zip(tx_hashes, receipts) if getattr(receipt, 'status', 1) != 1}
+        return opened, failed
+
+    def open_cases_bulk(self, account, case_id, count):
+        """
+        批量开箱：库存不足的部分先用金币购买，再按 OPEN_CASE_BATCH 分批调用 openCasesFromInventory
+        所有交易按连续 nonce 一次发出（流水线），再统一等待回执、一次解码全部 CaseOpened 事件，
+        总耗时取决于交易吞吐而不是每个箱子的确认延迟
+        部署的合约没有批量入口，或批量开箱交易 revert 时，改为逐个 openCaseFromInventory
+        返回: [CaseOpened 事件参数, ...]（交易事件可用 pop_tx_events 取出）；没有交易发出时返回 None
+        """
+        if not self.blockchain_available or count <= 0:
+            return None
+        try:
+            functions = self.contract.functions
+            owned = functions.getUserCaseInventory(account, case_id).call()
+            purchase = []
+            if owned < count:
+                purchase.append((functions.purchaseCase(case_id, count - owned), 200000, None))
+            single = [(functions.openCaseFromInventory(case_id), 400000, None)]
+            batched = self.has_function('openCasesFromInventory')
+            if batched:
+                opens = [
+                    (functions.openCasesFromInventory(case_id, min(OPEN_CASE_BATCH, count - start)),
+                     100000 + 300000 * min(OPEN_CASE_BATCH, count - start),
+                     f"openCasesFromInventory[{min(OPEN_CASE_BATCH, count - start)}]")
+                    for start in range(0, count, OPEN_CASE_BATCH)
+                ]
+            else:
+                opens = single * count
+
+            tx_hashes = self._send_pipelined(account, purchase + opens)
+            if not tx_hashes and not purchase and batched:
+                # 批量入口预执行失败（旧合约、或 ABI 与字节码不一致），逐个开启
+                print("⚠️ 批量开箱预执行失败，改为逐个开启")
+                batched = False
+                tx_hashes = self._send_pipelined(account, single * count)
+            if not tx_hashes:
+                return None
+            print(f"⏳ 批量开箱: 已发送 {len(tx_hashes)} 笔交易，等待确认...")
+            opened, failed = self._wait_pipelined(tx_hashes)
+
+            purchase_failed = bool(purchase) and tx_hashes[0] in failed
+            if batched and not purchase_failed and len(opened) < count:
+                # 购买成功但批量开箱交易 revert（或节点拒绝发送）：剩下的箱子逐个开启（第一笔会先预执行）
+                remaining = count - len(opened)
+                print(f"⚠️ 批量开箱交易失败，逐个开启剩余 {remaining} 个箱子")
+                events = self.last_tx_events
+                retry_hashes = self._send_pipelined(account, single * remaining)
+                if retry_hashes:
+                    retry_opened, retry_failed = self._wait_pipelined(retry_hashes)
+                    opened += retry_opened
+                    failed |= retry_failed
+                    self.last_tx_events = events + self.last_tx_events
+            if failed or len(opened) < count:
+                print(f"⚠️ 批量开箱: {len(failed)} 笔交易失败，开启了 {len(opened)}/{count} 个箱子")
+            else:
+                print(f"✅ 批量开箱成功，开启了 {len(opened)} 个箱子")
+            return opened
+        except Exception as err:
+            print(f"批量开箱失败: {err}")
+            traceback.print_exc()
+            return None
+
     def get_user_case_inventory(self, account):
         """获取用户的箱子库存"""
         if not self.blockchain_available:
@@ -619,21 +1149,16 @@ class BlockchainManager:
             return False
 
         try:
-            tx = self.contract.functions.createTradeOffer(
+            tx_hash = self._send_transaction(self.contract.functions.createTradeOffer(
                 weapon_id,
                 buyer_address,
                 price_wei
-            ).build_transaction({
-                'from': account,
-                'gas': 300000,
-                'gasPrice': self.w3.to_wei('2', 'gwei'),
-                'nonce': self.w3.eth.get_transaction_count(account)
-            })
-
-            tx_hash = self.w3.eth.send_transaction(tx)
+            ), account, 300000)
+            if tx_hash is None:
+                return False
             print(f"⏳ 创建交易报价: {tx_hash.hex()} 等待确认...")
 
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            receipt = self._wait_receipt(tx_hash)
             status = getattr(receipt, 'status', 1)
 
             if status == 1:
@@ -675,18 +1200,14 @@ class BlockchainManager:
             return False
 
         try:
-            tx = self.contract.functions.acceptTradeOffer(offer_id).build_transaction({
-                'from': account,
-                'value': price_wei,
-                'gas': 350000,
-                'gasPrice': self.w3.to_wei('2', 'gwei'),
-                'nonce': self.w3.eth.get_transaction_count(account)
-            })
-
-            tx_hash = self.w3.eth.send_transaction(tx)
+            tx_hash = self._send_transaction(
+                self.contract.functions.acceptTradeOffer(offer_id), account, 350000, value=price_wei
+            )
+            if tx_hash is None:
+                return False
             print(f"⏳ 接受交易报价: {tx_hash.hex()} 等待确认...")
 
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            receipt = self._wait_receipt(tx_hash)
             status = getattr(receipt, 'status', 1)
 
             if status == 1:
@@ -718,17 +1239,14 @@ class BlockchainManager:
             return False
 
         try:
-            tx = self.contract.functions.cancelTradeOffer(offer_id).build_transaction({
-                'from': account,
-                'gas': 200000,
-                'gasPrice': self.w3.to_wei('2', 'gwei'),
-                'nonce': self.w3.eth.get_transaction_count(account)
-            })
-
-            tx_hash = self.w3.eth.send_transaction(tx)
+            tx_hash = self._send_transaction(
+                self.contract.functions.cancelTradeOffer(offer_id), account, 200000
+            )
+            if tx_hash is None:
+                return False
             print(f"⏳ 取消交易报价: {tx_hash.hex()} 等待确认...")
 
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            receipt = self._wait_receipt(tx_hash)
             status = getattr(receipt, 'status', 1)
 
             if status == 1:
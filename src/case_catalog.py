@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+武器箱目录 - 内存 + 磁盘缓存，只在出现 CaseCreated 事件时刷新
+"""
+import json
+import os
+
+
+class CaseCatalog:
+    """
+    箱子目录（名称、价格、武器配置及权重）只会因合约所有者调用 createCase 而变化，
+    因此缓存到磁盘，启动后只需增量检查 CaseCreated 事件
+    缓存文件按合约地址区分，重新部署合约后自动重建
+    """
+
+    def __init__(self, cache_file="case_catalog.json"):
+        self.cache_file = cache_file
+        self.cases = []  # [{'id', 'name', 'price', 'coin_price', 'weapon_configs'}]，按 ID 排序
+        self.contract_address = None
+        self.last_block = -1  # 已检查过 CaseCreated 事件的区块
+        self.loaded = False
+
+    def _load_disk(self, contract_address):
+        """读取磁盘缓存，合约地址不一致时忽略"""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"⚠️ 箱子目录缓存读取失败，将重新加载: {e}")
+            return False
+        if str(data.get('contract_address', '')).lower() != str(contract_address).lower():
+            return False
+        self.cases = data.get('cases', [])
+        self.last_block = data.get('last_block', -1)
+        return True
+
+    def _save_disk(self):
+        tmp_path = f"{self.cache_file}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'contract_address': self.contract_address,
+                    'last_block': self.last_block,
+                    'cases': self.cases,
+                }, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            print(f"⚠️ 箱子目录缓存写入失败: {e}")
+
+    def _disk_cache_valid(self, blockchain_manager) -> bool:
+        """本地链重启后合约地址可能不变，用区块高度和箱子数量校验缓存"""
+        if self.last_block > blockchain_manager.poll_block_number():
+            return False
+        next_case_id = blockchain_manager.contract.functions.getNextCaseId().call()
+        return [case['id'] for case in self.cases] == list(range(1, next_case_id))
+
+    def _fetch_case(self, blockchain_manager, case_id):
+        case_info = blockchain_manager.get_case_details(case_id)
+        if not case_info:
+            return None
+        case_info['weapon_configs'] = blockchain_manager.get_case_weapon_configs(case_id)
+        return case_info
+
+    def _rebuild(self, blockchain_manager):
+        """全量加载（首次运行或合约已重新部署）"""
+        block = blockchain_manager.poll_block_number()
+        next_case_id = blockchain_manager.contract.functions.getNextCaseId().call()
+        cases = []
+        for case_id in range(1, next_case_id):
+            case_info = self._fetch_case(blockchain_manager, case_id)
+            if case_info:
+                cases.append(case_info)
+        self.cases = cases
+        self.last_block = block
+        print(f"📦 已加载 {len(cases)} 个武器箱并写入缓存")
+
+    def sync(self, blockchain_manager) -> bool:
+        """
+        同步目录：首次从磁盘恢复，之后只查询新区块中的 CaseCreated 事件
+        返回目录是否有变化
+        """
+        if not blockchain_manager.blockchain_available:
+            return False
+        address = blockchain_manager.contract_address
+        try:
+            if not self.loaded or address != self.contract_address:
+                self.contract_address = address
+                if not self._load_disk(address) or not self._disk_cache_valid(blockchain_manager):
+                    self._rebuild(blockchain_manager)
+                    self._save_disk()
+                    self.loaded = True
+                    return True
+                self.loaded = True
+
+            case_ids, to_block = blockchain_manager.load_created_case_ids(self.last_block + 1)
+            if case_ids is None:
+                return False
+            known = {case['id'] for case in self.cases}
+            added = []
+            for case_id in case_ids:
+                if case_id in known:
+                    continue
+                case_info = self._fetch_case(blockchain_manager, case_id)
+                if case_info:
+                    added.append(case_info)
+                    known.add(case_id)
+            self.last_block = to_block
+            if added:
+                self.cases = sorted(self.cases + added, key=lambda case: case['id'])
+                print(f"📦 新增 {len(added)} 个武器箱")
+                self._save_disk()
+            return bool(added)
+        except Exception as e:
+            print(f"⚠️ 同步箱子目录失败: {e}")
+            return False
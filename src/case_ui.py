@@ -4,7 +4,7 @@
 """
 import pygame
 import os
-from .config import WIDTH, HEIGHT, WHITE, BLACK, GRAY, BLUE, PURPLE, GOLD, GREEN
+from .config import WIDTH, HEIGHT, WHITE, BLACK, GRAY, BLUE, PURPLE, GOLD, GREEN, BULK_OPEN_COUNT
 from .enums import Rarity
 from .utils import get_condition_name, format_wear_value
 class CaseUIRenderer:
@@ -17,6 +17,19 @@ class CaseUIRenderer:
         "走一走瞧一瞧看一看啊！",
     ]
 
+    RARITY_NAMES = {
+        Rarity.COMMON: "普通",
+        Rarity.RARE: "稀有",
+        Rarity.EPIC: "史诗",
+        Rarity.LEGENDARY: "传说"
+    }
+    RARITY_COLORS = {
+        Rarity.COMMON: GRAY,
+        Rarity.RARE: BLUE,
+        Rarity.EPIC: PURPLE,
+        Rarity.LEGENDARY: GOLD
+    }
+
     # 字体缓存（类级别，只加载一次）
     _fonts_loaded = False
     _font = None
@@ -203,7 +216,7 @@ class CaseUIRenderer:
         bottom_rect = pygame.Rect(0, HEIGHT - 60, WIDTH, 60)
         pygame.draw.rect(surface, (220, 200, 170), bottom_rect)
         pygame.draw.line(surface, (150, 130, 100), (0, HEIGHT - 60), (WIDTH, HEIGHT - 60), 2)
-        hints_text = "方向键: 选择箱子  |  回车: 购买  |  B: 查看背包  |  ESC: 返回游戏"
+        hints_text = f"方向键: 选择箱子  |  回车: 购买  |  O: 购买并开启 {BULK_OPEN_COUNT} 个  |  B: 查看背包  |  ESC: 返回游戏"
         hints = small_font.render(hints_text, True, (80, 40, 20))
         surface.blit(hints, (WIDTH // 2 - hints.get_width() // 2, HEIGHT - 38))
     @staticmethod
@@ -221,7 +234,7 @@ class CaseUIRenderer:
         title = large_font.render("🎒 我的箱子", True, BLACK)
         surface.blit(title, (WIDTH // 2 - title.get_width() // 2, 30))
         # 提示
-        hint = small_font.render("使用方向键选择，回车开箱，ESC返回", True, GRAY)
+        hint = small_font.render("使用方向键选择，回车开箱，A 全部打开，ESC返回", True, GRAY)
         surface.blit(hint, (WIDTH // 2 - hint.get_width() // 2, HEIGHT - 30))
         # 获取有库存的箱子
         owned_cases = []
@@ -276,6 +289,9 @@ class CaseUIRenderer:
 
         if not game.opened_weapon:
             return
+        if len(game.opened_weapons) > 1:
+            CaseUIRenderer.draw_case_open_summary(surface, game)
+            return
         # 半透明遮罩
         overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
         overlay.fill((0, 0, 0, 180))
@@ -301,20 +317,8 @@ class CaseUIRenderer:
         name_text = font.render(weapon['name'], True, BLACK)
         surface.blit(name_text, (panel_rect.x + panel_width // 2 - name_text.get_width() // 2, panel_rect.y + 260))
         # 稀有度
-        rarity_names = {
-            Rarity.COMMON: "普通",
-            Rarity.RARE: "稀有",
-            Rarity.EPIC: "史诗",
-            Rarity.LEGENDARY: "传说"
-        }
-        rarity_colors = {
-            Rarity.COMMON: GRAY,
-            Rarity.RARE: BLUE,
-            Rarity.EPIC: PURPLE,
-            Rarity.LEGENDARY: GOLD
-        }
-        rarity_name = rarity_names.get(weapon['rarity'], "未知")
-        rarity_color = rarity_colors.get(weapon['rarity'], BLACK)
+        rarity_name = CaseUIRenderer.RARITY_NAMES.get(weapon['rarity'], "未知")
+        rarity_color = CaseUIRenderer.RARITY_COLORS.get(weapon['rarity'], BLACK)
         rarity_text = font.render(f"稀有度: {rarity_name}", True, rarity_color)
         surface.blit(rarity_text, (panel_rect.x + panel_width // 2 - rarity_text.get_width() // 2, panel_rect.y + 300))
         # 伤害倍率
@@ -322,7 +326,7 @@ class CaseUIRenderer:
         surface.blit(damage_text, (panel_rect.x + panel_width // 2 - damage_text.get_width() // 2, panel_rect.y + 335))
         # 磨损度
         if weapon.get('wear') is not None:
-            wear_str = format_wear_value(weapon['wear'])
+            wear_str = format_wear_value(weapon.get('wear'))
             condition_str = get_condition_name(weapon['wear'])
             wear_text = small_font.render(f"磨损度: {wear_str}", True, BLACK)
             surface.blit(wear_text, (panel_rect.x + panel_width // 2 - wear_text.get_width() // 2, panel_rect.y + 365))
@@ -337,3 +341,85 @@ class CaseUIRenderer:
         # 提示
         hint_text = small_font.render("按任意键关闭", True, GRAY)
         surface.blit(hint_text, (panel_rect.x + panel_width // 2 - hint_text.get_width() // 2, panel_rect.y + panel_height - 20))
+
+    @staticmethod
+    def draw_case_open_summary(surface, game):
+        """绘制批量开箱结果：稀有度统计、最好的掉落和全部掉落列表"""
+        font = CaseUIRenderer._font
+        large_font = CaseUIRenderer._large_font
+        small_font = CaseUIRenderer._small_font
+        weapons = game.opened_weapons
+
+        # 半透明遮罩
+        overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 180))
+        surface.blit(overlay, (0, 0))
+        # 中央面板
+        panel_width = 800
+        panel_height = 620
+        panel_rect = pygame.Rect((WIDTH - panel_width) // 2, (HEIGHT - panel_height) // 2, panel_width, panel_height)
+        pygame.draw.rect(surface, WHITE, panel_rect, border_radius=15)
+        pygame.draw.rect(surface, GOLD, panel_rect, 4, border_radius=15)
+        center_x = panel_rect.x + panel_width // 2
+        # 标题
+        title = large_font.render(f"🎉 开启了 {len(weapons)} 个箱子！", True, GOLD)
+        surface.blit(title, (center_x - title.get_width() // 2, panel_rect.y + 25))
+
+        # 稀有度统计（从高到低）
+        parts = []
+        for rarity in sorted(CaseUIRenderer.RARITY_NAMES, key=lambda r: r.value, reverse=True):
+            count = sum(1 for w in weapons if w['rarity'] == rarity)
+            if count:
+                parts.append(font.render(f"{CaseUIRenderer.RARITY_NAMES[rarity]} ×{count}", True,
+                                         CaseUIRenderer.RARITY_COLORS[rarity]))
+        total_width = sum(p.get_width() for p in parts) + 30 * (len(parts) - 1)
+        x = center_x - total_width // 2
+        for part in parts:
+            surface.blit(part, (x, panel_rect.y + 75))
+            x += part.get_width() + 30
+
+        # 最好的掉落
+        best = game.opened_weapon
+        best_color = CaseUIRenderer.RARITY_COLORS.get(best['rarity'], BLACK)
+        sprite = game.weapon_manager.get_weapon_sprite(best)
+        text_x = panel_rect.x + 60
+        if sprite:
+            scaled_sprite = pygame.transform.scale(sprite, (sprite.get_width() * 2, sprite.get_height() * 2))
+            surface.blit(scaled_sprite, scaled_sprite.get_rect(center=(panel_rect.x + 100, panel_rect.y + 155)))
+            text_x = panel_rect.x + 170
+        best_label = small_font.render("最好的掉落", True, GRAY)
+        surface.blit(best_label, (text_x, panel_rect.y + 120))
+        best_text = font.render(best['name'], True, best_color)
+        surface.blit(best_text, (text_x, panel_rect.y + 145))
+        best_detail = small_font.render(
+            f"伤害倍率: {best['damage_multiplier']:.1f}x  品相: {get_condition_name(best.get('wear'))}", True, BLACK
+        )
+        surface.blit(best_detail, (text_x, panel_rect.y + 175))
+        pygame.draw.line(surface, GRAY, (panel_rect.x + 30, panel_rect.y + 210),
+                         (panel_rect.right - 30, panel_rect.y + 210), 1)
+
+        # 全部掉落（两列，按稀有度从高到低）
+        rows_per_column = 12
+        ordered = sorted(weapons, key=lambda w: (w['rarity'].value, w['damage_multiplier']), reverse=True)
+        shown = ordered[:rows_per_column * 2]
+        for i, weapon in enumerate(shown):
+            column, row = divmod(i, rows_per_column)
+            x = panel_rect.x + 50 + column * (panel_width // 2 - 20)
+            y = panel_rect.y + 225 + row * 24
+            color = CaseUIRenderer.RARITY_COLORS.get(weapon['rarity'], BLACK)
+            line = small_font.render(f"#{weapon['id']}  {weapon['name']}  ({format_wear_value(weapon.get('wear'))})",
+                                     True, color)
+            surface.blit(line, (x, y))
+        if len(ordered) > len(shown):
+            more = small_font.render(f"…… 还有 {len(ordered) - len(shown)} 件", True, GRAY)
+            surface.blit(more, (center_x - more.get_width() // 2, panel_rect.y + 225 + rows_per_column * 24))
+
+        # 关闭按钮
+        btn_rect = pygame.Rect(center_x - 80, panel_rect.y + panel_height - 70, 160, 45)
+        pygame.draw.rect(surface, GREEN, btn_rect, border_radius=5)
+        pygame.draw.rect(surface, BLACK, btn_rect, 2, border_radius=5)
+        btn_text = font.render("确定", True, BLACK)
+        surface.blit(btn_text, (btn_rect.x + btn_rect.width // 2 - btn_text.get_width() // 2, btn_rect.y + 12))
+        # 提示
+        hint_text = small_font.render("按任意键关闭", True, GRAY)
+        surface.blit(hint_text, (center_x - hint_text.get_width() // 2, panel_rect.y + panel_height - 20))
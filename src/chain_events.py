@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+链上事件推送 - WebSocket eth_subscribe，或 HTTP 过滤器 eth_getFilterChanges
+"""
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from hexbytes import HexBytes
+from web3 import Web3
+
+try:
+    from websockets.sync.client import connect as ws_connect
+except ImportError:  # websockets 是 web3 的依赖，正常都会安装
+    ws_connect = None
+
+
+def _to_int(value):
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+
+def normalize_log(raw) -> dict:
+    """把 JSON-RPC 原始日志转换成 web3 get_logs 的格式（整数区块号、HexBytes topics）"""
+    return {
+        'address': Web3.to_checksum_address(raw['address']),
+        'topics': [HexBytes(t) for t in raw.get('topics', [])],
+        'data': HexBytes(raw.get('data', '0x')),
+        'blockNumber': _to_int(raw['blockNumber']),
+        'blockHash': HexBytes(raw['blockHash']),
+        'transactionHash': HexBytes(raw['transactionHash']),
+        'transactionIndex': _to_int(raw['transactionIndex']),
+        'logIndex': _to_int(raw['logIndex']),
+        'removed': raw.get('removed', False),
+    }
+
+
+class ChainEventTransport:
+    """
+    在后台线程接收新区块和本合约日志，放入队列由游戏主循环 drain() 取出（主线程不发 RPC）
+    优先使用 WebSocket 订阅（推送，空闲时没有请求）；不可用时退回 HTTP 过滤器，
+    每 poll_interval 秒一次 eth_blockNumber + eth_getFilterChanges；过滤器也不支持时 active 为 False，由调用方继续轮询
+    模式可用环境变量 CHAIN_TRANSPORT=ws/filter/poll 强制指定
+    """
+
+    def __init__(self, rpc_url, contract_address, ws_url=None, poll_interval=None, provider=None):
+        self.rpc_url = rpc_url
+        self.provider = provider  # 与主连接共用的 HTTP provider（连接池和熔断器），None 时自建
+        self.contract_address = contract_address
+        self.ws_url = ws_url or os.getenv("WS_URL") or self._default_ws_url(rpc_url)
+        self.poll_interval = poll_interval or float(os.getenv("CHAIN_POLL_INTERVAL", "1.0"))
+        self.mode = None  # 'ws' / 'filter' / None
+        self.active = False
+        self.last_block = 0  # 已收到的最新区块
+        self._queue = queue.Queue()
+        self._seen = OrderedDict()  # (交易哈希, logIndex)，补齐和订阅重叠时去重
+        self._block_event = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._w3 = None  # 后台线程使用的 HTTP 连接
+
+    @staticmethod
+    def _default_ws_url(rpc_url):
+        if rpc_url.startswith("http://"):
+            return "ws://" + rpc_url[len("http://"):]
+        if rpc_url.startswith("https://"):
+            return "wss://" + rpc_url[len("https://"):]
+        return None
+
+    def start(self, from_block, timeout=2.0) -> bool:
+        """启动后台线程，等待确定可用的模式；from_block 之后的日志会先补齐"""
+        forced = os.getenv("CHAIN_TRANSPORT", "").lower()
+        if forced == "poll":
+            print("ℹ️ 事件推送已禁用，使用区块轮询")
+            return False
+        self.last_block = from_block
+        self._w3 = Web3(self.provider or Web3.HTTPProvider(self.rpc_url, request_kwargs={"timeout": 5}))
+        ready = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(forced, ready), name="chain-events", daemon=True
+        )
+        self._thread.start()
+        ready.wait(timeout)
+        if self.active:
+            print(f"📡 链上事件推送已启用 ({'WebSocket 订阅' if self.mode == 'ws' else 'HTTP 过滤器'})")
+        else:
+            print("ℹ️ 节点不支持事件订阅/过滤器，使用区块轮询")
+        return self.active
+
+    def stop(self):
+        self._stop.set()
+
+    def drain(self):
+        """取出队列中所有条目：[('block', 区块号)] 和 [('log', 日志)]"""
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                return items
+
+    def wait_for_block(self, after_block, timeout):
+        """阻塞直到收到比 after_block 更新的区块（WebSocket 模式下用于等待交易回执）"""
+        deadline = time.monotonic() + timeout
+        with self._block_event:
+            while self.last_block <= after_block and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._block_event.wait(remaining)
+        return True
+
+    def _on_block(self, number):
+        with self._block_event:
+            if number > self.last_block:
+                self.last_block = number
+                self._queue.put(('block', number))
+            self._block_event.notify_all()
+
+    def _on_log(self, log):
+        key = (HexBytes(log['transactionHash']), log['logIndex'])
+        if key in self._seen or log.get('removed'):
+            return
+        self._seen[key] = True
+        while len(self._seen) > 4096:
+            self._seen.popitem(last=False)
+        self._queue.put(('log', log))
+        if log['blockNumber'] > self.last_block:
+            self._on_block(log['blockNumber'])
+
+    def _backfill(self):
+        """补齐 last_block 之后已经产生的日志（启动或重连时）"""
+        latest = self._w3.eth.block_number
+        if latest > self.last_block:
+            logs = self._w3.eth.get_logs({
+                'address': self.contract_address,
+                'fromBlock': self.last_block + 1,
+                'toBlock': latest,
+            })
+            for log in logs:
+                self._on_log(log)
+            self._on_block(latest)
+
+    def _run(self, forced, ready):
+        while not self._stop.is_set():
+            if forced != "filter" and ws_connect and self.ws_url:
+                try:
+                    self._run_ws(ready)
+                except Exception as e:
+                    if self.mode == 'ws':
+                        print(f"⚠️ WebSocket 订阅中断，改用 HTTP 过滤器: {e}")
+            if self._stop.is_set():
+                return
+            try:
+                self._run_filter(ready)
+            except Exception as e:
+                print(f"⚠️ HTTP 过滤器不可用: {e}")
+                self.active = False
+                self.mode = None
+                ready.set()
+                return
+
+    def _run_ws(self, ready):
+        with ws_connect(self.ws_url, open_timeout=1) as ws:
+            ws.send(json.dumps({"jsonrpc": "2.0", "id": 1, "method": "eth_subscribe", "params": ["newHeads"]}))
+            ws.send(json.dumps({
+                "jsonrpc": "2.0", "id": 2, "method": "eth_subscribe",
+                "params": ["logs", {"address": self.contract_address}],
+            }))
+            subscriptions = {}
+            while len(subscriptions) < 2:
+                reply = json.loads(ws.recv(timeout=2))
+                if 'error' in reply:
+                    raise RuntimeError(reply['error'])
+                if reply.get('id') in (1, 2):
+                    subscriptions[reply['result']] = 'block' if reply['id'] == 1 else 'log'
+            self._backfill()
+            self.mode = 'ws'
+            self.active = True
+            ready.set()
+            while not self._stop.is_set():
+                try:
+                    message = json.loads(ws.recv(timeout=1))
+                except TimeoutError:
+                    continue
+                params = message.get('params') or {}
+                kind = subscriptions.get(params.get('subscription'))
+                if kind == 'block':
+                    self._on_block(_to_int(params['result']['number']))
+                elif kind == 'log':
+                    self._on_log(normalize_log(params['result']))
+
+    def _run_filter(self, ready):
+        # 先建过滤器再补齐，两者重叠的日志由 _on_log 去重
+        log_filter = self._w3.eth.filter({'address': self.contract_address})
+        self._backfill()
+        self.mode = 'filter'
+        self.active = True
+        ready.set()
+        while not self._stop.wait(self.poll_interval):
+            try:
+                # 日志过滤器只在本合约有日志时推进区块；区块高度单独查询（先于日志读取，
+                # 保证推送的区块号之前的日志都已取到），空闲链上按区块的缓存失效和 wait_for_block 也能继续
+                latest = self._w3.eth.block_number
+                changes = log_filter.get_new_entries()
+            except Exception as e:
+                # 节点重启或过滤器过期：补齐缺口后重建过滤器
+                print(f"⚠️ 过滤器失效，正在重建: {e}")
+                try:
+                    log_filter = self._w3.eth.filter({'address': self.contract_address})
+                    self._backfill()
+                except Exception as err:
+                    print(f"⚠️ 重建过滤器失败，稍后重试: {err}")
+                continue
+            for log in changes:
+                self._on_log(log)
+            self._on_block(latest)
@@ -24,6 +24,9 @@ GOLD = (255, 215, 0)
 GRAY = (128, 128, 128)
 DARK_GREEN = (0, 100, 0)
 
+# 箱子商店中一次“购买并开启”的箱子数
+BULK_OPEN_COUNT = 10
+
 # 文件路径
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DEFAULT_TMX_PATH = os.path.join(BASE_DIR, "kenney_roguelike-rpg-pack", "Map", "sample_map.tmx")
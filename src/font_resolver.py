@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+字体解析 - 系统字体扫描只在字体环境变化后执行一次，选中的字体文件路径缓存到磁盘
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import pygame
+from .config import FONT_CANDIDATES
+
+# 本地 assets 字体文件（若用户自行放置），优先于系统字体
+CUSTOM_FONT_PATHS = [
+    "assets/fonts/SimHei.ttf",
+    "assets/fonts/simhei.ttf",
+    "assets/fonts/NotoSansSC-Regular.otf",
+    "assets/fonts/NotoSansSC-Regular.ttf",
+]
+
+# Emoji 字体候选列表
+EMOJI_FONT_CANDIDATES = [
+    'NotoColorEmoji',
+    'Noto Color Emoji',
+    'Segoe UI Emoji',
+    'Apple Color Emoji',
+    'Android Emoji',
+    'EmojiOne Color',
+]
+
+# 字体目录和 fontconfig 配置/缓存目录：安装、删除字体或执行 fc-cache 都会改变其中某个目录的修改时间
+FONT_STATE_DIRS = [
+    "/etc/fonts",
+    "/usr/share/fonts",
+    "/usr/local/share/fonts",
+    "/var/cache/fontconfig",
+    "~/.fonts",
+    "~/.local/share/fonts",
+    "~/.config/fontconfig",
+    "~/.cache/fontconfig",
+    "/System/Library/Fonts",
+    "/Library/Fonts",
+    "~/Library/Fonts",
+    os.path.join(os.environ.get("WINDIR", r"C:\Windows"), "Fonts"),
+    "assets/fonts",
+]
+
+# 试渲染用的字号
+PROBE_SIZE = 20
+
+
+def fontconfig_state_key() -> str:
+    """
+    字体环境指纹：字体目录及其子目录、fontconfig 配置/缓存目录的修改时间，
+    加上候选列表和 pygame 版本；任何一项变化都需要重新扫描
+    """
+    digest = hashlib.sha1()
+    digest.update(json.dumps([
+        sys.platform, pygame.version.ver, FONT_CANDIDATES, EMOJI_FONT_CANDIDATES, CUSTOM_FONT_PATHS,
+        os.environ.get("FONTCONFIG_FILE", ""), os.environ.get("FONTCONFIG_PATH", ""),
+    ]).encode('utf-8'))
+    for root in FONT_STATE_DIRS:
+        root = os.path.expanduser(root)
+        if not os.path.isdir(root):
+            continue
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames.sort()
+            try:
+                mtime = os.stat(dirpath).st_mtime_ns
+            except OSError:
+                continue
+            digest.update(f"{dirpath}:{mtime}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _renders(path, text) -> bool:
+    """字体文件能否正常渲染 text（宽度 > 0）"""
+    try:
+        font = pygame.font.Font(path, PROBE_SIZE)
+        return font.render(text, True, (0, 0, 0)).get_width() > 0
+    except Exception:
+        return False
+
+
+class FontResolver:
+    """
+    原来每个新字号都要调用 pygame.font.get_fonts() 全量扫描并逐个试渲染候选字体，Emoji 字体更是每次都重新探测
+    现在扫描只在第一次运行（或字体环境指纹变化）时执行一次，选中的中文/Emoji 字体文件路径写入磁盘缓存，
+    之后直接按路径加载；每个 (字体族, 字号) 的 Font 对象只创建一次
+    """
+
+    def __init__(self, cache_file="font_cache.json"):
+        self.cache_file = cache_file
+        self.paths = None  # {'chinese': [名称, 路径] 或 None, 'emoji': [名称, 路径] 或 None}
+        self._fonts = {}  # (字体族, 字号) -> Font（没有可用字体时为 None）
+        self._lock = threading.RLock()  # 启动时登录界面字体在后台线程预加载
+
+    def _load_disk(self, state_key):
+        """读取磁盘缓存，指纹不一致或字体文件已不存在时返回 None"""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️ 字体缓存读取失败，将重新扫描: {e}")
+            return None
+        if data.get('state_key') != state_key:
+            return None
+        paths = {family: data.get(family) for family in ('chinese', 'emoji')}
+        if any(entry and not os.path.isfile(entry[1]) for entry in paths.values()):
+            return None
+        return paths
+
+    def _save_disk(self, state_key):
+        tmp_path = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'state_key': state_key, **self.paths}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            print(f"⚠️ 字体缓存写入失败: {e}")
+
+    @staticmethod
+    def _discover():
+        """扫描系统字体，返回选中的字体 {'chinese': [名称, 路径] 或 None, 'emoji': ...}"""
+        chinese = None
+        for path in CUSTOM_FONT_PATHS:
+            if os.path.isfile(path) and _renders(path, "测试中文"):
+                chinese = [os.path.basename(path), path]
+                break
+        if chinese is None:
+            available = set(pygame.font.get_fonts())  # 全部小写
+            for name in FONT_CANDIDATES:
+                key = name.lower().replace(" ", "")
+                # pygame.font.get_fonts() 去掉空格，只保留字母数字；这里做宽松包含匹配
+                if not any(key in f for f in available):
+                    continue
+                path = pygame.font.match_font(name)
+                if path and _renders(path, "测试中文"):
+                    chinese = [name, path]
+                    break
+
+        emoji = None
+        for name in EMOJI_FONT_CANDIDATES:
+            path = pygame.font.match_font(name)
+            if path and _renders(path, "😀"):
+                emoji = [name, path]
+                break
+        return {'chinese': chinese, 'emoji': emoji}
+
+    def resolve(self):
+        """返回选中的字体路径（每个进程只解析一次）"""
+        with self._lock:
+            if self.paths is not None:
+                return self.paths
+            state_key = fontconfig_state_key()
+            self.paths = self._load_disk(state_key)
+            if self.paths is None:
+                self.paths = self._discover()
+                self._save_disk(state_key)
+                source = "扫描"
+            else:
+                source = "缓存"
+            chinese, emoji = self.paths['chinese'], self.paths['emoji']
+            if chinese:
+                print(f"✅ 使用中文字体: {chinese[0]}（{source}）")
+            else:
+                print("⚠️ 未找到合适中文字体，回退默认字体. 建议安装：fonts-wqy-microhei 或 fonts-noto-cjk")
+            if emoji:
+                print(f"✅ 使用Emoji字体: {emoji[0]}（{source}）")
+            else:
+                print("⚠️ 未找到Emoji字体，将使用文本代替Emoji")
+            return self.paths
+
+    def font(self, family, size):
+        """
+        获取字体对象
+
+        Args:
+            family: 'chinese' 或 'emoji'
+            size: 字体大小
+
+        Returns:
+            pygame.font.Font；emoji 没有可用字体时为 None，chinese 回退 pygame 默认字体
+        """
+        with self._lock:
+            cache_key = (family, size)
+            if cache_key in self._fonts:
+                return self._fonts[cache_key]
+            entry = self.resolve().get(family)
+            font = None
+            if entry:
+                try:
+                    font = pygame.font.Font(entry[1], size)
+                except Exception as e:
+                    print(f"⚠️ 字体加载失败 {entry[1]} (size={size}): {e}")
+            if font is None and family == 'chinese':
+                font = pygame.font.Font(None, size)
+            self._fonts[cache_key] = font
+            return font
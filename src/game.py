@@ -5,26 +5,58 @@
 import pygame
 import random
 import math
-from .config import WIDTH, HEIGHT, WHITE, GREEN, LIGHT_GREEN, BLACK, BROWN, RED, GOLD, GRAY, BLUE, PURPLE, DEFAULT_TMX_PATH
+import time
+import queue
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from .config import WIDTH, HEIGHT, WHITE, GREEN, LIGHT_GREEN, BLACK, BROWN, RED, GOLD, GRAY, BLUE, PURPLE, DEFAULT_TMX_PATH, \
+    BULK_OPEN_COUNT
 from .enums import Rarity, WeaponType
 from .tilemap import TileMap, ProceduralTileMap
 from .weapon import WeaponManager
+from .market_index import MarketIndex
+from .paging import PagedSource
+from .leaderboard import LeaderboardEngine
+from .case_catalog import CaseCatalog
+from .account_cache import AccountStateCache
 from .blockchain import BlockchainManager
-from .ui import UIRenderer
+from .score_aggregator import ScoreAggregatorClient
+from .ui import UIRenderer, load_fonts as load_ui_fonts
 from .user_manager import UserManager
 from .auth_ui import AuthUIRenderer, FriendUIRenderer
+from .startup import StartupGraph
+
+# 按账户区分的本地状态（切换账户时存入/取出 AccountStateCache 快照）
+ACCOUNT_STATE_FIELDS = (
+    'score', 'coins', 'weapons', 'listed_weapons', 'current_weapon_index', 'inventory_selection',
+    'case_inventory', 'player_name', 'player_rank', 'total_players',
+    'pending_points', 'provisional_points', 'direct_points', 'applied_event_keys',
+)
+
+# 会改变在售列表的合约事件（增量更新市场索引）
+MARKET_EVENTS = {"WeaponListed", "WeaponSold", "TradeOfferAccepted", "Transfer"}
+
+# 后台直接上链连续失败这么多次后放弃，本地分数交给对账纠正
+MAX_SETTLE_ATTEMPTS = 5
 
 
 class BlockchainGame:
     """区块链除草游戏主类"""
     
-    def __init__(self, account_index: int = 0):
-        # 用户管理器（首先初始化）
-        self.user_manager = UserManager()
-
-        # 区块链管理器
-        self.blockchain_manager = BlockchainManager(account_index)
-        self.blockchain_manager.setup()
+    def __init__(self, account_index: int = 0, blockchain_manager=None, startup_profile=None):
+        # 区块链管理器（可传入 SimulatedChainBackend 等相同接口的后端）
+        self.blockchain_manager = blockchain_manager or BlockchainManager(account_index)
+
+        # 登录界面只依赖用户数据、链连接和登录界面字体，三者互不依赖，并发初始化；
+        # 地图、箱子贴图、市场和游戏界面字体推迟到第一次使用时加载
+        startup = StartupGraph()
+        startup.add("用户数据", UserManager)
+        startup.add("区块链连接", self.blockchain_manager.setup)
+        startup.add("登录界面字体", AuthUIRenderer.preload_fonts)
+        startup.run()
+        if startup_profile is not None:
+            startup_profile.add_graph("并发初始化", startup)
+        self.user_manager = startup.result("用户数据")
         
         # 武器管理器
         self.weapon_manager = WeaponManager()
@@ -46,13 +78,51 @@ class BlockchainGame:
         self.game_state = "login"  # 改为从登录开始
         self.inventory_selection = 0
         self.market_selection = 0
-        self.market_weapons = []
+        self.market_weapons = PagedSource.from_list([])
+        self.market_index = MarketIndex()
+        self.market_index_synced = False  # 索引是否与链上完整在售列表一致（启动和节点重连后在后台全量同步）
+        self.market_sync_task = None  # (Future, 同步期间收到的市场事件)
+        self.market_source = None  # 无筛选、索引未同步时按合约在售顺序分页读取的数据源
+        self.market_page_size = 20
+        # 背包界面按合约中的持有顺序分页读取（含已上架的），只加载选中项附近的页
+        self.inventory_weapons = PagedSource(
+            lambda offset, limit: self.blockchain_manager.load_user_weapons_page(
+                self.blockchain_manager.account, offset, limit, self.weapon_manager.get_weapon_display_name
+            ),
+            lambda: self.blockchain_manager.get_user_weapon_count(self.blockchain_manager.account),
+            page_size=self.market_page_size
+        )
+        self.market_type_filter = None  # None=全部, 否则为 WeaponType
+        self.market_rarity_filter = None  # None=全部, 否则为 Rarity
         self.market_last_refresh_ms = 0
         self.market_refresh_interval_ms = 3000
         self.pending_points = 0
+        self.provisional_points = 0  # 已提交（交易或聚合服务）、等待 WeedCut 事件确认的积分，已计入 score
+        self.direct_points = 0  # 被聚合服务拒绝（如超过限速）、改为直接上链的积分，已计入 score
         self.last_flush_ms = 0
         self.flush_interval_ms = 3000
+        # 设置 SCORE_AGGREGATOR 时积分交给链下聚合服务，由其按结算窗口批量上链
+        self.score_aggregator = ScoreAggregatorClient.from_env()
+        self.aggregator_report_ms = 250
+        self.last_direct_flush_ms = 0
         self.last_refresh_block = 0
+
+        # 链上状态增量更新：交易回执/新区块事件直接修改本地状态，低频后台全量对账
+        self.last_event_block = 0  # 已应用事件的最新区块
+        self.applied_event_keys = OrderedDict()  # (交易哈希, logIndex)，避免回执和区块事件重复应用
+        self.state_version = 0  # 每次增量更新 +1，用于丢弃过期的对账结果
+        self.state_account = None  # 当前本地状态所属的账户
+        self.account_states = AccountStateCache()  # 最近切走的账户快照，事件流持续更新
+        self.reconcile_interval_ms = 30000
+        self.last_reconcile_ms = 0
+        self.reconcile_task = None  # (Future, state_version, account)
+        self.reconcile_executor = None
+        # 直接上链的积分由后台线程逐笔发送（按账户地址提交，切换账户也不阻塞渲染）
+        self.settlement_executor = None
+        self.settlement_results = queue.Queue()  # ('ok' / 'failed', 积分, 地址)，格式同聚合服务客户端的结果
+        self.deferred_points = {}  # 地址 -> 上链失败、等待重试的积分
+        self.settle_attempts = {}  # 地址 -> 连续失败次数
+        self.last_deferred_retry_ms = 0
         
         # 登录/注册状态
         self.login_username = ""
@@ -69,6 +139,12 @@ class BlockchainGame:
         self.register_message = ""
         self.register_success = False
 
+        # 后台认证任务（PBKDF2/RSA 不在渲染线程里跑）
+        self.auth_task = None  # concurrent.futures.Future
+        self.auth_task_kind = None  # 'login' / 'register'
+        self.auth_task_started_ms = 0
+        self.register_redirect_at_ms = 0  # 注册成功后返回登录界面的时间点
+
         # 好友系统状态
         self.friend_tab = 0  # 0=好友列表, 1=好友请求, 2=交易请求, 3=添加好友
         self.friend_selection = 0
@@ -76,6 +152,8 @@ class BlockchainGame:
         self.trade_request_selection = 0
         self.friend_search_text = ""
         self.friend_search_results = []
+        self.last_user_store_check_ms = 0
+        self.user_store_check_interval_ms = 1000  # 检查其他客户端写入的间隔
 
         # 交易系统状态
         self.trade_state = None  # None, 'weapon_selection', 'weapon_detail', 'price_input', 'request_detail'
@@ -91,8 +169,10 @@ class BlockchainGame:
         self.case_inventory = {}  # case_id => amount
         self.case_inventory_selection = 0
         self.all_cases = []  # 所有可用的箱子
+        self.case_catalog = CaseCatalog()  # 箱子目录缓存（CaseCreated 事件驱动刷新）
         self.show_case_open_result = False
-        self.opened_weapon = None  # 开箱获得的武器
+        self.opened_weapon = None  # 开箱获得的武器（批量开箱时为最好的一件）
+        self.opened_weapons = []  # 批量开箱获得的全部武器
 
         # 箱子图片缓存
         self.case_sprites = {}  # case_name => surface
@@ -102,9 +182,12 @@ class BlockchainGame:
         self.player_rank = 0
         self.total_players = 0
 
-        # 排行榜
+        # 排行榜（链下引擎由事件增量构建，不可用时回退到合约 getLeaderboard 的前20名）
+        self.leaderboard_engine = LeaderboardEngine()
+        self.leaderboard_backfill = None  # 首次从区块 0 读取事件的后台任务 Future
         self.leaderboard = []
         self.leaderboard_selection = 0
+        self.leaderboard_page_size = 9
 
         # 个人中心
         self.profile_editing_name = False
@@ -126,30 +209,20 @@ class BlockchainGame:
         self.grass_patch_size = 14
         self.standing_grass_id = None
         
-        # 地图
+        # 地图（第一次进入游戏场景时由 ensure_world() 加载）
+        self.tile_map = None
         self.tile_map_error = None
-        try:
-            self.tile_map = TileMap(DEFAULT_TMX_PATH)
-        except Exception as err:
-            self.tile_map_error = str(err)
-            print(f"⚠️ 无法加载 TMX 地图，使用内置程序化地图: {err}")
-            fallback_size = 1600
-            self.tile_map = ProceduralTileMap(fallback_size, fallback_size)
-        
-        self.world_bounds = pygame.Rect(0, 0, self.tile_map.pixel_width, self.tile_map.pixel_height)
+        self.world_bounds = pygame.Rect(0, 0, WIDTH, HEIGHT)
         self.camera_zoom = 2
         self._update_camera_surface()
         
-        self.player_x = self.world_bounds.width // 2
-        self.player_y = self.world_bounds.height // 2
-        self.update_camera()
-        
         # UI
         self.input_cooldown_ms = 200
         self.last_state_toggle = 0
         self.listing_input_active = False
         self.listing_input_text = ""
         self.listing_suggested_price = None  # 推荐价格（ETH）
+        self.listing_weapon = None  # 正在输入价格的武器
         self.inventory_feedback = ""
         
         # 市场购买确认窗口
@@ -163,8 +236,6 @@ class BlockchainGame:
         # 加载数据（只在非登录状态下加载）
         if self.game_state != "login":
             self.load_player_data()
-            self.generate_grass()
-            self.load_market_weapons()
             self.load_case_data()
         else:
             print("ℹ️  登录状态，跳过游戏数据加载")
@@ -185,6 +256,7 @@ class BlockchainGame:
             self.set_game_state("playing")
         else:
             self.inventory_selection = 0
+            self.inventory_weapons.invalidate()
             self.set_game_state("inventory")
     
     def toggle_market(self):
@@ -260,10 +332,12 @@ class BlockchainGame:
             self.weapons = []
             self.listed_weapons = []
             self.update_weapon_profile(None)
+            self.state_account = None
             return
         
-        # 从区块链加载所有数据
+        # 从区块链加载所有数据（未上链的积分保留在本地）
         self.score, self.coins = self.blockchain_manager.load_player_stats(self.blockchain_manager.account)
+        self.score += self.unsettled_points
         self.weapons, self.listed_weapons = self.blockchain_manager.load_player_weapons(
             self.blockchain_manager.account,
             self.weapon_manager.get_weapon_display_name
@@ -278,27 +352,455 @@ class BlockchainGame:
 
         # 加载玩家名称和排名
         self.player_name = self.blockchain_manager.get_player_name(self.blockchain_manager.account)
-        self.player_rank, self.total_players = self.blockchain_manager.get_player_rank(self.blockchain_manager.account)
+        self.update_player_rank()
 
         # 加载所有可用账户
         self.all_accounts = self.blockchain_manager.get_all_accounts()
         self.account_selection = self.blockchain_manager.account_index
 
+        # 读取固定在缓存区块上，之后的变化由事件增量应用
+        self.last_event_block = self.blockchain_manager.view_cache.block or 0
+        self.last_reconcile_ms = pygame.time.get_ticks()
+        self.state_account = self.blockchain_manager.account
+
         print("✅ 游戏数据加载完成")
-    def load_market_weapons(self):
-        """加载市场武器"""
-        self.market_weapons = self.blockchain_manager.load_market_weapons(
-            self.weapon_manager.get_weapon_display_name
+
+    def _capture_account_state(self):
+        return {field: getattr(self, field) for field in ACCOUNT_STATE_FIELDS}
+
+    def _restore_account_state(self, state):
+        for field in ACCOUNT_STATE_FIELDS:
+            setattr(self, field, state[field])
+        self.update_weapon_profile(self.get_current_weapon())
+
+    def _activate_account(self):
+        """
+        blockchain_manager.account 变更后切换本地状态：切走的账户存入快照缓存，
+        最近用过的账户直接恢复快照（事件流一直在更新它）并马上安排后台对账，否则完整加载
+        """
+        account = self.blockchain_manager.account
+        if self.state_account is not None and self.state_account.lower() != account.lower():
+            # 快照可能被淘汰、随重连清空或随退出丢失，未上链的积分先替原账户提交
+            self._settle_points_before_switch(self.state_account)
+            self.account_states.put(self.state_account, self._capture_account_state())
+            # 快照持有原对象，就地增量（事件去重、箱子库存）不能再改到快照上
+            self.applied_event_keys = OrderedDict(self.applied_event_keys)
+            self.case_inventory = {}
+            self.provisional_points = 0
+        elif self.state_account is not None:
+            self.load_player_data()
+            return
+        state = self.account_states.pop(account) if self.blockchain_manager.blockchain_available else None
+        if state is None:
+            self.load_player_data()
+            self.refresh_case_inventory()
+            return
+        self._restore_account_state(state)
+        self.state_account = account
+        self.state_version += 1
+        if self.leaderboard_engine.synced:
+            self.player_rank, self.total_players = self.leaderboard_engine.rank_of(account)
+        self.account_selection = self.blockchain_manager.account_index
+        # 下一帧就在后台对账，纠正快照可能遗漏的变化
+        self.last_reconcile_ms = pygame.time.get_ticks() - self.reconcile_interval_ms
+        print(f"⚡ 已从快照恢复账户 {account[:10]}... 的状态")
+
+    def _settle_points_before_switch(self, account):
+        """切换账户前把 account 未上链的积分提交出去，提交后计入 provisional 随快照保存，由 WeedCut 事件确认"""
+        aggregator = self.score_aggregator
+        if aggregator is not None:
+            self._drain_aggregator_results(account)
+            if self.pending_points > 0 and aggregator.usable():
+                aggregator.report(account, self.pending_points)
+                self.provisional_points += self.pending_points
+                self.pending_points = 0
+        to_flush = self.pending_points + self.direct_points
+        self.pending_points = 0
+        self.direct_points = 0
+        if to_flush > 0:
+            self._record_points_direct(to_flush, account)
+
+    def _set_owned_weapons(self, weapons, listed_weapons):
+        """替换持有武器列表，保持当前装备的武器不变"""
+        current_id = self.weapons[self.current_weapon_index]['id'] if self.weapons else None
+        weapons.sort(key=lambda w: (-w.rarity.value, w.id))
+        listed_weapons.sort(key=lambda w: (-w.rarity.value, w.id))
+        self.weapons, self.listed_weapons = weapons, listed_weapons
+        ids = [w['id'] for w in weapons]
+        if current_id in ids:
+            self.current_weapon_index = ids.index(current_id)
+        else:
+            self.current_weapon_index = min(self.current_weapon_index, max(0, len(weapons) - 1))
+        self.inventory_selection = min(self.inventory_selection, max(0, len(weapons) + len(listed_weapons) - 1))
+        self.inventory_weapons.invalidate()  # 背包界面重新读取当前页
+        self.update_weapon_profile(self.get_current_weapon())
+
+    def _gain_weapon(self, weapon_id, prefetched=None):
+        """获得武器：按 ID 查询一次并加入背包（prefetched 中已批量查询过的直接使用）"""
+        if any(w['id'] == weapon_id for w in self.weapons + self.listed_weapons):
+            return
+        weapon = (prefetched or {}).get(weapon_id)
+        if weapon is None:
+            weapon = self.blockchain_manager.get_weapon(weapon_id, self.weapon_manager.get_weapon_display_name)
+        if weapon is None:
+            return
+        if weapon.for_sale:
+            self._set_owned_weapons(list(self.weapons), self.listed_weapons + [weapon])
+        else:
+            self._set_owned_weapons(self.weapons + [weapon], list(self.listed_weapons))
+
+    def _lose_weapon(self, weapon_id):
+        """失去武器（售出/转出）"""
+        self._set_owned_weapons(
+            [w for w in self.weapons if w['id'] != weapon_id],
+            [w for w in self.listed_weapons if w['id'] != weapon_id]
         )
+
+    def apply_chain_events(self, events):
+        """
+        把合约事件作为增量应用到本地状态，只处理与当前账户相关的事件
+        快照缓存中的账户也应用同样的增量，切换回来时快照仍是最新的
+        """
+        changed = self._apply_account_events(events)
+        if events and len(self.account_states):
+            self._apply_events_to_cached_accounts(events)
+        return changed
+
+    def _apply_events_to_cached_accounts(self, events):
+        """把快照临时换入本地状态后应用事件，再换回当前账户"""
+        involved = {
+            value.lower() for event in events for value in event['args'].values() if isinstance(value, str)
+        }
+        cached = [(account, state) for account, state in self.account_states.items() if account.lower() in involved]
+        if not cached:
+            return
+        current, version = self._capture_account_state(), self.state_version
+        try:
+            for account, state in cached:
+                self._restore_account_state(state)
+                self._apply_account_events(events, account)
+                state.update(self._capture_account_state())
+        finally:
+            self._restore_account_state(current)
+            self.state_version = version
+
+    def _apply_account_events(self, events, account=None):
+        """
+        把事件应用到当前本地状态（属于 account，默认当前账户）
+        已应用过的事件（同一笔交易的回执和区块日志）会被跳过
+        """
+        me = (account or self.blockchain_manager.account).lower()
+        changed = False
+        prefetched = self._prefetch_gained_weapons(events, me)
+        for event in events:
+            if event['key'] in self.applied_event_keys:
+                continue
+            self.applied_event_keys[event['key']] = True
+            while len(self.applied_event_keys) > 1024:
+                self.applied_event_keys.popitem(last=False)
+
+            name, args = event['event'], event['args']
+            if name == "WeedCut" and args['player'].lower() == me:
+                # 本地已预加的积分只确认，不重复累加
+                confirmed = min(self.provisional_points, args['score'])
+                self.provisional_points -= confirmed
+                self.score += args['score'] - confirmed
+                self.coins += args['coinsEarned']
+            elif name == "PlayerNameSet" and args['player'].lower() == me:
+                self.player_name = args['name']
+            elif name == "WeaponMinted" and args['to'].lower() == me:
+                self._gain_weapon(args['weaponId'], prefetched)
+            elif name == "CaseOpened" and args['player'].lower() == me:
+                self._gain_weapon(args['weaponId'], prefetched)
+            elif name == "CasePurchased" and args['buyer'].lower() == me:
+                case_id = args['caseId']
+                self.case_inventory[case_id] = self.case_inventory.get(case_id, 0) + args['amount']
+                case = next((c for c in self.all_cases if c['id'] == case_id), None)
+                if case:
+                    self.coins -= case['coin_price'] * args['amount']
+            elif name == "WeaponListed":
+                weapon = next((w for w in self.weapons if w['id'] == args['weaponId']), None)
+                if weapon is not None:
+                    listed = weapon.replace(price=args['price'], for_sale=True)
+                    self._set_owned_weapons(
+                        [w for w in self.weapons if w['id'] != weapon['id']],
+                        self.listed_weapons + [listed]
+                    )
+            elif name in ("WeaponSold", "TradeOfferAccepted"):
+                seller = args['from'] if name == "WeaponSold" else args['seller']
+                buyer = args['to'] if name == "WeaponSold" else args['buyer']
+                if seller.lower() == me:
+                    self._lose_weapon(args['weaponId'])
+                if buyer.lower() == me:
+                    self._gain_weapon(args['weaponId'])
+            else:
+                continue
+            changed = True
+        if changed:
+            self.state_version += 1
+        return changed
+
+    def _prefetch_gained_weapons(self, events, me):
+        """一批事件中获得多件新武器时（批量开箱），用 getWeaponDetailsBatch 一次查询"""
+        owned = {w['id'] for w in self.weapons + self.listed_weapons}
+        weapon_ids = [
+            e['args']['weaponId'] for e in events
+            if ((e['event'] == "WeaponMinted" and e['args']['to'].lower() == me)
+                or (e['event'] == "CaseOpened" and e['args']['player'].lower() == me))
+            and e['key'] not in self.applied_event_keys and e['args']['weaponId'] not in owned
+        ]
+        if len(weapon_ids) < 2:
+            return {}
+        try:
+            return {
+                weapon['id']: weapon for weapon in
+                self.blockchain_manager.iter_weapons(weapon_ids, self.weapon_manager.get_weapon_display_name)
+            }
+        except Exception as e:
+            print(f"⚠️ 批量查询新武器失败，逐个查询: {e}")
+            return {}
+
+    def apply_tx_events(self):
+        """应用刚完成的交易回执中的事件"""
+        return self.apply_chain_events(self.blockchain_manager.pop_tx_events())
+
+    def _on_case_opened_from_inventory(self, case_id, count=1):
+        """开箱事件只带武器信息，库存消耗在本地扣减"""
+        if self.case_inventory.get(case_id, 0) > 0:
+            self.case_inventory[case_id] = max(0, self.case_inventory[case_id] - count)
+            if not self.case_inventory[case_id]:
+                del self.case_inventory[case_id]
+
+    def apply_block_events(self, current_block):
+        """轮询模式的新区块：一次 eth_getLogs 取回区间内的合约事件，应用到玩家状态和排行榜"""
+        from_block = self.last_event_block + 1
+        if current_block < from_block:
+            return
+        try:
+            events = self.blockchain_manager.get_contract_events(from_block, current_block)
+        except Exception as e:
+            print(f"⚠️ 读取区块事件失败，等待下次对账: {e}")
+            return
+        self._apply_event_batch(events, current_block)
+
+    def _apply_event_batch(self, events, newest_block):
+        """应用 last_event_block 之后的一批事件到玩家状态和排行榜，返回出现过的事件名"""
+        events = [e for e in events if e['block'] > self.last_event_block]
+        self.apply_chain_events(events)
+        self._apply_market_events(events)
+        engine = self.leaderboard_engine
+        if engine.synced and engine.last_block == self.last_event_block:
+            engine.apply_events([
+                ("score", e['args']['player'], e['args']['score']) if e['event'] == "WeedCut"
+                else ("name", e['args']['player'], e['args']['name'])
+                for e in events if e['event'] in ("WeedCut", "PlayerNameSet")
+            ], newest_block)
+            self.player_rank, self.total_players = engine.rank_of(self.blockchain_manager.account)
+        self.last_event_block = max(self.last_event_block, newest_block)
+        return {e['event'] for e in events}
+
+    def _fetch_reconcile_snapshot(self, account):
+        """后台线程：读取玩家完整链上状态"""
+        bm = self.blockchain_manager
+        score, coins = bm.load_player_stats(account)
+        weapons, listed = bm.load_player_weapons(account, self.weapon_manager.get_weapon_display_name)
+        return {
+            'score': score,
+            'coins': coins,
+            'weapons': weapons,
+            'listed_weapons': listed,
+            'player_name': bm.get_player_name(account),
+            'case_inventory': bm.get_user_case_inventory(account),
+        }
+
+    def tick_reconcile(self, now):
+        """低频后台全量对账，纠正增量更新可能遗漏的变化"""
+        if self.reconcile_task is not None:
+            future, version, account = self.reconcile_task
+            if not future.done():
+                return
+            self.reconcile_task = None
+            try:
+                snapshot = future.result()
+            except Exception as e:
+                print(f"⚠️ 对账失败: {e}")
+                return
+            if version != self.state_version or account != self.blockchain_manager.account:
+                return  # 对账期间本地状态已更新，结果作废，下次再对
+            self._apply_reconcile_snapshot(snapshot)
+            return
+        if now - self.last_reconcile_ms < self.reconcile_interval_ms:
+            return
+        self.last_reconcile_ms = now
+        if self.reconcile_executor is None:
+            self.reconcile_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reconcile")
+        account = self.blockchain_manager.account
+        future = self.reconcile_executor.submit(self._fetch_reconcile_snapshot, account)
+        self.reconcile_task = (future, self.state_version, account)
+
+    def _apply_reconcile_snapshot(self, snapshot):
+        chain_score = snapshot['score'] + self.unsettled_points  # 未上链的积分保留在本地
+        owned = sorted(w['id'] for w in snapshot['weapons'] + snapshot['listed_weapons'])
+        local = sorted(w['id'] for w in self.weapons + self.listed_weapons)
+        drift = (
+            chain_score != self.score or snapshot['coins'] != self.coins or owned != local
+            or len(snapshot['listed_weapons']) != len(self.listed_weapons)
+        )
+        if drift:
+            print("🔄 对账: 本地状态与链上不一致，已按链上数据修正")
+        self.score, self.coins = chain_score, snapshot['coins']
+        self._set_owned_weapons(snapshot['weapons'], snapshot['listed_weapons'])
+        self.player_name = snapshot['player_name']
+        self.case_inventory = snapshot['case_inventory']
+    def load_market_weapons(self):
+        """刷新市场列表（无筛选时按页读取，有筛选时基于市场索引）"""
+        self.refresh_market_view()
         self.market_last_refresh_ms = pygame.time.get_ticks()
+
+    def tick_market_index(self):
+        """
+        市场索引平时只靠上架/成交事件增量更新；启动和节点重连后在后台线程拉取完整在售列表校正一次，
+        同步期间收到的事件在校正后重放
+        """
+        if self.market_sync_task is not None:
+            future, replay = self.market_sync_task
+            if not future.done():
+                return
+            self.market_sync_task = None
+            try:
+                market_weapons = future.result()
+            except Exception as e:
+                print(f"⚠️ 同步市场索引失败: {e}")
+                return
+            self.market_index.sync(market_weapons)
+            self._apply_market_events(replay)
+            self.market_index_synced = True
+            if self.game_state == "marketplace":
+                self.refresh_market_view()
+            return
+        if self.market_index_synced:
+            return
+        if self.reconcile_executor is None:
+            self.reconcile_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reconcile")
+        future = self.reconcile_executor.submit(
+            self.blockchain_manager.load_market_weapons, self.weapon_manager.get_weapon_display_name
+        )
+        self.market_sync_task = (future, [])
+
+    def _apply_market_events(self, events):
+        """把上架/成交/转移事件应用到市场索引，返回是否有市场事件"""
+        events = [e for e in events if e['event'] in MARKET_EVENTS]
+        if not events:
+            return False
+        if self.market_sync_task is not None:
+            self.market_sync_task[1].extend(events)  # 全量同步的结果可能早于这些事件
+        fetched = self._fetch_listed_weapons(events)
+        for event in events:
+            name, args = event['event'], event['args']
+            if name == "WeaponListed":
+                weapon = fetched.get(args['weaponId'])
+                if weapon is not None:
+                    self.market_index.add(weapon.replace(price=args['price'], for_sale=True))
+            else:
+                self.market_index.remove(args['tokenId'] if name == "Transfer" else args['weaponId'])
+        return True
+
+    def _fetch_listed_weapons(self, events):
+        """
+        上架事件只带 ID 和价格：武器详情先取索引和自己库存里已有的（同一批里先转移后上架时索引中的条目会先被移除），
+        都没有的用 getWeaponDetailsBatch 一次查询
+        """
+        known = {w['id']: w for w in self.weapons + self.listed_weapons}
+        fetched = {}
+        for e in events:
+            if e['event'] == "WeaponListed":
+                weapon_id = e['args']['weaponId']
+                weapon = self.market_index.get(weapon_id) or known.get(weapon_id)
+                if weapon is not None:
+                    fetched[weapon_id] = weapon
+        missing = [
+            e['args']['weaponId'] for e in events
+            if e['event'] == "WeaponListed" and e['args']['weaponId'] not in fetched
+        ]
+        if not missing:
+            return fetched
+        try:
+            for weapon in self.blockchain_manager.iter_weapons(missing, self.weapon_manager.get_weapon_display_name):
+                fetched[weapon['id']] = weapon
+        except Exception as e:
+            print(f"⚠️ 查询新上架武器失败，等待下次同步: {e}")
+        return fetched
+        try:
+            for weapon in self.blockchain_manager.iter_weapons(missing, self.weapon_manager.get_weapon_display_name):
+                fetched[weapon['id']] = weapon
+        except Exception as e:
+            print(f"⚠️ 查询新上架武器失败，等待下次同步: {e}")
+        return fetched
+
+    def refresh_market_view(self):
+        """按当前筛选条件生成市场列表"""
+        if self.market_type_filter is None and self.market_rarity_filter is None and self.market_index_synced:
+            # 不筛选：价格顺序来自市场索引，只切出可见区域附近的页
+            self.market_weapons = PagedSource(self.market_index.page, lambda: len(self.market_index),
+                                              page_size=self.market_page_size, background=False)
+        elif self.market_type_filter is None and self.market_rarity_filter is None:
+            # 索引还在后台同步：先按合约中的在售顺序分页读取（只读可见区域附近的页），同步完成后换成价格顺序
+            if self.market_source is None:
+                self.market_source = PagedSource(
+                    lambda offset, limit: self.blockchain_manager.load_market_page(
+                        offset, limit, self.weapon_manager.get_weapon_display_name
+                    ),
+                    self.blockchain_manager.get_market_listing_count,
+                    page_size=self.market_page_size
+                )
+            else:
+                self.market_source.invalidate()
+            self.market_weapons = self.market_source
+        elif not self.market_index_synced:
+            # 筛选基于完整索引：后台同步完成前显示“加载中”，完成后 tick_market_index 会刷新
+            self.market_weapons = PagedSource.placeholder(page_size=self.market_page_size)
+        else:
+            self.market_weapons = PagedSource.from_list(
+                self.market_index.listing(self.market_type_filter, self.market_rarity_filter),
+                page_size=self.market_page_size
+            )
+        if not self.market_weapons.is_loading():
+            self.market_selection = max(0, min(self.market_selection, len(self.market_weapons) - 1))
+
+    def cycle_market_filter(self, kind):
+        """循环切换市场筛选条件：kind 为 'type' 或 'rarity'"""
+        if kind == "type":
+            options = [None] + list(WeaponType)
+            current = self.market_type_filter
+        else:
+            options = [None] + list(Rarity)
+            current = self.market_rarity_filter
+        next_value = options[(options.index(current) + 1) % len(options)]
+        if kind == "type":
+            self.market_type_filter = next_value
+        else:
+            self.market_rarity_filter = next_value
+        self.market_selection = 0
+        self.refresh_market_view()
     
     def load_case_data(self):
-        """加载箱子数据"""
-        self.all_cases = self.blockchain_manager.get_all_cases()
+        """加载箱子数据（目录来自缓存，只有库存需要查询链上）"""
+        if not self.case_catalog.loaded:
+            self.sync_case_catalog()
+        self.refresh_case_inventory()
+
+    def sync_case_catalog(self):
+        """检查新区块中的 CaseCreated 事件，有新箱子时更新目录和贴图"""
+        self.case_catalog.sync(self.blockchain_manager)
+        if self.all_cases is not self.case_catalog.cases:
+            self.all_cases = self.case_catalog.cases
+            self._load_case_sprites()
+
+    def refresh_case_inventory(self):
+        """只刷新玩家的箱子库存"""
         self.case_inventory = self.blockchain_manager.get_user_case_inventory(
             self.blockchain_manager.account
         )
-        self._load_case_sprites()
 
     def _load_case_sprites(self):
         """加载箱子贴图"""
@@ -312,7 +814,7 @@ class BlockchainGame:
 
         for case in self.all_cases:
             case_name = case['name']
-            if case_name in case_name_map:
+            if case_name in case_name_map and case_name not in self.case_sprites:
                 filename = f"{case_name_map[case_name]}.png"
                 sprite_path = os.path.join("箱子图片", filename)
                 try:
@@ -324,22 +826,170 @@ class BlockchainGame:
                 except Exception as err:
                     print(f"⚠️ 箱子图片加载失败 {sprite_path}: {err}")
 
+    def sync_leaderboard(self) -> bool:
+        """
+        把新区块中的 WeedCut / PlayerNameSet 事件应用到排行榜引擎，返回引擎是否可用
+        首次同步要从区块 0 读取全部事件，放到后台线程执行，完成前返回 False（调用方使用合约查询）
+        """
+        engine = self.leaderboard_engine
+        if not engine.synced:
+            self._start_leaderboard_backfill()
+            return False
+        events, to_block = self.blockchain_manager.load_leaderboard_events(engine.last_block + 1)
+        if events is not None:
+            engine.apply_events(events, to_block)
+        return engine.synced
+
+    def _start_leaderboard_backfill(self):
+        if self.leaderboard_backfill is not None:
+            return
+        if self.reconcile_executor is None:
+            self.reconcile_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reconcile")
+        self.leaderboard_backfill = self.reconcile_executor.submit(self.blockchain_manager.load_leaderboard_events, 0)
+
+    def tick_leaderboard_backfill(self):
+        """后台回填完成后在主线程建表，补上回填期间的新区块并刷新排名"""
+        future = self.leaderboard_backfill
+        if future is None or not future.done():
+            return
+        self.leaderboard_backfill = None
+        engine = self.leaderboard_engine
+        try:
+            events, to_block = future.result()
+        except Exception as e:
+            print(f"⚠️ 排行榜回填失败: {e}")
+            return
+        if events is None or engine.synced:
+            return
+        engine.apply_events(events, to_block)
+        print(f"✅ 排行榜已同步到区块 {to_block}，共 {len(engine)} 名玩家")
+        if self.game_state in ("login", "register"):
+            return
+        self.update_player_rank()
+        if self.game_state == "leaderboard":
+            self.load_leaderboard()
+
+    def update_player_rank(self):
+        """刷新当前玩家的排名"""
+        account = self.blockchain_manager.account
+        if self.blockchain_manager.blockchain_available and self.sync_leaderboard():
+            self.player_rank, self.total_players = self.leaderboard_engine.rank_of(account)
+        else:
+            self.player_rank, self.total_players = self.blockchain_manager.get_player_rank(account)
+
     def load_leaderboard(self):
         """加载排行榜"""
-        self.leaderboard = self.blockchain_manager.get_leaderboard(20)
-        self.player_rank, self.total_players = self.blockchain_manager.get_player_rank(
-            self.blockchain_manager.account
-        )
+        if self.blockchain_manager.blockchain_available and self.sync_leaderboard():
+            self.leaderboard = self.leaderboard_engine
+            self.player_rank, self.total_players = self.leaderboard_engine.rank_of(self.blockchain_manager.account)
+        else:
+            self.leaderboard = self.blockchain_manager.get_leaderboard(20)
+            self.player_rank, self.total_players = self.blockchain_manager.get_player_rank(
+                self.blockchain_manager.account
+            )
+        self.leaderboard_selection = max(0, min(self.leaderboard_selection, len(self.leaderboard) - 1))
+
+    def jump_leaderboard_to_player(self):
+        """排行榜定位到当前玩家"""
+        if self.leaderboard is not self.leaderboard_engine:
+            for idx, entry in enumerate(self.leaderboard):
+                if entry['address'].lower() == self.blockchain_manager.account.lower():
+                    self.leaderboard_selection = idx
+            return
+        index = self.leaderboard_engine.index_of(self.blockchain_manager.account)
+        if index is None:
+            print("⚠️ 你还没有上榜")
+            return
+        self.leaderboard_selection = index
+
+    @property
+    def unsettled_points(self):
+        """已计入本地分数、尚未在链上确认的积分"""
+        return self.pending_points + self.provisional_points + self.direct_points
 
     def maybe_flush_points(self):
-        """尝试将积分上链"""
+        """尝试将积分上链（配置了聚合服务时交给聚合服务）"""
         now = pygame.time.get_ticks()
+        aggregator = self.score_aggregator
+        if aggregator is not None:
+            self._drain_aggregator_results()
+            if aggregator.usable():
+                if self.pending_points > 0 and now - self.last_flush_ms >= self.aggregator_report_ms:
+                    aggregator.report(self.blockchain_manager.account, self.pending_points)
+                    self.provisional_points += self.pending_points
+                    self.pending_points = 0
+                    self.last_flush_ms = now
+                if self.direct_points > 0 and now - self.last_direct_flush_ms >= self.flush_interval_ms:
+                    to_flush = self.direct_points
+                    self.direct_points = 0
+                    self.last_direct_flush_ms = now
+                    self._record_points_direct(to_flush)
+                return
         if self.pending_points >= 50 or (self.pending_points > 0 and (now - self.last_flush_ms) >= self.flush_interval_ms):
             to_flush = self.pending_points
             self.pending_points = 0
             self.last_flush_ms = now
-            if self.blockchain_manager.record_score(self.blockchain_manager.account, to_flush):
-                self.score, self.coins = self.blockchain_manager.load_player_stats(self.blockchain_manager.account)
+            self._record_points_direct(to_flush)
+
+    def _record_points_direct(self, points, account=None):
+        """
+        本地状态所属账户（默认当前账户）直接调用 recordWeedCut 上链
+        积分先计入 provisional（由 WeedCut 事件确认），交易在后台线程发送
+        """
+        self.provisional_points += points
+        self._settle_in_background(account or self.blockchain_manager.account, points)
+
+    def _settle_in_background(self, address, points):
+        """把 address 的积分交给后台线程上链，结果放入 settlement_results"""
+        if self.settlement_executor is None:
+            self.settlement_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="settle")
+        self.settlement_executor.submit(self._settle_worker, address, points)
+
+    def _settle_worker(self, address, points):
+        """后台线程：单线程逐笔发送，同一账户的交易不会争用 nonce"""
+        ok = self.blockchain_manager.record_score(address, points)
+        self.settlement_results.put(('ok' if ok else 'failed', points, address))
+
+    def tick_settlements(self, now):
+        """处理后台上链的结果：失败的积分按地址暂存，每个 flush 间隔重试一次，多次失败后交给对账纠正"""
+        while True:
+            try:
+                result, points, address = self.settlement_results.get_nowait()
+            except queue.Empty:
+                break
+            if result == "ok":
+                self.settle_attempts.pop(address, None)
+                continue
+            self.deferred_points[address] = self.deferred_points.get(address, 0) + points
+            self.settle_attempts[address] = self.settle_attempts.get(address, 0) + 1
+        if not self.deferred_points or now - self.last_deferred_retry_ms < self.flush_interval_ms:
+            return
+        if not self.blockchain_manager.blockchain_available:
+            return
+        self.last_deferred_retry_ms = now
+        for address, points in self.deferred_points.items():
+            if self.settle_attempts.get(address, 0) >= MAX_SETTLE_ATTEMPTS:
+                self.settle_attempts.pop(address, None)
+                print(f"⚠️ {address[:10]}... 的 {points} 分多次上链失败，已放弃（本地分数将由对账纠正）")
+                continue
+            self._settle_in_background(address, points)
+        self.deferred_points = {}
+
+    def _drain_aggregator_results(self, account=None):
+        """聚合服务不可用时积分退回待上链；被拒绝（如超过限速）的积分改为直接上链，不会丢失"""
+        account = account or self.blockchain_manager.account
+        for result, points, address in self.score_aggregator.drain():
+            if result == "ok":
+                continue
+            if address.lower() != account.lower():
+                # 上报后已切换账户：在后台替原账户上链，其快照中的 provisional 积分由 WeedCut 事件确认
+                self._settle_in_background(address, points)
+                continue
+            self.provisional_points = max(0, self.provisional_points - points)
+            if result == "failed":
+                self.pending_points += points
+            else:
+                self.direct_points += points
     
     def _update_camera_surface(self):
         """更新相机表面"""
@@ -366,8 +1016,32 @@ class BlockchainGame:
             rect.height
         )
     
+    def ensure_world(self):
+        """第一次进入游戏场景时加载地图并生成草地（登录界面和菜单不需要地图）"""
+        if self.tile_map is None:
+            self.generate_grass()
+
+    def _load_tile_map(self):
+        """加载 TMX 地图，失败时使用程序化地图"""
+        started = time.perf_counter()
+        try:
+            self.tile_map = TileMap(DEFAULT_TMX_PATH)
+        except Exception as err:
+            self.tile_map_error = str(err)
+            print(f"⚠️ 无法加载 TMX 地图，使用内置程序化地图: {err}")
+            fallback_size = 1600
+            self.tile_map = ProceduralTileMap(fallback_size, fallback_size)
+        print(f"🗺️ 地图加载完成 ({(time.perf_counter() - started) * 1000:.0f} ms)")
+
+        self.world_bounds = pygame.Rect(0, 0, self.tile_map.pixel_width, self.tile_map.pixel_height)
+        self.player_x = self.world_bounds.width // 2
+        self.player_y = self.world_bounds.height // 2
+        self.update_camera()
+
     def generate_grass(self):
         """生成草地"""
+        if self.tile_map is None:
+            self._load_tile_map()
         self.grass_patches = []
         patch_size = 18
         target = 150
@@ -441,6 +1115,7 @@ class BlockchainGame:
         """处理玩家移动"""
         if self.game_state != "playing":
             return
+        self.ensure_world()
         keys = pygame.key.get_pressed()
         dx = dy = 0
         if keys[pygame.K_w] or keys[pygame.K_UP]:
@@ -515,6 +1190,7 @@ class BlockchainGame:
     
     def draw_game(self, surface):
         """绘制游戏场景"""
+        self.ensure_world()
         self.scene_surface.fill((0, 0, 0, 0))
         if self.tile_map:
             self.tile_map.draw(self.scene_surface, self.camera_rect)
@@ -599,9 +1275,12 @@ class BlockchainGame:
         """绘制游戏"""
         if self.game_state == "login":
             AuthUIRenderer.draw_login_screen(surface, self)
-        elif self.game_state == "register":
+            return
+        if self.game_state == "register":
             AuthUIRenderer.draw_register_screen(surface, self)
-        elif self.game_state == "friends":
+            return
+        load_ui_fonts()  # 游戏界面字体在离开登录界面后才加载
+        if self.game_state == "friends":
             FriendUIRenderer.draw_friends_menu(surface, self)
             # 如果正在交易，绘制交易界面覆盖在好友界面上
             if self.trade_state == 'weapon_selection':
@@ -649,24 +1328,88 @@ class BlockchainGame:
 
     def tick_auto_refresh(self):
         """自动刷新区块链数据"""
+        now = pygame.time.get_ticks()
+        self.tick_auth_task(now)
+        self.tick_user_store_refresh(now)
+        change = self.blockchain_manager.tick_health()
+        if change == 'online':
+            self._on_chain_reconnected()
         if not self.blockchain_manager.blockchain_available or not self.blockchain_manager.w3:
             return
-        now = pygame.time.get_ticks()
+        if self.game_state not in ("login", "register"):
+            self.tick_settlements(now)
+            self.tick_reconcile(now)
+            self.tick_market_index()
+            self.tick_leaderboard_backfill()
+        transport = self.blockchain_manager.event_transport
+        if transport is not None and transport.active:
+            # 推送模式：只处理后台线程收到的区块和日志，主循环不发 RPC
+            self.tick_event_transport(transport)
+            return
         if now - getattr(self, 'last_auto_refresh_ms', 0) < 500:
             return
         self.last_auto_refresh_ms = now
         try:
-            current_block = self.blockchain_manager.w3.eth.block_number
+            current_block = self.blockchain_manager.poll_block_number()
         except Exception:
             return
         if current_block != self.last_refresh_block:
             self.last_refresh_block = current_block
-            self.load_player_data()
+            if self.game_state not in ("login", "register"):
+                self.apply_block_events(current_block)
+            if self.case_catalog.loaded:
+                self.sync_case_catalog()
             if self.game_state == "marketplace":
                 self.load_market_weapons()
         if self.game_state == "marketplace" and now - self.market_last_refresh_ms >= self.market_refresh_interval_ms:
             self.load_market_weapons()
     
+    def _on_chain_reconnected(self):
+        """节点恢复后重新加载链上数据（离线期间的事件可能已错过）"""
+        if self.game_state in ("login", "register"):
+            return
+        current_user_data = self.user_manager.users.get(self.user_manager.current_user, {})
+        wallet_address = current_user_data.get('wallet_address')
+        if wallet_address:
+            self.blockchain_manager.account = wallet_address  # 重新 setup 时账户会被重置
+        self.account_states.clear()  # 离线期间的事件可能已错过，快照不再可信
+        self.load_player_data()
+        self.load_case_data()
+        # 离线期间的上架/成交可能已错过：丢弃进行中的同步，重新全量同步
+        self.market_index_synced = False
+        self.market_sync_task = None
+        if self.game_state == "marketplace":
+            self.load_market_weapons()
+
+    def tick_event_transport(self, transport):
+        """应用推送来的合约日志；只在相关事件出现时刷新箱子目录和市场"""
+        items = transport.drain()
+        if not items:
+            return
+        logs = [item for kind, item in items if kind == 'log']
+        newest = max(item if kind == 'block' else item['blockNumber'] for kind, item in items)
+        self.last_refresh_block = max(self.last_refresh_block, newest)
+        if not logs:
+            return
+        self.blockchain_manager.view_cache.advance(max(log['blockNumber'] for log in logs))
+        events = self.blockchain_manager.decode_logs(logs)
+        if self.game_state in ("login", "register"):
+            return
+        names = self._apply_event_batch(events, newest)
+        if "CaseCreated" in names and self.case_catalog.loaded:
+            self.sync_case_catalog()
+        if names & MARKET_EVENTS and self.game_state == "marketplace":
+            self.load_market_weapons()
+
+    def tick_user_store_refresh(self, now):
+        """同步其他本地客户端写入的好友/交易数据（只比较文件戳，开销很小）"""
+        if not self.user_manager.current_user:
+            return
+        if now - self.last_user_store_check_ms < self.user_store_check_interval_ms:
+            return
+        self.last_user_store_check_ms = now
+        self.user_manager.refresh_if_changed()
+
     def mint_random_weapon(self):
         """铸造随机武器"""
         if not self.blockchain_manager.blockchain_available:
@@ -686,7 +1429,7 @@ class BlockchainGame:
         print(f"🎲 铸造武器: {name} (稀有度: {rarity.name}, 伤害: x{damage_multiplier/100:.2f})")
 
         if self.blockchain_manager.mint_weapon(self.blockchain_manager.account, name, rarity.value, damage_multiplier):
-            self.load_player_data()
+            self.apply_tx_events()
             print(f"✅ 成功铸造 {name}！")
 
     def start_purchase_confirm(self, weapon):
@@ -735,7 +1478,7 @@ class BlockchainGame:
                     weapon['id'],
                     weapon['coin_price']
                 ):
-                    self.load_player_data()
+                    self.apply_tx_events()
                     self.load_market_weapons()
             else:
                 print(f"⚠️ 金币不足！需要 {weapon['coin_price']} 金币，当前 {self.coins} 金币")
@@ -746,8 +1489,9 @@ class BlockchainGame:
                 weapon['id'],
                 weapon['price']
             ):
-                self.load_player_data()
-                self.load_market_weapons()
+                self.apply_tx_events()
+                self.market_index.remove(weapon['id'])
+                self.refresh_market_view()
         else:
             print("⚠️ 武器未设置价格")
 
@@ -757,32 +1501,33 @@ class BlockchainGame:
             pygame.key.stop_text_input()
         self.listing_input_active = False
         self.listing_input_text = ""
+        self.listing_weapon = None
     
-    def start_listing_current_weapon(self):
-        """开始上架当前武器"""
-        if not self.weapons:
-            self.inventory_feedback = "⚠️ 当前没有武器可上架"
+    def start_listing_current_weapon(self, weapon=None):
+        """开始上架当前选中（或指定）的武器"""
+        if weapon is None:
+            if not self.inventory_weapons:
+                self.inventory_feedback = "⚠️ 当前没有武器可上架"
+                return
+            weapon = self.inventory_weapons[self.inventory_selection]
+            if weapon is None:
+                return  # 所在页还在加载
+        if weapon.get('for_sale', False):
+            self.inventory_feedback = f"⚠️ 武器 #{weapon['id']:02d} 已在市场上架"
             return
+        self.listing_weapon = weapon
 
-        weapon = self.weapons[self.inventory_selection]
-
-        # 计算推荐价格：查找市场上相同类型和稀有度的最低价
+        # 计算推荐价格：查找市场上相同类型和稀有度的最低价（索引还在后台同步时不给推荐价）
         self.listing_suggested_price = None
-        similar_weapons = [
-            w for w in self.market_weapons
-            if w.get('rarity') == weapon.get('rarity') and
-               self.weapon_manager.detect_weapon_type(w.get('original_name', '')) ==
-               self.weapon_manager.detect_weapon_type(weapon.get('original_name', ''))
-        ]
+        min_price_wei = None
+        if self.market_index_synced:
+            min_price_wei = self.market_index.floor_price(weapon['weapon_type'], weapon['rarity'])
 
-        if similar_weapons:
-            # 找到最低价格
-            min_price_wei = min(w['price'] for w in similar_weapons if w['price'] > 0)
-            if min_price_wei > 0 and self.blockchain_manager.blockchain_available and self.blockchain_manager.w3:
-                # 推荐价格为最低价 - 0.1 ETH
-                min_price_eth = float(self.blockchain_manager.w3.from_wei(min_price_wei, 'ether'))
-                suggested_eth = max(0.01, min_price_eth - 0.1)  # 最低0.01 ETH
-                self.listing_suggested_price = suggested_eth
+        if min_price_wei and self.blockchain_manager.blockchain_available and self.blockchain_manager.w3:
+            # 推荐价格为最低价 - 0.1 ETH
+            min_price_eth = float(self.blockchain_manager.w3.from_wei(min_price_wei, 'ether'))
+            suggested_eth = max(0.01, min_price_eth - 0.1)  # 最低0.01 ETH
+            self.listing_suggested_price = suggested_eth
 
         pygame.key.start_text_input()
         self.listing_input_active = True
@@ -807,10 +1552,11 @@ class BlockchainGame:
                 if price <= 0:
                     raise ValueError("非正价格")
                 price_wei = self.blockchain_manager.w3.to_wei(round(price, 6), 'ether') if self.blockchain_manager.blockchain_available and self.blockchain_manager.w3 else None
-                weapon = self.weapons[self.inventory_selection]
+                weapon = self.listing_weapon
                 if self.blockchain_manager.list_weapon_for_sale(self.blockchain_manager.account, weapon['id'], price_wei):
-                    self.load_player_data()
-                    self.load_market_weapons()
+                    self.apply_tx_events()
+                    self.market_index.add(weapon.replace(price=price_wei, for_sale=True))
+                    self.refresh_market_view()
                     display_price = self.format_price_display(price_wei)
                     self.inventory_feedback = f"✅ 已将武器 #{weapon['id']:02d} 上架，价格 {display_price}"
                 else:
@@ -839,13 +1585,16 @@ class BlockchainGame:
             return
 
         if event.key in (pygame.K_RETURN, pygame.K_KP_ENTER, pygame.K_e):
-            # 装备该武器
+            # 装备该武器（背包页里的记录按 ID 对应到本地持有列表）
             weapon = self.inventory_detail_weapon
-            weapon_index = self.weapons.index(weapon)
-            self.current_weapon_index = weapon_index
-            self.update_weapon_profile(weapon)
             self.inventory_detail_active = False
             self.inventory_detail_weapon = None
+            ids = [w['id'] for w in self.weapons]
+            if weapon['id'] not in ids:
+                self.inventory_feedback = "⚠️ 已上架的武器不能装备"
+                return
+            self.current_weapon_index = ids.index(weapon['id'])
+            self.update_weapon_profile(self.get_current_weapon())
             print(f"✅ 已装备武器: {weapon['name']}")
             return
 
@@ -854,17 +1603,17 @@ class BlockchainGame:
             weapon = self.inventory_detail_weapon
             self.inventory_detail_active = False
             self.inventory_detail_weapon = None
-            weapon_index = self.weapons.index(weapon)
-            self.inventory_selection = weapon_index
-            self.start_listing_current_weapon()
+            self.start_listing_current_weapon(weapon)
             return
 
     def handle_inventory_input(self, event):
         """处理背包输入"""
-        if not self.weapons:
+        if not self.inventory_weapons:
             if event.type == pygame.KEYDOWN and event.key == pygame.K_i:
                 self.toggle_inventory()
             return
+        # 重新读取后列表可能变短
+        self.inventory_selection = min(self.inventory_selection, len(self.inventory_weapons) - 1)
 
         if event.type == pygame.KEYDOWN:
             # 如果详情窗口已打开，处理详情窗口的输入
@@ -879,11 +1628,12 @@ class BlockchainGame:
             if event.key == pygame.K_UP:
                 self.inventory_selection = max(0, self.inventory_selection - 1)
             elif event.key == pygame.K_DOWN:
-                self.inventory_selection = min(len(self.weapons) - 1, self.inventory_selection + 1)
+                self.inventory_selection = min(len(self.inventory_weapons) - 1, self.inventory_selection + 1)
             elif event.key in (pygame.K_RETURN, pygame.K_KP_ENTER):
-                # 打开武器详情窗口
-                weapon = self.weapons[self.inventory_selection]
-                self.open_inventory_detail(weapon)
+                # 打开武器详情窗口（所在页还在加载时忽略）
+                weapon = self.inventory_weapons[self.inventory_selection]
+                if weapon is not None:
+                    self.open_inventory_detail(weapon)
             elif event.key == pygame.K_i:
                 self.toggle_inventory()
             elif event.key == pygame.K_l:
@@ -896,7 +1646,13 @@ class BlockchainGame:
                 self.toggle_market()
             elif event.type == pygame.KEYDOWN and event.key == pygame.K_r:
                 self.load_market_weapons()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_t:
+                self.cycle_market_filter("type")
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_f:
+                self.cycle_market_filter("rarity")
             return
+        # 后台刷新后列表可能变短
+        self.market_selection = min(self.market_selection, len(self.market_weapons) - 1)
 
         if event.type == pygame.KEYDOWN:
             # 如果购买确认窗口已打开，处理确认窗口的输入
@@ -909,11 +1665,16 @@ class BlockchainGame:
             elif event.key == pygame.K_DOWN:
                 self.market_selection = min(len(self.market_weapons) - 1, self.market_selection + 1)
             elif event.key in (pygame.K_RETURN, pygame.K_KP_ENTER):
-                # 打开购买确认窗口
+                # 打开购买确认窗口（所在页还在加载时忽略）
                 weapon = self.market_weapons[self.market_selection]
-                self.start_purchase_confirm(weapon)
+                if weapon:
+                    self.start_purchase_confirm(weapon)
             elif event.key == pygame.K_r:
                 self.load_market_weapons()
+            elif event.key == pygame.K_t:
+                self.cycle_market_filter("type")
+            elif event.key == pygame.K_f:
+                self.cycle_market_filter("rarity")
             elif event.key == pygame.K_m:
                 self.toggle_market()
 
@@ -983,10 +1744,19 @@ class BlockchainGame:
     def handle_leaderboard_input(self, event):
         """处理排行榜输入"""
         if event.type == pygame.KEYDOWN:
+            last = max(0, len(self.leaderboard) - 1)
             if event.key == pygame.K_UP:
                 self.leaderboard_selection = max(0, self.leaderboard_selection - 1)
             elif event.key == pygame.K_DOWN:
-                self.leaderboard_selection = min(len(self.leaderboard) - 1, self.leaderboard_selection + 1)
+                self.leaderboard_selection = min(last, self.leaderboard_selection + 1)
+            elif event.key == pygame.K_PAGEUP:
+                self.leaderboard_selection = max(0, self.leaderboard_selection - self.leaderboard_page_size)
+            elif event.key == pygame.K_PAGEDOWN:
+                self.leaderboard_selection = min(last, self.leaderboard_selection + self.leaderboard_page_size)
+            elif event.key == pygame.K_HOME:
+                self.leaderboard_selection = 0
+            elif event.key == pygame.K_m:
+                self.jump_leaderboard_to_player()
             elif event.key == pygame.K_r:
                 # 刷新排行榜
                 self.load_leaderboard()
@@ -1003,8 +1773,8 @@ class BlockchainGame:
             elif event.key in (pygame.K_RETURN, pygame.K_KP_ENTER):
                 # 切换账户
                 if self.blockchain_manager.switch_account(self.account_selection):
-                    # 重新加载玩家数据
-                    self.load_player_data()
+                    # 最近用过的账户从快照恢复，否则重新加载
+                    self._activate_account()
                     self.game_state = "start_menu"
                     print(f"✅ 已切换到账户 {self.account_selection}")
             elif event.key == pygame.K_ESCAPE:
@@ -1053,11 +1823,18 @@ class BlockchainGame:
                             1
                         ):
                             print(f"✅ 购买 {case['name']} 成功！")
-                            # 刷新数据
-                            self.load_player_data()
-                            self.load_case_data()
+                            self.apply_tx_events()
                     else:
                         print(f"⚠️ 金币不足！需要 {case['coin_price']} 金币")
+            elif event.key == pygame.K_o:
+                # 购买并开启 BULK_OPEN_COUNT 个（已有库存的先用库存）
+                if self.case_shop_selection < len(self.all_cases):
+                    case = self.all_cases[self.case_shop_selection]
+                    missing = max(0, BULK_OPEN_COUNT - self.case_inventory.get(case['id'], 0))
+                    if self.coins >= case['coin_price'] * missing:
+                        self.open_cases_bulk(case, BULK_OPEN_COUNT)
+                    else:
+                        print(f"⚠️ 金币不足！需要 {case['coin_price'] * missing} 金币")
             elif event.key == pygame.K_b:
                 # 查看背包
                 self.game_state = "case_inventory"
@@ -1089,6 +1866,12 @@ class BlockchainGame:
                 if self.case_inventory_selection < len(owned_cases):
                     case, count = owned_cases[self.case_inventory_selection]
                     self.open_case(case)
+            elif event.key == pygame.K_a:
+                # 全部打开
+                if self.case_inventory_selection < len(owned_cases):
+                    case, count = owned_cases[self.case_inventory_selection]
+                    self.open_cases_bulk(case, count)
+                    self.case_inventory_selection = 0
             elif event.key == pygame.K_ESCAPE:
                 self.game_state = "case_shop"
 
@@ -1102,9 +1885,9 @@ class BlockchainGame:
         )
 
         if result:
-            # 刷新数据
-            self.load_player_data()
-            self.load_case_data()
+            # 按回执事件更新背包，库存在本地扣减（箱子目录不会因开箱变化）
+            self.apply_tx_events()
+            self._on_case_opened_from_inventory(case['id'])
 
             # 如果返回的是武器ID，则根据ID查找武器
             if isinstance(result, int):
@@ -1112,7 +1895,7 @@ class BlockchainGame:
                 all_weapons = self.weapons + self.listed_weapons
                 self.opened_weapon = next((w for w in all_weapons if w['id'] == result), None)
                 if self.opened_weapon:
-                    weapon_type = self.weapon_manager.detect_weapon_type(self.opened_weapon.get('original_name', ''))
+                    weapon_type = self.opened_weapon['weapon_type'].value
                     print(f"🎉 恭喜获得：{self.opened_weapon['name']}！")
                     print(f"   武器ID: {self.opened_weapon['id']}")
                     print(f"   原始名称: {self.opened_weapon.get('original_name', 'N/A')}")
@@ -1135,8 +1918,133 @@ class BlockchainGame:
         else:
             print("❌ 开箱失败")
 
+    def open_cases_bulk(self, case, count):
+        """批量开箱（库存不足的部分先购买），结果弹窗显示全部掉落的汇总"""
+        print(f"🎁 正在开启 {count} 个 {case['name']}...")
+        opened = self.blockchain_manager.open_cases_bulk(self.blockchain_manager.account, case['id'], count)
+        if opened is None:
+            print("❌ 开箱失败")
+            return
+        # 一次应用所有回执事件（购买的箱子、新武器）
+        self.apply_tx_events()
+        if not opened:
+            print("❌ 开箱失败")
+            return
+        self._on_case_opened_from_inventory(case['id'], len(opened))
+
+        owned = {w['id']: w for w in self.weapons + self.listed_weapons}
+        self.opened_weapons = [owned[args['weaponId']] for args in opened if args['weaponId'] in owned]
+        if not self.opened_weapons:
+            return
+        self.opened_weapon = max(self.opened_weapons, key=lambda w: (w['rarity'].value, w['damage_multiplier']))
+        print(f"🎉 开启 {len(opened)} 个箱子，最好的掉落：{self.opened_weapon['name']}！")
+        self.show_case_open_result = True
+
     # ==================== 登录/注册处理 ====================
 
+    def is_auth_pending(self, kind=None):
+        """是否有正在进行的后台登录/注册"""
+        if self.auth_task is None:
+            return False
+        return kind is None or self.auth_task_kind == kind
+
+    def start_login(self):
+        """在后台线程发起登录，结果由 tick_auth_task 处理"""
+        if self.is_auth_pending():
+            return
+        self.auth_task = self.user_manager.login_async(self.login_username, self.login_password)
+        self.auth_task_kind = "login"
+        self.auth_task_started_ms = pygame.time.get_ticks()
+        self.login_message = ""
+
+    def start_register(self):
+        """在后台线程发起注册，结果由 tick_auth_task 处理"""
+        if self.is_auth_pending():
+            return
+        if self.register_password != self.register_confirm_password:
+            self.register_message = "两次密码输入不一致"
+            self.register_success = False
+            return
+        self.auth_task = self.user_manager.register_user_async(
+            self.register_username,
+            self.register_email,
+            self.register_password
+        )
+        self.auth_task_kind = "register"
+        self.auth_task_started_ms = pygame.time.get_ticks()
+        self.register_message = ""
+
+    def tick_auth_task(self, now):
+        """每帧检查后台认证任务是否完成"""
+        if self.register_redirect_at_ms and now >= self.register_redirect_at_ms:
+            self.register_redirect_at_ms = 0
+            if self.game_state == "register":
+                # 注册成功，返回登录
+                self.game_state = "login"
+                self.login_username = self.register_username
+                self.register_username = ""
+                self.register_email = ""
+                self.register_password = ""
+                self.register_confirm_password = ""
+                self.register_message = ""
+
+        if self.auth_task is None or not self.auth_task.done():
+            return
+        task, kind = self.auth_task, self.auth_task_kind
+        self.auth_task = None
+        self.auth_task_kind = None
+        # 后台线程只做密钥派生，读写 user_manager.users 的部分在这里（主线程）完成
+        try:
+            if kind == "login":
+                result = self.user_manager.finish_login(task.result())
+            else:
+                result = self.user_manager.finish_register(task.result())
+        except Exception as e:
+            print(f"❌ 认证失败: {e}")
+            result = (False, "认证失败，请重试") if kind == "login" else (False, "注册失败，请重试", None)
+
+        if kind == "login":
+            self._finish_login(*result)
+        else:
+            self._finish_register(*result)
+
+    def _finish_login(self, success, message):
+        """登录结果回到主线程后的处理"""
+        self.login_message = message
+        self.login_success = success
+        if not success:
+            print(f"❌ {message}")
+            return
+
+        print(f"✅ {message}")
+        # 登录成功，更新区块链账户地址
+        current_user_data = self.user_manager.users.get(self.user_manager.current_user, {})
+        wallet_address = current_user_data.get('wallet_address')
+        if wallet_address:
+            self.blockchain_manager.account = wallet_address
+            print(f"🔗 切换到用户钱包: {wallet_address[:10]}...")
+        # 加载游戏数据
+        print("🔄 正在加载游戏数据...")
+        self._activate_account()
+        print("✅ 游戏数据加载完成")
+        # 进入开始菜单
+        self.game_state = "start_menu"
+        self.login_username = ""
+        self.login_password = ""
+        self.login_message = ""
+
+    def _finish_register(self, success, message, wallet):
+        """注册结果回到主线程后的处理"""
+        self.register_message = message
+        self.register_success = success
+        if success:
+            print(f"✅ {message}")
+            print(f"   钱包地址: {wallet}")
+            # 停留 1.5 秒展示结果（不阻塞渲染）
+            self.register_redirect_at_ms = pygame.time.get_ticks() + 1500
+        else:
+            print(f"❌ {message}")
+
     def handle_login_input(self, event):
         """处理登录输入"""
         if event.type == pygame.KEYDOWN:
@@ -1156,33 +2064,7 @@ class BlockchainGame:
                     self.login_password = self.login_password[:-1]
             elif event.key in (pygame.K_RETURN, pygame.K_KP_ENTER):
                 # 尝试登录
-                success, message = self.user_manager.login(self.login_username, self.login_password)
-                self.login_message = message
-                self.login_success = success
-
-                if success:
-                    print(f"✅ {message}")
-                    # 登录成功，更新区块链账户地址
-                    current_user_data = self.user_manager.users.get(self.user_manager.current_user, {})
-                    wallet_address = current_user_data.get('wallet_address')
-                    if wallet_address:
-                        self.blockchain_manager.account = wallet_address
-                        print(f"🔗 切换到用户钱包: {wallet_address[:10]}...")
-                    # 加载游戏数据
-                    print("🔄 正在加载游戏数据...")
-                    self.load_player_data()
-                    self.generate_grass()
-                    self.load_market_weapons()
-                    self.load_case_data()
-                    print("✅ 游戏数据加载完成")
-                    # 进入开始菜单
-                    pygame.time.wait(500)
-                    self.game_state = "start_menu"
-                    self.login_username = ""
-                    self.login_password = ""
-                    self.login_message = ""
-                else:
-                    print(f"❌ {message}")
+                self.start_login()
             elif event.key == pygame.K_ESCAPE:
                 return "quit"
             elif event.unicode and len(event.unicode) > 0:
@@ -1208,35 +2090,13 @@ class BlockchainGame:
 
             # 检测登录按钮
             elif hasattr(self, 'login_login_button') and self.login_login_button.collidepoint(mouse_x, mouse_y):
-                success, message = self.user_manager.login(self.login_username, self.login_password)
-                self.login_message = message
-                self.login_success = success
-
-                if success:
-                    print(f"✅ {message}")
-                    # 登录成功，更新区块链账户地址
-                    current_user_data = self.user_manager.users.get(self.user_manager.current_user, {})
-                    wallet_address = current_user_data.get('wallet_address')
-                    if wallet_address:
-                        self.blockchain_manager.account = wallet_address
-                        print(f"🔗 切换到用户钱包: {wallet_address[:10]}...")
-                    # 加载游戏数据
-                    print("🔄 正在加载游戏数据...")
-                    self.load_player_data()
-                    self.generate_grass()
-                    self.load_market_weapons()
-                    self.load_case_data()
-                    print("✅ 游戏数据加载完成")
-                    pygame.time.wait(500)
-                    self.game_state = "start_menu"
-                    self.login_username = ""
-                    self.login_password = ""
-                    self.login_message = ""
+                self.start_login()
 
             # 检测注册按钮
             elif hasattr(self, 'login_register_button') and self.login_register_button.collidepoint(mouse_x, mouse_y):
                 self.game_state = "register"
                 self.register_message = ""
+                self.user_manager.key_pool.start()  # 用户填表期间预生成密钥
 
     def handle_register_input(self, event):
         """处理注册输入"""
@@ -1264,32 +2124,7 @@ class BlockchainGame:
                     self.register_confirm_password = self.register_confirm_password[:-1]
             elif event.key in (pygame.K_RETURN, pygame.K_KP_ENTER):
                 # 尝试注册
-                if self.register_password != self.register_confirm_password:
-                    self.register_message = "两次密码输入不一致"
-                    self.register_success = False
-                else:
-                    success, message, wallet = self.user_manager.register_user(
-                        self.register_username,
-                        self.register_email,
-                        self.register_password
-                    )
-                    self.register_message = message
-                    self.register_success = success
-
-                    if success:
-                        print(f"✅ {message}")
-                        print(f"   钱包地址: {wallet}")
-                        pygame.time.wait(1500)
-                        # 注册成功，返回登录
-                        self.game_state = "login"
-                        self.login_username = self.register_username
-                        self.register_username = ""
-                        self.register_email = ""
-                        self.register_password = ""
-                        self.register_confirm_password = ""
-                        self.register_message = ""
-                    else:
-                        print(f"❌ {message}")
+                self.start_register()
             elif event.key == pygame.K_ESCAPE:
                 # 返回登录
                 self.game_state = "login"
@@ -1328,27 +2163,7 @@ class BlockchainGame:
 
             # 检测确认按钮
             elif hasattr(self, 'register_confirm_button') and self.register_confirm_button.collidepoint(mouse_x, mouse_y):
-                if self.register_password != self.register_confirm_password:
-                    self.register_message = "两次密码输入不一致"
-                    self.register_success = False
-                else:
-                    success, message, wallet = self.user_manager.register_user(
-                        self.register_username,
-                        self.register_email,
-                        self.register_password
-                    )
-                    self.register_message = message
-                    self.register_success = success
-
-                    if success:
-                        pygame.time.wait(1500)
-                        self.game_state = "login"
-                        self.login_username = self.register_username
-                        self.register_username = ""
-                        self.register_email = ""
-                        self.register_password = ""
-                        self.register_confirm_password = ""
-                        self.register_message = ""
+                self.start_register()
 
             # 检测取消按钮
             elif hasattr(self, 'register_cancel_button') and self.register_cancel_button.collidepoint(mouse_x, mouse_y):
@@ -1719,7 +2534,7 @@ class BlockchainGame:
 
                 # 保存武器数据
                 user_data['local_weapons'][str(weapon_id)] = weapon_data
-                self.user_manager.save_data()
+                self.user_manager.save_data(current_user)
                 print(f"💾 武器 {weapon_id} 已保存到本地存储")
 
             # 在区块链上创建 P2P 交易报价
@@ -1922,8 +2737,8 @@ class BlockchainGame:
                 if success:
                     print(f"✅ {msg}")
 
-                # 从区块链重新加载玩家数据
-                self.load_player_data()
+                # 按回执事件更新背包
+                self.apply_tx_events()
 
                 self.trade_state = None
                 self.trade_request_detail = None
@@ -1942,8 +2757,6 @@ class BlockchainGame:
             self.trade_state = None
             self.trade_request_detail = None
 
-        self.load_player_data()
-
         # 返回好友列表
         self.trade_state = None
         self.trade_request_detail = None
@@ -1968,3 +2781,4 @@ class BlockchainGame:
         """关闭开箱结果"""
         self.show_case_open_result = False
         self.opened_weapon = None
+        self.opened_weapons = []
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+交易 gas 画像 - 按合约函数记录最近回执的 gasUsed，学习 gas 上限并缓存到磁盘
+"""
+import json
+import math
+import os
+import threading
+
+# 每个函数保留的最近样本数
+SAMPLE_WINDOW = 20
+# 学习值 = 最近最大 gasUsed × GAS_MARGIN + GAS_HEADROOM（覆盖存储槽首次写入等分支差异）
+GAS_MARGIN = 1.25
+GAS_HEADROOM = 20000
+MIN_GAS_LIMIT = 21000
+
+
+class GasProfiles:
+    """
+    合约写函数的 gas 上限原本是写死的保守值（20~50 万），实际消耗通常只有一半甚至更少
+    每笔成功交易的回执 gasUsed 计入对应函数的样本，下次发送时按样本计算上限；
+    没有样本时使用调用方给出的默认值。因 gas 不足失败时清空该函数的样本，回到默认值
+    样本只代表最近走过的分支；发送前预执行的 estimate_gas 会与这里的上限取较大值
+    缓存文件按合约地址区分，重新部署合约后重新学习
+    """
+
+    def __init__(self, cache_file="gas_profiles.json"):
+        self.cache_file = cache_file
+        self.contract_address = None
+        self.samples = {}  # 函数名 -> [gasUsed, ...]（旧 -> 新）
+        self._lock = threading.Lock()  # 主线程和后台结算线程都会记录回执
+
+    def bind(self, contract_address):
+        """切换到指定合约的画像（从磁盘恢复）"""
+        if self.contract_address is not None and \
+                str(contract_address).lower() == str(self.contract_address).lower():
+            return
+        self.contract_address = contract_address
+        self.samples = {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"⚠️ gas 画像缓存读取失败，将重新学习: {e}")
+            return
+        if str(data.get('contract_address', '')).lower() != str(contract_address).lower():
+            return
+        self.samples = {
+            name: [int(v) for v in values][-SAMPLE_WINDOW:]
+            for name, values in data.get('samples', {}).items()
+        }
+
+    def _save_disk(self):
+        tmp_path = f"{self.cache_file}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'contract_address': self.contract_address,
+                    'samples': self.samples,
+                }, f, indent=2)
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            print(f"⚠️ gas 画像缓存写入失败: {e}")
+
+    def gas_limit(self, function_name, default):
+        """返回函数的 gas 上限：有样本时按最近的最大消耗计算，否则为 default"""
+        values = self.samples.get(function_name)
+        if not values:
+            return default
+        limit = max(values) * GAS_MARGIN + GAS_HEADROOM
+        return max(MIN_GAS_LIMIT, int(math.ceil(limit / 1000.0)) * 1000)
+
+    def record(self, function_name, gas_used, gas_limit, success):
+        """记录一笔交易的回执；gas 耗尽导致的失败会清空该函数的样本"""
+        with self._lock:
+            if not success:
+                if gas_used >= gas_limit and self.samples.pop(function_name, None) is not None:
+                    print(f"⚠️ {function_name} 的 gas 上限 {gas_limit} 不足，已恢复默认值")
+                    self._save_disk()
+                return
+            values = self.samples.setdefault(function_name, [])
+            values.append(int(gas_used))
+            del values[:-SAMPLE_WINDOW]
+            self._save_disk()
+
+    def stats(self) -> dict:
+        return {name: {'samples': len(values), 'max': max(values)} for name, values in self.samples.items() if values}
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+RSA 密钥池 - 后台预生成好友交易用的密钥对，注册时直接取用
+"""
+import queue
+import threading
+import time
+from typing import Tuple
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.backends import default_backend
+
+
+def generate_rsa_key_pair(key_size: int = 2048) -> Tuple[str, str]:
+    """生成一对 RSA 密钥，返回 (私钥 PEM, 公钥 PEM)"""
+    private_key = rsa.generate_private_key(
+        public_exponent=65537,
+        key_size=key_size,
+        backend=default_backend()
+    )
+    private_pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    ).decode('utf-8')
+    public_pem = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode('utf-8')
+    return private_pem, public_pem
+
+
+class RSAKeyPool:
+    """
+    保持 size 对密钥就绪，被取走后由后台线程补齐
+    后台线程在第一次 start()/take()/wait_until_full() 时才启动，不需要注册的进程不会占用 CPU
+    """
+
+    def __init__(self, size: int = 2, key_size: int = 2048):
+        self.size = size
+        self.key_size = key_size
+        self._keys = queue.Queue()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """启动后台补货线程（可重复调用）"""
+        with self._start_lock:
+            if self._thread is not None or self._stopped:
+                return
+            self._thread = threading.Thread(target=self._fill_loop, name="rsa-key-pool", daemon=True)
+            self._thread.start()
+
+    def _fill_loop(self):
+        """后台补货循环：池满时休眠，直到有密钥被取走"""
+        while not self._stopped:
+            if self._keys.qsize() >= self.size:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            try:
+                self._keys.put(generate_rsa_key_pair(self.key_size))
+            except Exception as e:
+                print(f"⚠️ 预生成 RSA 密钥失败: {e}")
+                self._wakeup.wait(1.0)
+
+    def take(self) -> Tuple[str, str]:
+        """取一对密钥 (私钥 PEM, 公钥 PEM)；池空时当场生成"""
+        try:
+            pair = self._keys.get_nowait()
+        except queue.Empty:
+            pair = generate_rsa_key_pair(self.key_size)
+        self.start()
+        self._wakeup.set()
+        return pair
+
+    def available(self) -> int:
+        """当前可直接取用的密钥数"""
+        return self._keys.qsize()
+
+    def resize(self, size: int):
+        """调整池容量（批量注册前可临时调大）"""
+        self.size = size
+        self._wakeup.set()
+
+    def wait_until_full(self, timeout: float = None) -> bool:
+        """阻塞等待池补满，用于批量脚本预热"""
+        self.start()
+        deadline = None if timeout is None else time.time() + timeout
+        while self._keys.qsize() < self.size:
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stop(self):
+        """停止后台线程"""
+        self._stopped = True
+        self._wakeup.set()
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+链下排行榜 - 由 WeedCut / PlayerNameSet 事件增量构建
+"""
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+
+class RankedList:
+    """
+    支持按位置访问的有序列表（分桶有序列表 + 桶长度的树状数组）
+    插入、删除、按值求位置、按位置取值均为 O(log n)（桶内移动为连续内存拷贝）
+    """
+
+    BUCKET_SIZE = 512
+
+    def __init__(self):
+        self._buckets: List[list] = []
+        self._maxes: list = []  # 每个桶的最大值
+        self._tree: List[int] = [0]  # 桶长度的树状数组（下标从 1 开始）
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for bucket in self._buckets:
+            yield from bucket
+
+    def _rebuild_tree(self):
+        tree = [0] * (len(self._buckets) + 1)
+        for i, bucket in enumerate(self._buckets, 1):
+            tree[i] += len(bucket)
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, pos, delta):
+        i = pos + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, pos) -> int:
+        """前 pos 个桶的元素总数"""
+        total = 0
+        i = pos
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, index) -> Tuple[int, int]:
+        """全局位置 -> (桶号, 桶内位置)"""
+        pos = 0
+        remaining = index
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(self._tree) and self._tree[nxt] <= remaining:
+                pos = nxt
+                remaining -= self._tree[nxt]
+            step >>= 1
+        return pos, remaining
+
+    def update(self, values):
+        """批量插入；列表为空时整体排序后分桶，比逐个插入快得多"""
+        if self._buckets:
+            for value in values:
+                self.add(value)
+            return
+        ordered = sorted(values)
+        size = self.BUCKET_SIZE
+        self._buckets = [ordered[i:i + size] for i in range(0, len(ordered), size)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._len = len(ordered)
+        self._rebuild_tree()
+
+    def add(self, value):
+        if not self._buckets:
+            self._buckets.append([value])
+            self._maxes.append(value)
+            self._len = 1
+            self._rebuild_tree()
+            return
+        pos = bisect.bisect_left(self._maxes, value)
+        if pos == len(self._maxes):
+            pos -= 1
+            self._buckets[pos].append(value)
+            self._maxes[pos] = value
+        else:
+            bisect.insort(self._buckets[pos], value)
+        self._len += 1
+        bucket = self._buckets[pos]
+        if len(bucket) > 2 * self.BUCKET_SIZE:
+            half = len(bucket) // 2
+            self._buckets[pos:pos + 1] = [bucket[:half], bucket[half:]]
+            self._maxes[pos:pos + 1] = [bucket[half - 1], bucket[-1]]
+            self._rebuild_tree()
+        else:
+            self._tree_add(pos, 1)
+
+    def remove(self, value):
+        pos = bisect.bisect_left(self._maxes, value)
+        if pos == len(self._maxes):
+            raise ValueError(f"{value!r} 不在列表中")
+        bucket = self._buckets[pos]
+        i = bisect.bisect_left(bucket, value)
+        if i == len(bucket) or bucket[i] != value:
+            raise ValueError(f"{value!r} 不在列表中")
+        del bucket[i]
+        self._len -= 1
+        if bucket:
+            self._maxes[pos] = bucket[-1]
+            self._tree_add(pos, -1)
+        else:
+            del self._buckets[pos]
+            del self._maxes[pos]
+            self._rebuild_tree()
+
+    def bisect_left(self, value) -> int:
+        """value 应插入的全局位置（即小于 value 的元素个数）"""
+        pos = bisect.bisect_left(self._maxes, value)
+        if pos == len(self._maxes):
+            return self._len
+        return self._prefix(pos) + bisect.bisect_left(self._buckets[pos], value)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._len
+        if index < 0 or index >= self._len:
+            raise IndexError(index)
+        pos, offset = self._locate(index)
+        return self._buckets[pos][offset]
+
+    def islice(self, start, stop):
+        """按位置顺序取 [start, stop) 的元素"""
+        start = max(0, start)
+        stop = min(stop, self._len)
+        if start >= stop:
+            return []
+        pos, offset = self._locate(start)
+        result = []
+        while len(result) < stop - start and pos < len(self._buckets):
+            bucket = self._buckets[pos]
+            result.extend(bucket[offset:offset + (stop - start - len(result))])
+            pos += 1
+            offset = 0
+        return result
+
+
+class LeaderboardEngine:
+    """
+    排行榜引擎：分数按 WeedCut 事件累加，名称取最后一次 PlayerNameSet
+    排序键为 (-分数, 首次出现序号)，同分玩家共享名次（与合约 getPlayerRank 一致）
+    可以像列表一样使用：len(engine) / engine[i] 返回第 i 名的条目字典
+    """
+
+    def __init__(self):
+        self._scores: Dict[str, int] = {}
+        self._names: Dict[str, str] = {}
+        self._order: Dict[str, int] = {}  # 地址(小写) -> 首次出现序号，用于稳定排序
+        self._addresses: Dict[str, str] = {}  # 地址(小写) -> 原始地址
+        self._ranked = RankedList()
+        self.last_block = -1  # 已处理到的区块
+        self.synced = False
+
+    def __len__(self):
+        return len(self._ranked)
+
+    def __getitem__(self, index):
+        if index < 0 or index >= len(self._ranked):
+            raise IndexError(index)
+        return self._entry(self._ranked[index])
+
+    def reset(self):
+        """清空数据（切换链或合约后需要从头同步）"""
+        self.__init__()
+
+    def _key(self, address) -> str:
+        key = address.lower()
+        if key not in self._order:
+            self._order[key] = len(self._order)
+            self._addresses[key] = address
+            self._scores[key] = 0
+            self._ranked.add((0, self._order[key], key))
+        return key
+
+    def add_score(self, address, points):
+        """应用一条 WeedCut 事件"""
+        key = self._key(address)
+        old = self._scores[key]
+        if not points:
+            return
+        self._ranked.remove((-old, self._order[key], key))
+        self._scores[key] = old + points
+        self._ranked.add((-(old + points), self._order[key], key))
+
+    def set_name(self, address, name):
+        """应用一条 PlayerNameSet 事件（设置名称的玩家也会进入榜单）"""
+        self._names[self._key(address)] = name
+
+    def apply_events(self, events, to_block):
+        """
+        按链上顺序应用事件
+        events: [(kind, address, value)]，kind 为 "score" 或 "name"
+        """
+        # 先按玩家合并分数（分数只做累加，合并后每个玩家只需调整一次排序位置）
+        deltas = {}
+        for kind, address, value in events:
+            key = address.lower()
+            if key not in deltas:
+                deltas[key] = [address, 0]
+            if kind == "score":
+                deltas[key][1] += value
+            elif kind == "name":
+                self._names[key] = value
+
+        if not self._ranked:
+            # 首次同步：直接整体建表
+            for key, (address, points) in deltas.items():
+                self._order[key] = len(self._order)
+                self._addresses[key] = address
+                self._scores[key] = points
+            self._ranked.update((-self._scores[key], self._order[key], key) for key in deltas)
+        else:
+            for address, points in deltas.values():
+                self.add_score(address, points)
+        self.last_block = max(self.last_block, to_block)
+        self.synced = True
+
+    def _rank_for_score(self, score) -> int:
+        """分数对应的名次 = 1 + 分数更高的玩家数"""
+        return self._ranked.bisect_left((-score,)) + 1
+
+    def _entry(self, item) -> dict:
+        neg_score, _, key = item
+        address = self._addresses[key]
+        name = self._names.get(key)
+        return {
+            'rank': self._rank_for_score(-neg_score),
+            'address': address,
+            'name': name if name else f"玩家{address[:6]}",
+            'score': -neg_score,
+        }
+
+    def score_of(self, address) -> int:
+        return self._scores.get(address.lower(), 0)
+
+    def index_of(self, address) -> Optional[int]:
+        """玩家在榜单中的位置（从 0 开始），未上榜返回 None"""
+        key = address.lower()
+        if key not in self._order:
+            return None
+        return self._ranked.bisect_left((-self._scores[key], self._order[key], key))
+
+    def rank_of(self, address) -> Tuple[int, int]:
+        """返回 (名次, 总人数)，未上榜的玩家按 0 分计算名次"""
+        return self._rank_for_score(self.score_of(address)), len(self._ranked)
+
+    def window(self, start, count) -> List[dict]:
+        """榜单第 start 位起的 count 条"""
+        return [self._entry(item) for item in self._ranked.islice(start, start + count)]
+
+    def top(self, n) -> List[dict]:
+        return self.window(0, n)
+
+    def around(self, address, radius=5) -> List[dict]:
+        """玩家上下各 radius 名的窗口"""
+        index = self.index_of(address)
+        if index is None:
+            return []
+        start = max(0, index - radius)
+        return self.window(start, index - start + radius + 1)
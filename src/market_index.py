@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+市场索引 - 按 (类型, 稀有度, 品相) 分组的有序价格阶梯
+"""
+import bisect
+import heapq
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
+
+class MarketIndex:
+    """
+    在售武器索引，随上架/售出增量更新
+    每组价格阶梯是按 (price, weapon_id) 升序的列表，查询最低价/前N/价格区间为 O(log n)
+    """
+
+    def __init__(self):
+        self._weapons = {}  # weapon_id -> Weapon
+        self._ladders: Dict[Tuple, List[Tuple[int, int]]] = {}  # (类型, 稀有度, 品相) -> [(price, id)]
+        self._ordered: List[Tuple[int, int, int]] = []  # 市场默认排序 [(price, -rarity, id)]
+
+    def __len__(self):
+        return len(self._weapons)
+
+    def __contains__(self, weapon_id):
+        return weapon_id in self._weapons
+
+    @staticmethod
+    def _group_key(weapon) -> Tuple:
+        return weapon.weapon_type, weapon.rarity, weapon.condition
+
+    @staticmethod
+    def _order_key(weapon) -> Tuple[int, int, int]:
+        return weapon.price, -weapon.rarity.value, weapon.id
+
+    def get(self, weapon_id):
+        """按 ID 获取在售武器"""
+        return self._weapons.get(weapon_id)
+
+    def add(self, weapon):
+        """武器上架（已存在则按新价格更新）"""
+        if weapon.id in self._weapons:
+            self.remove(weapon.id)
+        self._weapons[weapon.id] = weapon
+        bisect.insort(self._ladders.setdefault(self._group_key(weapon), []), (weapon.price, weapon.id))
+        bisect.insort(self._ordered, self._order_key(weapon))
+
+    def remove(self, weapon_id):
+        """武器售出或下架，返回被移除的武器"""
+        weapon = self._weapons.pop(weapon_id, None)
+        if weapon is None:
+            return None
+        key = self._group_key(weapon)
+        ladder = self._ladders[key]
+        del ladder[bisect.bisect_left(ladder, (weapon.price, weapon.id))]
+        if not ladder:
+            del self._ladders[key]
+        order_key = self._order_key(weapon)
+        del self._ordered[bisect.bisect_left(self._ordered, order_key)]
+        return weapon
+
+    def sync(self, weapons) -> Tuple[int, int]:
+        """
+        用一次完整的市场快照校正索引，只改动有差异的条目
+        返回: (新增/更新数量, 移除数量)
+        """
+        fresh = {w.id: w for w in weapons}
+        removed = [weapon_id for weapon_id in self._weapons if weapon_id not in fresh]
+        for weapon_id in removed:
+            self.remove(weapon_id)
+
+        changed = 0
+        for weapon_id, weapon in fresh.items():
+            current = self._weapons.get(weapon_id)
+            if (current is None or current.price != weapon.price or current.owner != weapon.owner
+                    or current.condition != weapon.condition):
+                self.add(weapon)
+                changed += 1
+            elif current is not weapon:
+                self._weapons[weapon_id] = weapon  # 排序键未变，直接替换记录
+        return changed, len(removed)
+
+    def _matching_ladders(self, weapon_type=None, rarity=None, condition=None) -> List[List[Tuple[int, int]]]:
+        """筛选条件为 None 表示不限"""
+        return [
+            ladder for (wtype, wrarity, wcondition), ladder in self._ladders.items()
+            if (weapon_type is None or wtype is weapon_type)
+            and (rarity is None or wrarity is rarity)
+            and (condition is None or wcondition is condition)
+        ]
+
+    def floor_price(self, weapon_type=None, rarity=None, condition=None) -> Optional[int]:
+        """同组最低有效价格 (wei)，没有在售时返回 None"""
+        best = None
+        for ladder in self._matching_ladders(weapon_type, rarity, condition):
+            i = bisect.bisect_left(ladder, (1,))  # 跳过价格为 0 的条目
+            if i < len(ladder) and (best is None or ladder[i][0] < best):
+                best = ladder[i][0]
+        return best
+
+    def best_n(self, n, weapon_type=None, rarity=None, condition=None) -> List:
+        """价格最低的 n 把"""
+        merged = heapq.merge(*self._matching_ladders(weapon_type, rarity, condition))
+        return [self._weapons[weapon_id] for _, weapon_id in islice(merged, n)]
+
+    def price_range(self, low, high, weapon_type=None, rarity=None, condition=None) -> List:
+        """价格在 [low, high] (wei) 之间的武器，按价格升序"""
+        slices = []
+        for ladder in self._matching_ladders(weapon_type, rarity, condition):
+            lo = bisect.bisect_left(ladder, (low,))
+            hi = bisect.bisect_right(ladder, (high, float('inf')))
+            slices.append(ladder[lo:hi])
+        return [self._weapons[weapon_id] for _, weapon_id in heapq.merge(*slices)]
+
+    def page(self, offset, limit) -> List:
+        """无筛选市场列表的一页（排序同 listing），只取这一页的条目"""
+        return [self._weapons[weapon_id] for _, _, weapon_id in self._ordered[offset:offset + limit]]
+
+    def listing(self, weapon_type=None, rarity=None) -> List:
+        """市场列表（价格升序、同价高稀有度优先），可按类型/稀有度筛选"""
+        if weapon_type is None and rarity is None:
+            return [self._weapons[weapon_id] for _, _, weapon_id in self._ordered]
+        ladders = self._matching_ladders(weapon_type, rarity)
+        merged = heapq.merge(*ladders, key=lambda e: (e[0], -self._weapons[e[1]].rarity.value, e[1]))
+        return [self._weapons[weapon_id] for _, weapon_id in merged]
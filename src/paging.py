@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+分页数据源 - 列表界面只取选中项附近的页
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PagedSource:
+    """
+    按页读取的列表：页在后台线程加载并放入有上限的 LRU 缓存，
+    未加载的条目返回 None（界面显示“加载中”），不会阻塞渲染
+    fetch_page(offset, limit) -> list，count_func() -> 总数；后台模式下总数也在加载线程读取，
+    读到之前长度为 0，is_loading() 为 True
+    """
+
+    def __init__(self, fetch_page, count_func, page_size=20, max_cached_pages=8, background=True):
+        self.fetch_page = fetch_page
+        self.count_func = count_func
+        self.page_size = page_size
+        self.max_cached_pages = max_cached_pages
+        self.background = background
+        self._pages = OrderedDict()  # page_no -> list (LRU)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._generation = 0
+        self._total = None
+        self._total_pending = False
+
+    @classmethod
+    def from_list(cls, items, page_size=20):
+        """包装一个已在内存中的列表（同步取页）"""
+        return cls(lambda offset, limit: items[offset:offset + limit], lambda: len(items),
+                   page_size=page_size, max_cached_pages=len(items) // page_size + 1, background=False)
+
+    @classmethod
+    def placeholder(cls, page_size=20):
+        """数据还没准备好时的占位列表：长度为 0，is_loading() 为 True"""
+        source = cls(lambda offset, limit: [], lambda: 0, page_size=page_size)
+        source._total_pending = True  # 不提交总数读取，直到被替换
+        return source
+
+    def __len__(self):
+        if self._total is None:
+            if not self.background:
+                return self._load_total(self._generation)
+            self._request_total()
+            return 0
+        return self._total
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, index):
+        """返回已加载的条目；所在页未加载时触发加载并返回 None"""
+        if index < 0 or index >= len(self):
+            raise IndexError(index)
+        page_no = index // self.page_size
+        with self._lock:
+            page = self._pages.get(page_no)
+            if page is not None:
+                self._pages.move_to_end(page_no)
+        if page is None:
+            page = self._request_page(page_no)
+            if page is None:
+                return None
+        offset = index - page_no * self.page_size
+        return page[offset] if offset < len(page) else None
+
+    def ensure_window(self, start, count):
+        """确保可见区域所在的页已加载，并预取下一页"""
+        if not len(self):
+            return
+        first = max(0, start) // self.page_size
+        last = max(0, min(start + count, len(self)) - 1) // self.page_size
+        for page_no in range(first, last + 2):  # 多取一页作为预取
+            if page_no * self.page_size >= len(self):
+                break
+            with self._lock:
+                cached = page_no in self._pages
+            if not cached:
+                self._request_page(page_no)
+
+    def is_loading(self) -> bool:
+        with self._lock:
+            return bool(self._pending) or self._total is None
+
+    def invalidate(self):
+        """数据已变化：清空缓存和总数，正在进行的加载结果会被丢弃"""
+        with self._lock:
+            self._generation += 1
+            self._pages.clear()
+            self._pending.clear()
+            self._total = None
+            self._total_pending = False
+
+    def _submit(self, func, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="page-loader")
+        self._executor.submit(func, *args)
+
+    def _request_total(self):
+        """提交总数读取任务（加载线程按提交顺序执行，之后的取页任务能用上这次读取的结果）"""
+        with self._lock:
+            if self._total_pending:
+                return
+            self._total_pending = True
+            generation = self._generation
+        self._submit(self._load_total, generation)
+
+    def _load_total(self, generation):
+        try:
+            total = self.count_func()
+        except Exception as e:
+            print(f"⚠️ 获取列表总数失败: {e}")
+            total = 0
+        with self._lock:
+            if generation != self._generation:
+                return 0
+            self._total = total
+            self._total_pending = False
+        return total
+
+    def _request_page(self, page_no):
+        """同步模式直接加载；后台模式提交任务后返回 None"""
+        if not self.background:
+            return self._load_page(page_no, self._generation)
+        with self._lock:
+            if page_no in self._pending:
+                return None
+            self._pending.add(page_no)
+            generation = self._generation
+        self._submit(self._load_page, page_no, generation)
+        return None
+
+    def _load_page(self, page_no, generation):
+        try:
+            items = list(self.fetch_page(page_no * self.page_size, self.page_size))
+        except Exception as e:
+            print(f"⚠️ 加载第 {page_no + 1} 页失败: {e}")
+            items = None
+        with self._lock:
+            self._pending.discard(page_no)
+            if items is None or generation != self._generation:
+                return None
+            self._pages[page_no] = items
+            self._pages.move_to_end(page_no)
+            while len(self._pages) > self.max_cached_pages:
+                self._pages.popitem(last=False)
+        return items
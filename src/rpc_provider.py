@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+"""
+RPC 传输层 - 长连接池、按方法的自适应超时、带抖动的指数退避重试和熔断器，
+以及多节点路由（读请求选延迟最低的健康节点，写请求固定发往主节点并自动故障转移）
+"""
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import HTTPProvider
+from web3.providers.base import JSONBaseProvider
+
+# 按方法的基础超时 (连接, 读取) 秒；读取超时会按实测延迟自适应放大
+METHOD_TIMEOUTS = {
+    "eth_blockNumber": (0.5, 1.0),
+    "eth_chainId": (0.5, 1.0),
+    "net_version": (0.5, 1.0),
+    "eth_getTransactionReceipt": (0.5, 2.0),
+    "eth_getFilterChanges": (0.5, 2.0),
+    "eth_call": (1.0, 5.0),
+    "eth_estimateGas": (1.0, 5.0),
+    "eth_getLogs": (1.0, 15.0),
+    "eth_sendTransaction": (1.0, 10.0),
+    "eth_sendRawTransaction": (1.0, 10.0),
+}
+DEFAULT_TIMEOUT = (1.0, 3.0)
+MAX_READ_TIMEOUT = 30.0
+
+# 按方法的重试次数：发送交易重发可能导致重复上链；轮询类请求本身会定期再发，失败后不阻塞主循环
+METHOD_RETRIES = {
+    "eth_sendTransaction": 0,
+    "eth_sendRawTransaction": 0,
+    "eth_blockNumber": 0,
+    "eth_getFilterChanges": 0,
+}
+
+# 视为临时故障、可以重试的 HTTP 状态码
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+class CircuitOpenError(ConnectionError):
+    """熔断器打开期间直接拒绝请求，不再等待超时"""
+
+
+class CircuitBreaker:
+    """
+    连续失败 failure_threshold 次后打开（请求直接失败）；
+    冷却时间到后进入半开状态，放行一个探测请求：成功则关闭，失败则重新打开且冷却时间翻倍（带抖动，有上限）
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, reset_timeout=2.0, max_reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0  # 连续失败次数
+        self.trips = 0  # 连续打开次数，决定冷却时间
+        self.opened_at = 0.0
+        self.cooldown = reset_timeout
+        self.last_error = ""
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """当前是否放行请求（半开状态只放行一个探测请求）"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.trips = 0
+            self._probing = False
+            self.last_error = ""
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.trips += 1
+                backoff = min(self.max_reset_timeout, self.reset_timeout * 2 ** (self.trips - 1))
+                self.cooldown = backoff * random.uniform(0.8, 1.2)
+                self.opened_at = time.monotonic()
+                self.state = self.OPEN
+
+    def retry_in(self) -> float:
+        """距离下次探测的秒数（未打开时为 0）"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+
+def build_session(pool_size=8) -> requests.Session:
+    """
+    长连接会话：所有线程共用一个连接池，避免每个请求重新握手
+    重试由 ResilientHTTPProvider 负责，适配器本身不重试
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Connection": "keep-alive", "Content-Type": "application/json"})
+    return session
+
+
+class ResilientHTTPProvider(HTTPProvider):
+    """
+    替代 web3 默认的 HTTPProvider：
+    - 显式的 keep-alive 会话和连接池
+    - 按 JSON-RPC 方法设定超时，读取超时随实测延迟（EWMA）自适应
+    - 只读请求失败时按带抖动的指数退避重试；发送交易和轮询请求不重试
+    - 连续失败触发熔断，health() 汇报状态供界面显示
+    """
+
+    # 不使用 web3 自带的重试中间件（无退避，且会重试到超时）
+    _middlewares = ()
+
+    def __init__(self, endpoint_uri, max_retries=2, backoff_base=0.1, backoff_cap=1.0,
+                 breaker=None, session=None):
+        super().__init__(endpoint_uri)
+        self.session = session or build_session()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = {}  # 方法 -> 延迟 EWMA（秒）
+        self.requests = 0
+        self.retries = 0
+        self.last_success = 0.0
+
+    def timeout_for(self, method):
+        connect, read = METHOD_TIMEOUTS.get(method, DEFAULT_TIMEOUT)
+        observed = self.latency.get(method)
+        if observed is not None:
+            read = min(MAX_READ_TIMEOUT, max(read, observed * 4))
+        return connect, read
+
+    def _record_latency(self, method, seconds):
+        previous = self.latency.get(method)
+        self.latency[method] = seconds if previous is None else previous * 0.8 + seconds * 0.2
+
+    def _backoff(self, attempt):
+        """full jitter：在 [0, min(上限, 基数 * 2^attempt)] 内随机等待"""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def make_request(self, method, params):
+        if not self.breaker.allow():
+            raise CircuitOpenError(
+                f"RPC 熔断中，{self.breaker.retry_in():.1f} 秒后重试 ({self.breaker.last_error})"
+            )
+        request_data = self.encode_rpc_request(method, params)
+        attempts = METHOD_RETRIES.get(method, self.max_retries) + 1
+        self.requests += 1
+        error = None
+        for attempt in range(attempts):
+            if attempt:
+                self.retries += 1
+                time.sleep(self._backoff(attempt - 1))
+            started = time.monotonic()
+            try:
+                response = self.session.post(
+                    self.endpoint_uri,
+                    data=request_data,
+                    timeout=self.timeout_for(method),
+                )
+                if response.status_code in RETRY_STATUS_CODES:
+                    raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+                response.raise_for_status()
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                error = e
+                continue
+            self._record_latency(method, time.monotonic() - started)
+            self.last_success = time.time()
+            # JSON-RPC 层面的错误（如 revert）说明节点在正常工作，不计入熔断
+            self.breaker.record_success()
+            return self.decode_rpc_response(response.content)
+        self.breaker.record_failure(error)
+        raise error
+
+    def health(self) -> dict:
+        """连接健康状况，供 HUD 显示"""
+        breaker = self.breaker
+        latency = self.latency.get("eth_blockNumber") or (
+            sum(self.latency.values()) / len(self.latency) if self.latency else None
+        )
+        return {
+            'state': breaker.state,
+            'failures': breaker.failures,
+            'retry_in': breaker.retry_in(),
+            'last_error': breaker.last_error,
+            'latency_ms': latency * 1000 if latency is not None else None,
+            'requests': self.requests,
+            'retries': self.retries,
+        }
+
+
+# 必须发往同一个节点的方法：交易、账户/签名、nonce、交易查询和过滤器（过滤器 ID 只在创建它的节点有效），
+# 以及区块高度（各节点高度不同，轮流查询时高度会倒退）
+PRIMARY_METHODS = {
+    "eth_sendTransaction", "eth_sendRawTransaction", "eth_accounts", "eth_sign", "eth_signTypedData_v4",
+    "eth_getTransactionCount", "eth_getTransactionReceipt", "eth_getTransactionByHash",
+    "eth_newFilter", "eth_newBlockFilter", "eth_getFilterChanges", "eth_getFilterLogs", "eth_uninstallFilter",
+    "eth_blockNumber",
+}
+# 请求中带区块号参数的位置，用于跳过还没同步到该区块的节点
+BLOCK_PARAM_INDEX = {"eth_call": 1, "eth_getBalance": 1, "eth_getCode": 1, "eth_getStorageAt": 2}
+# 落后节点不会报错、而是返回缺了新区块的结果的方法：只发往确认已同步到 toBlock 的节点，
+# 没有这样的节点（或 toBlock 是 'latest' 等标签）时发往主节点，调用方拿到的区块号也来自主节点
+HEIGHT_STRICT_METHODS = {"eth_getLogs"}
+
+
+def _block_param(method, params):
+    """请求要求的最低区块号（'latest' 等标签返回 None）"""
+    if method in HEIGHT_STRICT_METHODS:
+        if not params or not isinstance(params[0], dict):
+            return None
+        value = params[0].get("toBlock")
+    else:
+        index = BLOCK_PARAM_INDEX.get(method)
+        if index is None or len(params) <= index:
+            return None
+        value = params[index]
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.startswith("0x"):
+        return int(value, 16)
+    return None
+
+
+class RPCEndpoint:
+    """路由中的一个节点：独立的连接池和熔断器，记录延迟 EWMA 和最近的区块高度"""
+
+    def __init__(self, url, max_retries=0):
+        self.url = url
+        self.provider = ResilientHTTPProvider(url, max_retries=max_retries)
+        self.latency = None  # 秒
+        self.height = None
+        self.height_checked_at = 0.0
+
+    @property
+    def available(self) -> bool:
+        breaker = self.provider.breaker
+        return breaker.state != CircuitBreaker.OPEN or breaker.retry_in() == 0
+
+    def request(self, method, params):
+        started = time.monotonic()
+        response = self.provider.make_request(method, params)
+        elapsed = time.monotonic() - started
+        self.latency = elapsed if self.latency is None else self.latency * 0.8 + elapsed * 0.2
+        if method == "eth_blockNumber" and isinstance(response.get("result"), str):
+            self.height = int(response["result"], 16)
+            self.height_checked_at = time.monotonic()
+        return response
+
+
+class RPCRouter(JSONBaseProvider):
+    """
+    多节点 provider，第一个地址为主节点：
+    - 读请求发往延迟（EWMA）最低、区块高度落后不超过 max_lag 的健康节点，失败时依次换下一个；
+      eth_getLogs 只发往已同步到 toBlock 的节点，区块高度固定查询主节点
+    - 写请求、过滤器等有状态的请求固定发往主节点；主节点熔断或连接失败时切换到区块最高的备用节点
+    - 后台线程每 check_interval 秒查询各节点区块高度
+    """
+
+    _middlewares = ()
+
+    def __init__(self, endpoint_uris, max_lag=2, check_interval=2.0):
+        super().__init__()
+        self.endpoints = [RPCEndpoint(url) for url in endpoint_uris]
+        self.primary = self.endpoints[0]
+        self.active_primary = self.primary  # 故障转移后指向当前承担写请求的节点
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.endpoint_uri = self.primary.url
+        self._stop = threading.Event()
+        self._checker = threading.Thread(target=self._check_loop, name="rpc-health", daemon=True)
+        self._checker.start()
+
+    def __str__(self):
+        return f"RPC router {[ep.url for ep in self.endpoints]}"
+
+    def stop(self):
+        self._stop.set()
+
+    def check_endpoints(self):
+        """查询所有节点的区块高度（同时更新延迟和熔断器状态）"""
+        for ep in self.endpoints:
+            if not ep.available:
+                continue
+            try:
+                ep.request("eth_blockNumber", [])
+            except Exception:
+                pass
+
+    def _check_loop(self):
+        while not self._stop.wait(self.check_interval):
+            self.check_endpoints()
+
+    def _best_height(self):
+        heights = [ep.height for ep in self.endpoints if ep.height is not None and ep.available]
+        return max(heights) if heights else None
+
+    def _read_candidates(self, min_block):
+        best = self._best_height()
+        fresh, lagging = [], []
+        for ep in self.endpoints:
+            if not ep.available:
+                continue
+            if ep.height is not None and (
+                (best is not None and best - ep.height > self.max_lag)
+                or (min_block is not None and ep.height < min_block)
+            ):
+                lagging.append(ep)
+            else:
+                fresh.append(ep)
+        # 未测过延迟的节点排在前面，尽快得到测量值
+        fresh.sort(key=lambda ep: ep.latency or 0.0)
+        lagging.sort(key=lambda ep: -(ep.height or 0))
+        return fresh + lagging
+
+    def _synced_candidates(self, min_block):
+        """已确认同步到 min_block 的节点按延迟排序，最后是主节点"""
+        synced = sorted(
+            (ep for ep in self.endpoints if ep.available and min_block is not None
+             and ep.height is not None and ep.height >= min_block),
+            key=lambda ep: ep.latency or 0.0,
+        )
+        primary = self._write_candidates()[:1]
+        return synced + [ep for ep in primary if ep not in synced]
+
+    def _write_candidates(self):
+        """主节点优先；不可用时按区块高度、延迟选择备用节点"""
+        if self.active_primary is not self.primary and self.primary.available:
+            print(f"🔄 主节点 {self.primary.url} 已恢复，写请求切回主节点")
+            self.active_primary = self.primary
+        others = sorted(
+            (ep for ep in self.endpoints if ep is not self.active_primary and ep.available),
+            key=lambda ep: (-(ep.height or 0), ep.latency or 0.0),
+        )
+        if self.active_primary.available:
+            return [self.active_primary] + others
+        return others
+
+    def make_request(self, method, params):
+        pinned = method in PRIMARY_METHODS
+        if pinned:
+            candidates = self._write_candidates()
+        elif method in HEIGHT_STRICT_METHODS:
+            candidates = self._synced_candidates(_block_param(method, params))
+        else:
+            candidates = self._read_candidates(_block_param(method, params))
+        if not candidates:
+            raise CircuitOpenError(f"所有 RPC 节点均不可用 (最近错误: {self.primary.provider.breaker.last_error})")
+        error = None
+        for ep in candidates:
+            try:
+                response = ep.request(method, params)
+            except requests.ReadTimeout as e:
+                if pinned:
+                    raise  # 请求可能已送达，换节点重发写请求可能重复上链
+                error = e
+                continue
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError, CircuitOpenError) as e:
+                error = e
+                continue
+            if pinned and ep is not self.active_primary:
+                print(f"⚠️ 主节点 {self.active_primary.url} 不可用，写请求切换到 {ep.url}")
+                self.active_primary = ep
+            return response
+        raise error
+
+    @property
+    def breaker(self):
+        """当前写节点的熔断器（全部节点都不可用时才视为离线，见 health）"""
+        return self.active_primary.provider.breaker
+
+    def health(self) -> dict:
+        primary = self.active_primary.provider.health()
+        available = [ep for ep in self.endpoints if ep.available]
+        states = {ep.provider.breaker.state for ep in self.endpoints}
+        if CircuitBreaker.CLOSED in states:
+            state = CircuitBreaker.CLOSED
+        elif available:
+            state = CircuitBreaker.HALF_OPEN
+        else:
+            state = CircuitBreaker.OPEN
+        latencies = [ep.latency for ep in available if ep.latency is not None]
+        return {
+            'state': state,
+            'failures': primary['failures'],
+            'retry_in': min(ep.provider.breaker.retry_in() for ep in self.endpoints),
+            'last_error': primary['last_error'],
+            'latency_ms': min(latencies) * 1000 if latencies else None,
+            'requests': sum(ep.provider.requests for ep in self.endpoints),
+            'retries': sum(ep.provider.retries for ep in self.endpoints),
+            'primary': self.active_primary.url,
+            'endpoints': [
+                {
+                    'url': ep.url,
+                    'state': ep.provider.breaker.state,
+                    'latency_ms': ep.latency * 1000 if ep.latency is not None else None,
+                    'height': ep.height,
+                }
+                for ep in self.endpoints
+            ],
+        }
+
+
+def build_provider(endpoint_uris):
+    """一个地址时使用 ResilientHTTPProvider，多个地址时使用 RPCRouter"""
+    if len(endpoint_uris) == 1:
+        return ResilientHTTPProvider(endpoint_uris[0])
+    return RPCRouter(endpoint_uris)
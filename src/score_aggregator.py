@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+链下分数聚合服务 - 游戏客户端通过本地 socket 上报割草积分，服务按结算窗口批量上链
+
+运行: python -m src.score_aggregator [--port 8765] [--interval 10]
+游戏端: SCORE_AGGREGATOR=127.0.0.1:8765 python main.py
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+
+from web3 import Web3
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# 单次上报的积分上限（每次挥刀最多击中的草块 × 10 分，留足余量）
+MAX_POINTS_PER_REPORT = 1000
+# 每个地址每秒最多累计的积分（令牌桶，允许短时突发到 MAX_POINTS_PER_REPORT）
+MAX_POINTS_PER_SECOND = 200
+# 割草积分以 10 分为单位
+POINTS_UNIT = 10
+
+
+def parse_address(value):
+    """解析 host:port，缺省部分使用默认值"""
+    host, _, port = (value or "").rpartition(":")
+    if not host:
+        host, port = port or DEFAULT_HOST, ""
+    return host or DEFAULT_HOST, int(port or DEFAULT_PORT)
+
+
+class ScoreAggregator:
+    """
+    按地址累计未结算的积分，每个结算窗口用 recordWeedCutBatch 一次上链
+    无论在线玩家多少，每个窗口只有一笔交易（超过 SCORE_BATCH_SIZE 个玩家时分笔流水线发送）
+    结算失败的积分并回待结算，下个窗口重试；已发出但没等到回执的交易保留在途，之后按回执结算
+    """
+
+    def __init__(self, blockchain_manager, settle_interval=10.0):
+        self.blockchain_manager = blockchain_manager
+        self.settle_interval = settle_interval
+        self.pending = {}  # 地址 -> 待结算积分
+        self.in_flight = {}  # 地址 -> 正在结算的积分（交易已发出、回执未到）
+        self.unconfirmed = {}  # 交易哈希 -> [(地址, 积分)]：已发出但没等到回执，之后按回执结算，不会重发
+        self.settled_total = 0
+        self.settlements = 0
+        self.rejected = 0
+        self._buckets = {}  # 地址 -> (剩余额度, 上次补充时间)
+        self._lock = threading.Lock()
+        self._settle_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def validate(self, address, points):
+        """校验一次上报，返回 (规范化地址, 错误原因)"""
+        try:
+            address = Web3.to_checksum_address(address)
+        except Exception:
+            return None, "invalid address"
+        if not isinstance(points, int) or isinstance(points, bool) or points <= 0:
+            return None, "invalid points"
+        if points % POINTS_UNIT or points > MAX_POINTS_PER_REPORT:
+            return None, "invalid points"
+        return address, None
+
+    def _take_tokens(self, address, points, now):
+        tokens, last = self._buckets.get(address, (MAX_POINTS_PER_REPORT, now))
+        tokens = min(MAX_POINTS_PER_REPORT, tokens + (now - last) * MAX_POINTS_PER_SECOND)
+        if tokens < points:
+            self._buckets[address] = (tokens, now)
+            return False
+        self._buckets[address] = (tokens - points, now)
+        return True
+
+    def report(self, address, points):
+        """累计一次割草积分，返回应答字典（含该地址尚未上链的积分）"""
+        address, error = self.validate(address, points)
+        with self._lock:
+            if error is None and not self._take_tokens(address, points, time.monotonic()):
+                error = "rate limited"
+            if error is not None:
+                self.rejected += 1
+                return {'ok': False, 'error': error}
+            self.pending[address] = self.pending.get(address, 0) + points
+            return {'ok': True, 'unsettled': self.pending[address] + self.in_flight.get(address, 0)}
+
+    def unsettled(self, address):
+        """地址尚未上链的积分（待结算 + 正在结算）"""
+        try:
+            address = Web3.to_checksum_address(address)
+        except Exception:
+            return 0
+        with self._lock:
+            return self.pending.get(address, 0) + self.in_flight.get(address, 0)
+
+    def _release(self, address, amount, ok):
+        """一笔在途积分有了结果：成功计入已结算，失败退回待结算"""
+        remaining = self.in_flight.get(address, 0) - amount
+        if remaining > 0:
+            self.in_flight[address] = remaining
+        else:
+            self.in_flight.pop(address, None)
+        if ok:
+            self.settled_total += amount
+        else:
+            self.pending[address] = self.pending.get(address, 0) + amount
+
+    def _resolve_unconfirmed(self):
+        """按回执结算之前没确认的交易；仍在等待的保留在途"""
+        bm = self.blockchain_manager
+        for tx_hash, entries in list(self.unconfirmed.items()):
+            ok = bm.get_transaction_status(tx_hash)
+            if ok is None:
+                continue
+            with self._lock:
+                del self.unconfirmed[tx_hash]
+                for address, amount in entries:
+                    self._release(address, amount, ok)
+                if ok:
+                    self.settlements += 1
+
+    def settle(self):
+        """结算当前窗口累计的积分，返回上链的玩家数"""
+        with self._settle_lock:
+            self._resolve_unconfirmed()
+            with self._lock:
+                if not self.pending:
+                    return 0
+                batch = sorted(self.pending.items())
+                self.pending = {}
+                for address, amount in batch:
+                    self.in_flight[address] = self.in_flight.get(address, 0) + amount
+            bm = self.blockchain_manager
+            players = [address for address, _ in batch]
+            points = [amount for _, amount in batch]
+            settled, unconfirmed = bm.record_score_batch(bm.contract_owner, players, points)
+            with self._lock:
+                for (address, amount), ok in zip(batch, settled):
+                    if ok is not None:
+                        self._release(address, amount, ok)
+                for tx_hash, (start, end) in unconfirmed.items():
+                    self.unconfirmed[tx_hash] = batch[start:end]
+                if any(settled):
+                    self.settlements += 1
+            return sum(1 for ok in settled if ok)
+
+    def status(self):
+        with self._lock:
+            return {
+                'ok': True,
+                'pending_players': len(self.pending),
+                'pending_points': sum(self.pending.values()),
+                'settled_points': self.settled_total,
+                'settlements': self.settlements,
+                'rejected': self.rejected,
+            }
+
+    def handle(self, message):
+        """处理一条客户端请求"""
+        op = message.get('op')
+        if op == "cut":
+            return self.report(message.get('address'), message.get('points'))
+        if op == "unsettled":
+            return {'ok': True, 'unsettled': self.unsettled(message.get('address'))}
+        if op == "status":
+            return self.status()
+        return {'ok': False, 'error': f"unknown op: {op}"}
+
+    def start(self):
+        """启动后台结算线程"""
+        self._thread = threading.Thread(target=self._run, name="score-settle", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.settle_interval):
+            if not self.blockchain_manager.blockchain_available:
+                continue
+            try:
+                self.settle()
+            except Exception as e:
+                print(f"⚠️ 分数结算失败，下个窗口重试: {e}")
+
+
+class _AggregatorHandler(socketserver.StreamRequestHandler):
+    """每行一个 JSON 请求，每行一个 JSON 应答"""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                reply = self.server.aggregator.handle(json.loads(line))
+            except Exception as e:
+                reply = {'ok': False, 'error': str(e)}
+            self.wfile.write((json.dumps(reply) + "\n").encode('utf-8'))
+
+
+class ScoreAggregatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, aggregator, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.aggregator = aggregator
+        super().__init__((host, port), _AggregatorHandler)
+
+
+class ScoreAggregatorClient:
+    """
+    游戏端客户端：report() 只把积分放入队列，后台线程发送，主循环不会因 socket 阻塞
+    服务不可用或拒绝上报时，积分通过 drain() 以 ('failed' / 'rejected', 积分, 地址) 退回，由游戏改为直接上链
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=1.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.available = True  # 最近一次上报是否成功（False 时游戏直接上链）
+        self.retry_at = 0.0
+        self.retry_delay = 2.0
+        self._outbox = queue.Queue()
+        self._results = queue.Queue()
+        self._sock = None
+        self._reader = None
+        self._thread = threading.Thread(target=self._run, name="score-report", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls):
+        """SCORE_AGGREGATOR=host:port 时创建客户端，未设置时返回 None"""
+        value = os.getenv("SCORE_AGGREGATOR", "").strip()
+        if not value:
+            return None
+        host, port = parse_address(value)
+        print(f"📡 分数上报到聚合服务 {host}:{port}")
+        return cls(host, port)
+
+    def usable(self):
+        """服务可用，或重试等待已过"""
+        return self.available or time.monotonic() >= self.retry_at
+
+    def report(self, address, points):
+        self._outbox.put((address, points))
+
+    def drain(self):
+        """取出处理结果：[('ok' / 'failed' / 'rejected', 积分, 地址)]"""
+        items = []
+        while True:
+            try:
+                items.append(self._results.get_nowait())
+            except queue.Empty:
+                return items
+
+    def _request(self, message):
+        if self._sock is None:
+            self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            self._reader = self._sock.makefile('rb')
+        self._sock.sendall((json.dumps(message) + "\n").encode('utf-8'))
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("聚合服务关闭了连接")
+        return json.loads(line)
+
+    def _close(self):
+        try:
+            if self._sock is not None:
+                self._sock.close()
+        except OSError:
+            pass
+        self._sock = None
+        self._reader = None
+
+    def _run(self):
+        while True:
+            address, points = self._outbox.get()
+            if not self.usable():
+                self._results.put(('failed', points, address))
+                continue
+            try:
+                reply = self._request({'op': "cut", 'address': address, 'points': points})
+            except Exception as e:
+                self._close()
+                if self.available:
+                    print(f"⚠️ 分数聚合服务不可用，改为直接上链: {e}")
+                self.available = False
+                self.retry_at = time.monotonic() + self.retry_delay
+                self.retry_delay = min(self.retry_delay * 2, 30.0)
+                self._results.put(('failed', points, address))
+                continue
+            if not self.available:
+                print("✅ 分数聚合服务已恢复")
+            self.available = True
+            self.retry_delay = 2.0
+            if reply.get('ok'):
+                self._results.put(('ok', points, address))
+            else:
+                print(f"⚠️ 聚合服务拒绝了 {points} 分: {reply.get('error')}")
+                self._results.put(('rejected', points, address))
+
+
+def main():
+    from .blockchain import BlockchainManager
+
+    parser = argparse.ArgumentParser(description="链下分数聚合服务")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"监听地址 (默认 {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"监听端口 (默认 {DEFAULT_PORT})")
+    parser.add_argument("--interval", type=float, default=10.0, help="结算窗口，秒 (默认 10)")
+    args = parser.parse_args()
+
+    blockchain_manager = BlockchainManager()
+    blockchain_manager.setup()
+    if not blockchain_manager.contract_owner_available:
+        print("❌ 合约所有者不在本地账户列表，无法批量结算分数")
+        return
+    if not blockchain_manager.has_function('recordWeedCutBatch'):
+        print("❌ 已部署的合约没有 recordWeedCutBatch，请重新编译部署合约 (npx hardhat run scripts/deploy.ts)")
+        return
+
+    aggregator = ScoreAggregator(blockchain_manager, settle_interval=args.interval)
+    aggregator.start()
+    server = ScoreAggregatorServer(aggregator, args.host, args.port)
+    print(f"🚀 分数聚合服务已启动 {args.host}:{args.port}，每 {args.interval:.0f} 秒结算一次")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        aggregator.stop()
+        aggregator.settle()
+        if aggregator.unconfirmed:
+            print(f"⚠️ 还有 {len(aggregator.unconfirmed)} 笔结算交易未确认，请稍后在链上核对")
+        status = aggregator.status()
+        print(f"📊 已结算 {status['settled_points']} 分，共 {status['settlements']} 次结算")
+
+
+if __name__ == "__main__":
+    main()
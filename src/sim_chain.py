@@ -0,0 +1,1033 @@
+# -*- coding: utf-8 -*-
+"""
+进程内模拟链 - 不需要 Hardhat 节点即可运行完整游戏、压测和基准测试
+"""
+import copy
+import itertools
+import random
+import threading
+import time
+
+from eth_abi import encode as abi_encode
+from hexbytes import HexBytes
+from eth_utils import function_abi_to_4byte_selector
+from web3 import Web3
+from web3._utils.abi import get_abi_output_types
+from web3.providers.base import BaseProvider
+
+from .blockchain import BlockchainManager
+from .user_manager import HARDHAT_ACCOUNTS
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+WEAR_SCALE = 10 ** 10
+MAX_PAGE_SIZE = 100
+MAX_OPEN_BATCH = 20
+MAX_SCORE_BATCH = 100
+CHAIN_ID = 31337
+GENESIS_TIMESTAMP = 1_700_000_000
+INITIAL_BALANCE = 10_000 * 10 ** 18
+DEFAULT_GAS_PRICE = 2 * 10 ** 9
+BLOCK_GAS_LIMIT = 30_000_000
+
+# 各写函数模拟的 gasUsed（与 Hardhat 上实测的量级一致）
+GAS_USED = {
+    "recordWeedCut": 52000,
+    "setPlayerName": 48000,
+    "mintWeapon": 235000,
+    "listWeaponForSale": 76000,
+    "purchaseWeapon": 92000,
+    "purchaseCase": 56000,
+    "openCaseFromInventory": 262000,
+    "openCaseWithETH": 268000,
+    "openCaseWithCoins": 265000,
+    "createCase": 205000,
+    "createTradeOffer": 162000,
+    "acceptTradeOffer": 112000,
+    "cancelTradeOffer": 31000,
+}
+DEFAULT_GAS_USED = 60000
+# 批量函数的 gasUsed = 固定部分 + 每条的消耗 × 条数（第 2 个参数为条数或数组）
+GAS_USED_PER_ITEM = {
+    "openCasesFromInventory": (40000, 222000),
+    "recordWeedCutBatch": (30000, 33000),
+}
+
+
+def _gas_used(name, args):
+    if name in GAS_USED_PER_ITEM:
+        base, per_item = GAS_USED_PER_ITEM[name]
+        count = args[1] if isinstance(args[1], int) else len(args[1])
+        return base + per_item * count
+    return GAS_USED.get(name, DEFAULT_GAS_USED)
+
+
+class Revert(Exception):
+    """合约 require 失败（对应 Solidity 的 revert reason）"""
+
+
+def _require(condition, reason):
+    if not condition:
+        raise Revert(reason)
+
+
+def _addr(address):
+    return Web3.to_checksum_address(address)
+
+
+class CallContext:
+    """写函数的调用上下文：msg.sender / msg.value / block.timestamp"""
+
+    def __init__(self, sender, value=0, timestamp=GENESIS_TIMESTAMP):
+        self.sender = _addr(sender)
+        self.value = value
+        self.timestamp = timestamp
+
+
+class SimulatedWeedCutter:
+    """
+    WeedCutterNFT.sol 的 Python 实现（函数名、参数、返回值和事件与合约一致）
+    写函数的第一个参数是 CallContext，触发的事件追加到 self.events
+    ETH 余额（含合约自身）也保存在这里，使一次交易的状态修改集中在一个对象上
+    """
+
+    def __init__(self, address, owner, rng, balances):
+        self.address = address
+        self.rng = rng
+        self.balances = balances
+        self.events = []
+        self.weapons = {}  # id -> 字段字典
+        self.user_weapons = {}  # 地址 -> [武器ID]
+        self.scores_ = {}
+        self.coins_ = {}
+        self.token_approvals = {}
+        self.balances_721 = {}
+        self.cases_ = {}  # id -> {'id', 'name', 'price', 'coinPrice', 'weaponConfigIds'}
+        self.weapon_configs = {}  # id -> (name, rarity, baseDamageMultiplier, weight)
+        self.next_case_id = 1
+        self.next_weapon_config_id = 1
+        self.user_case_inventory = {}  # (地址, 箱子ID) -> 数量
+        self.players_ = []
+        self.has_played = set()
+        self.player_names = {}
+        self.next_weapon_id = 1
+        self.owner_ = _addr(owner)
+        self.sale_weapon_ids = []
+        self.sale_weapon_index = {}
+        self.trade_offers = {}
+        self.next_offer_id = 1
+        self.user_offers = {}
+        self.user_received_offers = {}
+
+    def _emit(self, event, /, **args):
+        self.events.append((event, args))
+
+    def _pay(self, to, amount):
+        _require(self.balances.get(self.address, 0) >= amount, "Insufficient contract balance")
+        self.balances[self.address] -= amount
+        self.balances[to] = self.balances.get(to, 0) + amount
+
+    # ---------- 构造与管理 ----------
+
+    def constructor(self, ctx):
+        """与合约构造函数相同的初始数据：3 把初始武器、16 个武器配置、4 个武器箱"""
+        for name, rarity, damage in (("Starter Cutter", 0, 100), ("Sharp Sickle", 1, 120), ("Epic Sword", 2, 150)):
+            wear = self._generate_random_wear()
+            self._mint_weapon(ctx.sender, name, rarity, damage, wear, self._wear_to_condition(wear))
+        families = (
+            ("Knife Case", ("Starter Knife", 100), ("Sharp Knife", 130), ("Epic Knife", 160), ("Legendary Knife", 200)),
+            ("Sword Case", ("Basic Sword", 105), ("Golden Blade", 135), ("Epic Sword", 165), ("Legendary Blade", 205)),
+            ("Axe Case", ("Basic Axe", 110), ("Battle Axe", 140), ("Epic Axe", 170), ("Legendary Axe", 210)),
+            ("Sickle Case", ("Basic Sickle", 108), ("Steel Sickle", 138), ("Epic Scythe", 168),
+             ("Legendary Scythe", 208)),
+        )
+        for case_name, *configs in families:
+            config_ids = []
+            for rarity, ((name, damage), weight) in enumerate(zip(configs, (50, 30, 15, 5))):
+                config_ids.append(self._create_weapon_config(name, rarity, damage, weight))
+            self.createCase(ctx, case_name, 0, 50, config_ids)
+
+    def _create_weapon_config(self, name, rarity, base_damage, weight):
+        config_id = self.next_weapon_config_id
+        self.weapon_configs[config_id] = (name, rarity, base_damage, weight)
+        self.next_weapon_config_id += 1
+        return config_id
+
+    def createCase(self, ctx, name, price, coin_price, weapon_config_ids):
+        _require(ctx.sender == self.owner_, "Not owner")
+        case_id = self.next_case_id
+        self.cases_[case_id] = {
+            'id': case_id, 'name': name, 'price': price, 'coinPrice': coin_price,
+            'weaponConfigIds': list(weapon_config_ids),
+        }
+        self._emit("CaseCreated", caseId=case_id, name=name, price=price, coinPrice=coin_price)
+        self.next_case_id += 1
+
+    def withdrawETH(self, ctx):
+        _require(ctx.sender == self.owner_, "Not owner")
+        self._pay(self.owner_, self.balances.get(self.address, 0))
+
+    def withdraw(self, ctx):
+        self.withdrawETH(ctx)
+
+    # ---------- 随机数与铸造 ----------
+
+    def _generate_random_wear(self):
+        return self.rng.randrange(WEAR_SCALE)
+
+    @staticmethod
+    def _wear_to_condition(wear):
+        for condition, threshold in enumerate((5, 15, 30, 50, 75)):
+            if wear < WEAR_SCALE * threshold // 100:
+                return condition
+        return 5
+
+    def _select_random_weapon_config(self, config_ids):
+        total = sum(self.weapon_configs[config_id][3] for config_id in config_ids)
+        _require(total > 0, "panic: division by zero")
+        roll = self.rng.randrange(total)
+        cumulative = 0
+        for config_id in config_ids:
+            cumulative += self.weapon_configs[config_id][3]
+            if roll < cumulative:
+                return self.weapon_configs[config_id]
+        return self.weapon_configs[config_ids[0]]
+
+    def _mint_weapon(self, to, name, rarity, damage, wear, condition):
+        weapon_id = self.next_weapon_id
+        self.next_weapon_id += 1
+        self.weapons[weapon_id] = {
+            'id': weapon_id, 'name': name, 'rarity': rarity, 'damageMultiplier': damage, 'owner': to,
+            'price': 0, 'forSale': False, 'wear': wear, 'condition': condition,
+        }
+        self.user_weapons.setdefault(to, []).append(weapon_id)
+        self.balances_721[to] = self.balances_721.get(to, 0) + 1
+        self._emit("WeaponMinted", to=to, weaponId=weapon_id, rarity=rarity, condition=condition, wear=wear)
+        self._emit("Transfer", **{'from': ZERO_ADDRESS, 'to': to, 'tokenId': weapon_id})
+        return weapon_id
+
+    def mintWeapon(self, ctx, to, name, rarity, damage_multiplier):
+        _require(ctx.sender == self.owner_, "Not owner")
+        wear = self._generate_random_wear()
+        self._mint_weapon(_addr(to), name, rarity, damage_multiplier, wear, self._wear_to_condition(wear))
+
+    def _open_case(self, ctx, case_id, config):
+        name, rarity, base_damage, _ = config
+        wear = self._generate_random_wear()
+        condition = self._wear_to_condition(wear)
+        weapon_id = self._mint_weapon(ctx.sender, name, rarity, base_damage, wear, condition)
+        self._emit("CaseOpened", player=ctx.sender, caseId=case_id, weaponId=weapon_id,
+                   rarity=rarity, condition=condition, wear=wear)
+
+    def _valid_case(self, case_id):
+        _require(0 < case_id < self.next_case_id, "Invalid case ID")
+
+    # ---------- 武器箱 ----------
+
+    def purchaseCase(self, ctx, case_id, amount):
+        self._valid_case(case_id)
+        _require(amount > 0, "Amount must be positive")
+        total_cost = self.cases_[case_id]['coinPrice'] * amount
+        _require(self.coins_.get(ctx.sender, 0) >= total_cost, "Insufficient coins")
+        self.coins_[ctx.sender] = self.coins_.get(ctx.sender, 0) - total_cost
+        key = (ctx.sender, case_id)
+        self.user_case_inventory[key] = self.user_case_inventory.get(key, 0) + amount
+        self._emit("CasePurchased", buyer=ctx.sender, caseId=case_id, amount=amount)
+
+    def openCaseFromInventory(self, ctx, case_id):
+        self._valid_case(case_id)
+        key = (ctx.sender, case_id)
+        _require(self.user_case_inventory.get(key, 0) > 0, "No cases in inventory")
+        config = self._select_random_weapon_config(self.cases_[case_id]['weaponConfigIds'])
+        self.user_case_inventory[key] -= 1
+        self._open_case(ctx, case_id, config)
+
+    def openCasesFromInventory(self, ctx, case_id, count):
+        self._valid_case(case_id)
+        _require(0 < count <= MAX_OPEN_BATCH, "Invalid count")
+        key = (ctx.sender, case_id)
+        _require(self.user_case_inventory.get(key, 0) >= count, "No cases in inventory")
+        self.user_case_inventory[key] -= count
+        for _ in range(count):
+            self._open_case(ctx, case_id, self._select_random_weapon_config(self.cases_[case_id]['weaponConfigIds']))
+
+    def openCaseWithETH(self, ctx, case_id):
+        self._valid_case(case_id)
+        price = self.cases_[case_id]['price']
+        _require(ctx.value >= price, "Insufficient ETH")
+        self._open_case(ctx, case_id, self._select_random_weapon_config(self.cases_[case_id]['weaponConfigIds']))
+        if ctx.value > price:
+            self._pay(ctx.sender, ctx.value - price)
+
+    def openCaseWithCoins(self, ctx, case_id):
+        self._valid_case(case_id)
+        coin_price = self.cases_[case_id]['coinPrice']
+        _require(self.coins_.get(ctx.sender, 0) >= coin_price, "Insufficient coins")
+        config = self._select_random_weapon_config(self.cases_[case_id]['weaponConfigIds'])
+        self.coins_[ctx.sender] -= coin_price
+        self._open_case(ctx, case_id, config)
+
+    # ---------- 市场 ----------
+
+    def _add_to_sale(self, weapon_id):
+        if weapon_id not in self.sale_weapon_index:
+            self.sale_weapon_ids.append(weapon_id)
+            self.sale_weapon_index[weapon_id] = len(self.sale_weapon_ids)
+
+    def _remove_from_sale(self, weapon_id):
+        index = self.sale_weapon_index.pop(weapon_id, 0)
+        if not index:
+            return
+        last_id = self.sale_weapon_ids.pop()
+        if last_id != weapon_id:
+            self.sale_weapon_ids[index - 1] = last_id
+            self.sale_weapon_index[last_id] = index
+
+    def _remove_weapon_from_user(self, user, weapon_id):
+        ids = self.user_weapons.get(user, [])
+        if weapon_id in ids:
+            i = ids.index(weapon_id)
+            ids[i] = ids[-1]
+            ids.pop()
+
+    def _move_weapon(self, previous_owner, new_owner, weapon_id):
+        weapon = self.weapons[weapon_id]
+        self.balances_721[previous_owner] -= 1
+        self.balances_721[new_owner] = self.balances_721.get(new_owner, 0) + 1
+        weapon['owner'] = new_owner
+        weapon['forSale'] = False
+        weapon['price'] = 0
+        self._remove_from_sale(weapon_id)
+        self._remove_weapon_from_user(previous_owner, weapon_id)
+        self.user_weapons.setdefault(new_owner, []).append(weapon_id)
+
+    def purchaseWeapon(self, ctx, weapon_id):
+        weapon = self.weapons.get(weapon_id)
+        _require(weapon is not None and weapon['forSale'], "Weapon not for sale")
+        _require(ctx.value >= weapon['price'], "Insufficient funds")
+        _require(weapon['owner'] != ctx.sender, "Cannot buy your own weapon")
+        previous_owner, price = weapon['owner'], weapon['price']
+        self._move_weapon(previous_owner, ctx.sender, weapon_id)
+        self._pay(previous_owner, price)
+        self._emit("WeaponSold", **{'from': previous_owner, 'to': ctx.sender, 'weaponId': weapon_id})
+        self._emit("Transfer", **{'from': previous_owner, 'to': ctx.sender, 'tokenId': weapon_id})
+
+    def listWeaponForSale(self, ctx, weapon_id, price):
+        weapon = self.weapons.get(weapon_id)
+        _require(weapon is not None and weapon['owner'] == ctx.sender, "Not owner")
+        _require(price > 0, "Invalid price")
+        weapon['forSale'] = True
+        weapon['price'] = price
+        self._add_to_sale(weapon_id)
+        self._emit("WeaponListed", weaponId=weapon_id, price=price)
+
+    # ---------- 分数与排行榜 ----------
+
+    def _mark_played(self, player):
+        if player not in self.has_played:
+            self.players_.append(player)
+            self.has_played.add(player)
+
+    def recordWeedCut(self, ctx, points):
+        self._record_weed_cut(ctx.sender, points)
+
+    def recordWeedCutBatch(self, ctx, player_list, points):
+        _require(ctx.sender == self.owner_, "Not owner")
+        _require(len(player_list) == len(points), "Length mismatch")
+        _require(len(player_list) <= MAX_SCORE_BATCH, "Batch too large")
+        for player, player_points in zip(player_list, points):
+            self._record_weed_cut(_addr(player), player_points)
+
+    def _record_weed_cut(self, player, points):
+        self._mark_played(player)
+        self.scores_[player] = self.scores_.get(player, 0) + points
+        coins_earned = points // 5
+        self.coins_[player] = self.coins_.get(player, 0) + coins_earned
+        self._emit("WeedCut", player=player, score=points, coinsEarned=coins_earned)
+
+    def setPlayerName(self, ctx, name):
+        self.player_names[ctx.sender] = name
+        self._mark_played(ctx.sender)
+        self._emit("PlayerNameSet", player=ctx.sender, name=name)
+
+    def getLeaderboard(self, count):
+        # 与合约的选择排序一致：同分时保持加入顺序
+        ordered = sorted(self.players_, key=lambda p: -self.scores_.get(p, 0))[:count]
+        return (
+            ordered,
+            [self.player_names.get(p, "") for p in ordered],
+            [self.scores_.get(p, 0) for p in ordered],
+            list(range(1, len(ordered) + 1)),
+        )
+
+    def getPlayerRank(self, player):
+        score = self.scores_.get(_addr(player), 0)
+        rank = 1 + sum(1 for p in self.players_ if self.scores_.get(p, 0) > score)
+        return rank, len(self.players_)
+
+    # ---------- 只读查询 ----------
+
+    def _weapon_tuple(self, weapon_id):
+        w = self.weapons.get(weapon_id)
+        if w is None:
+            return (0, "", 0, 0, ZERO_ADDRESS, 0, False, 0, 0)
+        return (w['id'], w['name'], w['rarity'], w['damageMultiplier'], w['owner'],
+                w['price'], w['forSale'], w['wear'], w['condition'])
+
+    @staticmethod
+    def _page_bounds(offset, limit, total):
+        limit = min(limit, MAX_PAGE_SIZE)
+        if offset >= total:
+            return offset, offset
+        return offset, min(total, offset + limit)
+
+    def MAX_PAGE_SIZE(self):
+        return MAX_PAGE_SIZE
+
+    def MAX_OPEN_BATCH(self):
+        return MAX_OPEN_BATCH
+
+    def MAX_SCORE_BATCH(self):
+        return MAX_SCORE_BATCH
+
+    def owner(self):
+        return self.owner_
+
+    def weapons_getter(self, weapon_id):
+        return self._weapon_tuple(weapon_id)
+
+    def userWeapons(self, user, index):
+        ids = self.user_weapons.get(_addr(user), [])
+        _require(index < len(ids), "panic: array out-of-bounds")
+        return ids[index]
+
+    def scores(self, player):
+        return self.scores_.get(_addr(player), 0)
+
+    def coins(self, player):
+        return self.coins_.get(_addr(player), 0)
+
+    def cases(self, case_id):
+        case = self.cases_.get(case_id)
+        if case is None:
+            return 0, "", 0, 0
+        return case['id'], case['name'], case['price'], case['coinPrice']
+
+    def weaponConfigs(self, config_id):
+        return self.weapon_configs.get(config_id, ("", 0, 0, 0))
+
+    def userCaseInventory(self, user, case_id):
+        return self.user_case_inventory.get((_addr(user), case_id), 0)
+
+    def players(self, index):
+        _require(index < len(self.players_), "panic: array out-of-bounds")
+        return self.players_[index]
+
+    def hasPlayed(self, player):
+        return _addr(player) in self.has_played
+
+    def playerNames(self, player):
+        return self.player_names.get(_addr(player), "")
+
+    def getNextCaseId(self):
+        return self.next_case_id
+
+    def getNextWeaponId(self):
+        return self.next_weapon_id
+
+    def getUserWeapons(self, user):
+        return list(self.user_weapons.get(_addr(user), []))
+
+    def getWeaponDetails(self, weapon_id):
+        _require(weapon_id in self.weapons, "Weapon does not exist")
+        return self._weapon_tuple(weapon_id)
+
+    def getCaseDetails(self, case_id):
+        self._valid_case(case_id)
+        case = self.cases_[case_id]
+        return case['name'], case['price'], case['coinPrice']
+
+    def getCaseWeaponConfigCount(self, case_id):
+        self._valid_case(case_id)
+        return len(self.cases_[case_id]['weaponConfigIds'])
+
+    def getCaseWeaponConfigIdAt(self, case_id, index):
+        self._valid_case(case_id)
+        ids = self.cases_[case_id]['weaponConfigIds']
+        _require(index < len(ids), "Index out of bounds")
+        return ids[index]
+
+    def getUserWeaponCount(self, user):
+        return len(self.user_weapons.get(_addr(user), []))
+
+    def getUserWeaponIdAt(self, user, index):
+        ids = self.user_weapons.get(_addr(user), [])
+        _require(index < len(ids), "Index out of bounds")
+        return ids[index]
+
+    def getPlayerStats(self, player):
+        player = _addr(player)
+        return self.scores_.get(player, 0), self.coins_.get(player, 0)
+
+    def getUserCaseInventory(self, user, case_id):
+        return self.userCaseInventory(user, case_id)
+
+    def getAllUserCaseInventory(self, user):
+        user = _addr(user)
+        case_ids = [i for i in range(1, self.next_case_id) if self.user_case_inventory.get((user, i), 0) > 0]
+        return case_ids, [self.user_case_inventory[(user, i)] for i in case_ids]
+
+    def getWeaponsForSale(self):
+        return [self._weapon_tuple(weapon_id) for weapon_id in self.sale_weapon_ids]
+
+    def getWeaponsForSalePage(self, offset, limit):
+        start, end = self._page_bounds(offset, limit, len(self.sale_weapon_ids))
+        return [self._weapon_tuple(i) for i in self.sale_weapon_ids[start:end]], len(self.sale_weapon_ids)
+
+    def getWeaponDetailsBatch(self, weapon_ids):
+        _require(len(weapon_ids) <= MAX_PAGE_SIZE, "Too many ids")
+        return [self._weapon_tuple(weapon_id) for weapon_id in weapon_ids]
+
+    def getUserWeaponsPage(self, user, offset, limit):
+        ids = self.user_weapons.get(_addr(user), [])
+        start, end = self._page_bounds(offset, limit, len(ids))
+        return [self._weapon_tuple(i) for i in ids[start:end]], len(ids)
+
+    # ---------- P2P 交易报价 ----------
+
+    def _offer_tuple(self, offer_id):
+        offer = self.trade_offers.get(offer_id)
+        if offer is None:
+            return (0, 0, ZERO_ADDRESS, ZERO_ADDRESS, 0, False, 0)
+        return (offer['offerId'], offer['weaponId'], offer['seller'], offer['buyer'],
+                offer['price'], offer['active'], offer['createdAt'])
+
+    def createTradeOffer(self, ctx, weapon_id, buyer, price):
+        weapon = self.weapons.get(weapon_id)
+        _require(weapon is not None and weapon['owner'] == ctx.sender, "Not weapon owner")
+        _require(not weapon['forSale'], "Weapon already listed for sale")
+        _require(price > 0, "Price must be greater than 0")
+        buyer = _addr(buyer)
+        offer_id = self.next_offer_id
+        self.next_offer_id += 1
+        self.trade_offers[offer_id] = {
+            'offerId': offer_id, 'weaponId': weapon_id, 'seller': ctx.sender, 'buyer': buyer,
+            'price': price, 'active': True, 'createdAt': ctx.timestamp,
+        }
+        self.user_offers.setdefault(ctx.sender, []).append(offer_id)
+        if buyer != ZERO_ADDRESS:
+            self.user_received_offers.setdefault(buyer, []).append(offer_id)
+        self._emit("TradeOfferCreated", offerId=offer_id, weaponId=weapon_id, seller=ctx.sender,
+                   buyer=buyer, price=price)
+
+    def acceptTradeOffer(self, ctx, offer_id):
+        offer = self.trade_offers.get(offer_id)
+        _require(offer is not None and offer['active'], "Offer not active")
+        _require(offer['buyer'] in (ZERO_ADDRESS, ctx.sender), "Not designated buyer")
+        _require(ctx.value >= offer['price'], "Insufficient payment")
+        weapon_id = offer['weaponId']
+        _require(self.weapons[weapon_id]['owner'] == offer['seller'], "Seller no longer owns weapon")
+        self._move_weapon(offer['seller'], ctx.sender, weapon_id)
+        self._pay(offer['seller'], offer['price'])
+        if ctx.value > offer['price']:
+            self._pay(ctx.sender, ctx.value - offer['price'])
+        offer['active'] = False
+        self._emit("TradeOfferAccepted", offerId=offer_id, weaponId=weapon_id, seller=offer['seller'],
+                   buyer=ctx.sender, price=offer['price'])
+        self._emit("Transfer", **{'from': offer['seller'], 'to': ctx.sender, 'tokenId': weapon_id})
+
+    def cancelTradeOffer(self, ctx, offer_id):
+        offer = self.trade_offers.get(offer_id)
+        _require(offer is not None and offer['seller'] == ctx.sender, "Not offer creator")
+        _require(offer['active'], "Offer not active")
+        offer['active'] = False
+        self._emit("TradeOfferCancelled", offerId=offer_id, seller=ctx.sender)
+
+    def getUserActiveOffers(self, user):
+        ids = self.user_offers.get(_addr(user), [])
+        return [self._offer_tuple(i) for i in ids if self.trade_offers[i]['active']]
+
+    def getUserReceivedActiveOffers(self, user):
+        ids = self.user_received_offers.get(_addr(user), [])
+        return [self._offer_tuple(i) for i in ids if self.trade_offers[i]['active']]
+
+    def getTradeOffer(self, offer_id):
+        return self._offer_tuple(offer_id)
+
+    def tradeOffers(self, offer_id):
+        return self._offer_tuple(offer_id)
+
+    def userOffers(self, user, index):
+        ids = self.user_offers.get(_addr(user), [])
+        _require(index < len(ids), "panic: array out-of-bounds")
+        return ids[index]
+
+    def userReceivedOffers(self, user, index):
+        ids = self.user_received_offers.get(_addr(user), [])
+        _require(index < len(ids), "panic: array out-of-bounds")
+        return ids[index]
+
+    # ---------- ERC721 ----------
+
+    def balanceOf(self, owner):
+        _require(_addr(owner) != ZERO_ADDRESS, "ERC721: balance query for the zero address")
+        return self.balances_721.get(_addr(owner), 0)
+
+    def ownerOf(self, token_id):
+        weapon = self.weapons.get(token_id)
+        _require(weapon is not None, "ERC721: owner query for nonexistent token")
+        return weapon['owner']
+
+    def getApproved(self, token_id):
+        _require(token_id in self.weapons, "ERC721: approved query for nonexistent token")
+        return self.token_approvals.get(token_id, ZERO_ADDRESS)
+
+    def _approve(self, to, token_id):
+        self.token_approvals[token_id] = to
+        self._emit("Approval", owner=self.weapons[token_id]['owner'], approved=to, tokenId=token_id)
+
+    def approve(self, ctx, to, token_id):
+        weapon = self.weapons.get(token_id)
+        token_owner = weapon['owner'] if weapon else ZERO_ADDRESS
+        _require(_addr(to) != token_owner, "ERC721: approval to current owner")
+        _require(ctx.sender == token_owner, "ERC721: approve caller is not owner")
+        self._approve(_addr(to), token_id)
+
+    def transferFrom(self, ctx, from_address, to, token_id):
+        weapon = self.weapons.get(token_id)
+        _require(weapon is not None, "ERC721: operator query for nonexistent token")
+        _require(ctx.sender in (weapon['owner'], self.token_approvals.get(token_id)),
+                 "ERC721: transfer caller is not owner nor approved")
+        from_address, to = _addr(from_address), _addr(to)
+        _require(weapon['owner'] == from_address, "ERC721: transfer from incorrect owner")
+        _require(to != ZERO_ADDRESS, "ERC721: transfer to the zero address")
+        _require(not weapon['forSale'], "Cannot transfer weapon listed for sale")
+        self._approve(ZERO_ADDRESS, token_id)
+        self._move_weapon(from_address, to, token_id)
+        self._emit("Transfer", **{'from': from_address, 'to': to, 'tokenId': token_id})
+
+    def safeTransferFrom(self, ctx, from_address, to, token_id):
+        self.transferFrom(ctx, from_address, to, token_id)
+
+    def burnWeapon(self, ctx, token_id):
+        weapon = self.weapons.get(token_id)
+        _require(weapon is not None and weapon['owner'] == ctx.sender, "Only owner can burn weapon")
+        _require(not weapon['forSale'], "Cannot burn weapon listed for sale")
+        self._approve(ZERO_ADDRESS, token_id)
+        self.balances_721[ctx.sender] -= 1
+        self._remove_weapon_from_user(ctx.sender, token_id)
+        del self.weapons[token_id]
+        self._emit("Transfer", **{'from': ctx.sender, 'to': ZERO_ADDRESS, 'tokenId': token_id})
+
+
+# 与 Solidity 自动生成的 getter 同名、但在 Python 类里需要换名的函数
+_GETTER_ALIASES = {"weapons": "weapons_getter"}
+
+
+class SimulatedChain:
+    """
+    自动出块的模拟链：每笔交易单独打包成一个区块（与 Hardhat automine 相同）
+    block_time > 0 时还会按时间间隔产生空块；JSON-RPC 请求由 handle() 处理
+    """
+
+    def __init__(self, abi, seed=0, accounts=None, block_time=0.0):
+        self.abi = abi
+        self.accounts = [_addr(a) for a in (accounts or HARDHAT_ACCOUNTS)]
+        self.address = _addr(Web3.keccak(text=f"weed-cutter-sim:{seed}")[-20:])
+        self.block_time = block_time
+        self._codec = Web3().eth.contract(address=self.address, abi=abi)  # 只用于 ABI 编解码
+        self._functions = {e['name']: e for e in abi if e.get('type') == 'function'}
+        self.code = self._dispatcher_code(abi)
+        self._events = {e['name']: e for e in abi if e.get('type') == 'event'}
+        self._event_topics = {
+            name: Web3.keccak(text=f"{name}({','.join(i['type'] for i in e['inputs'])})")
+            for name, e in self._events.items()
+        }
+        self._lock = threading.RLock()
+        self._filter_ids = itertools.count(1)
+        self.blocks = []
+        self.logs = []
+        self.receipts = {}
+        self.transactions = {}
+        self.nonces = {}
+        self.filters = {}  # 过滤器ID -> [地址, 下一条未读日志的下标]
+        self._started = time.monotonic()
+        balances = {account: INITIAL_BALANCE for account in self.accounts}
+        self.contract = SimulatedWeedCutter(self.address, self.accounts[0], random.Random(seed), balances)
+        self._mine_block([])  # 创世块
+        self._run_transaction(self.accounts[0], None, None, 0, DEFAULT_GAS_PRICE, constructor=True)
+
+    @staticmethod
+    def _dispatcher_code(abi):
+        """
+        伪造的运行时字节码：只包含模拟合约实现了的函数的分发表项（PUSHn 选择器 + EQ），
+        BlockchainManager 据此判断已部署合约支持哪些函数
+        """
+        code = bytearray.fromhex("6080604052")
+        for entry in abi:
+            name = entry.get('name')
+            if entry.get('type') == 'function' and hasattr(SimulatedWeedCutter, _GETTER_ALIASES.get(name, name)):
+                selector = function_abi_to_4byte_selector(entry).lstrip(b"\x00")
+                code += bytes([0x5f + len(selector)]) + selector + b"\x14"
+        return bytes(code)
+
+    # ---------- 出块 ----------
+
+    @property
+    def block_number(self):
+        return len(self.blocks) - 1
+
+    def _mine_block(self, tx_hashes):
+        number = len(self.blocks)
+        self.blocks.append({
+            'number': number,
+            'hash': HexBytes(Web3.keccak(text=f"block:{number}")),
+            'parentHash': self.blocks[-1]['hash'] if self.blocks else HexBytes(b"\0" * 32),
+            'timestamp': GENESIS_TIMESTAMP + number,
+            'transactions': list(tx_hashes),
+            'gasUsed': sum(self.receipts[h]['gasUsed'] for h in tx_hashes if h in self.receipts),
+        })
+        return self.blocks[-1]
+
+    def mine(self, count=1):
+        """产生 count 个空块"""
+        with self._lock:
+            for _ in range(count):
+                self._mine_block([])
+            return self.block_number
+
+    def _catch_up_interval_blocks(self):
+        if self.block_time > 0:
+            expected = int((time.monotonic() - self._started) / self.block_time)
+            while self.block_number < expected:
+                self._mine_block([])
+
+    # ---------- 执行 ----------
+
+    def _decode_call(self, data):
+        function, params = self._codec.decode_function_input(HexBytes(data))
+        entry = self._functions[function.fn_name]
+        return function.fn_name, entry, [params[i['name']] for i in entry['inputs']]
+
+    def _invoke(self, contract, name, entry, args, ctx):
+        method = getattr(contract, _GETTER_ALIASES.get(name, name))
+        if entry is not None and entry.get('stateMutability') in ('view', 'pure'):
+            return method(*args)
+        return method(ctx, *args)
+
+    def _encode_output(self, entry, result):
+        types = get_abi_output_types(entry)
+        if not types:
+            return b""
+        values = [result] if len(types) == 1 else list(result)
+        return abi_encode(types, values)
+
+    def _encode_log(self, name, args, index, tx_hash, tx_index, block):
+        entry = self._events[name]
+        topics = [self._event_topics[name]]
+        data_types, data_values = [], []
+        for arg in entry['inputs']:
+            if arg['indexed']:
+                topics.append(HexBytes(abi_encode([arg['type']], [args[arg['name']]])))
+            else:
+                data_types.append(arg['type'])
+                data_values.append(args[arg['name']])
+        return {
+            'address': self.address,
+            'topics': topics,
+            'data': HexBytes(abi_encode(data_types, data_values)),
+            'blockNumber': block['number'],
+            'blockHash': block['hash'],
+            'transactionHash': tx_hash,
+            'transactionIndex': tx_index,
+            'logIndex': index,
+            'removed': False,
+        }
+
+    def _run_transaction(self, sender, to, data, value, gas_price, constructor=False):
+        """
+        执行并打包一笔交易；revert 时抛出 Revert 且不出块
+        合约函数都先检查 require 再修改状态，所以 revert 时只需退回转账和丢弃事件
+        """
+        sender = _addr(sender)
+        contract = self.contract
+        balances = contract.balances
+        if constructor:
+            name, entry, args, gas_used = "constructor", None, [], 3_500_000
+        elif data:
+            name, entry, args = self._decode_call(data)
+            _require(value == 0 or entry.get('stateMutability') == 'payable', "non-payable function")
+            gas_used = _gas_used(name, args)
+        else:
+            name, entry, args, gas_used = None, None, [], 21000
+        recipient = self.address if (constructor or data) else _addr(to)
+        fee = gas_used * gas_price
+        _require(balances.get(sender, 0) >= value + fee, "sender doesn't have enough funds")
+
+        rng_state = contract.rng.getstate()
+        contract.events = []
+        balances[sender] -= value + fee
+        balances[recipient] = balances.get(recipient, 0) + value
+        if name is not None:
+            try:
+                ctx = CallContext(sender, value, GENESIS_TIMESTAMP + len(self.blocks))
+                self._invoke(contract, name, entry, args, ctx)
+            except Revert:
+                balances[recipient] -= value
+                balances[sender] += value + fee
+                contract.events = []
+                contract.rng.setstate(rng_state)
+                raise
+
+        nonce = self.nonces.get(sender, 0)
+        self.nonces[sender] = nonce + 1
+        tx_hash = HexBytes(Web3.keccak(text=f"tx:{sender}:{nonce}"))
+        self.transactions[tx_hash] = {'hash': tx_hash, 'from': sender, 'to': recipient, 'value': value,
+                                      'nonce': nonce, 'gas': gas_used, 'gasPrice': gas_price}
+        number = len(self.blocks)
+        block = {'number': number, 'hash': HexBytes(Web3.keccak(text=f"block:{number}"))}
+        logs = [self._encode_log(event, event_args, i, tx_hash, 0, block)
+                for i, (event, event_args) in enumerate(contract.events)]
+        contract.events = []
+        self.receipts[tx_hash] = {
+            'transactionHash': tx_hash, 'transactionIndex': 0,
+            'blockHash': block['hash'], 'blockNumber': number,
+            'from': sender, 'to': None if constructor else recipient,
+            'gasUsed': gas_used, 'cumulativeGasUsed': gas_used, 'effectiveGasPrice': gas_price,
+            'contractAddress': self.address if constructor else None,
+            'logs': logs, 'status': 1, 'type': 0,
+        }
+        self.logs.extend(logs)
+        self._mine_block([tx_hash])
+        return tx_hash
+
+    def _dry_run(self, sender, data, value):
+        """在状态副本上执行（eth_call 调用写函数 / eth_estimateGas），返回 (函数名, 函数 ABI, 结果)"""
+        name, entry, args = self._decode_call(data)
+        sandbox = copy.deepcopy(self.contract)
+        # 与真实交易一致：执行前 msg.value 已转入合约（余额不足时 eth_call 照常按节点行为放行）
+        sandbox.balances[self.address] = sandbox.balances.get(self.address, 0) + value
+        ctx = CallContext(sender or ZERO_ADDRESS, value, GENESIS_TIMESTAMP + len(self.blocks))
+        return name, entry, self._invoke(sandbox, name, entry, args, ctx)
+
+    # ---------- JSON-RPC ----------
+
+    def handle(self, method, params):
+        """处理一个 JSON-RPC 请求，返回 result；合约 revert 时抛出 Revert"""
+        with self._lock:
+            self._catch_up_interval_blocks()
+            handler = getattr(self, f"_rpc_{method}", None)
+            if handler is None:
+                raise NotImplementedError(f"模拟链不支持方法 {method}")
+            return handler(*params)
+
+    @staticmethod
+    def _int(value, default=0):
+        if value is None:
+            return default
+        return int(value, 16) if isinstance(value, str) else int(value)
+
+    def _block_arg(self, tag):
+        if tag in (None, "latest", "pending", "safe", "finalized"):
+            return self.block_number
+        if tag == "earliest":
+            return 0
+        return min(self._int(tag), self.block_number)
+
+    def _rpc_eth_chainId(self):
+        return hex(CHAIN_ID)
+
+    def _rpc_net_version(self):
+        return str(CHAIN_ID)
+
+    def _rpc_web3_clientVersion(self):
+        return "WeedCutterSim/1.0"
+
+    def _rpc_eth_blockNumber(self):
+        return hex(self.block_number)
+
+    def _rpc_eth_accounts(self):
+        return list(self.accounts)
+
+    def _rpc_eth_gasPrice(self):
+        return hex(DEFAULT_GAS_PRICE)
+
+    def _rpc_eth_getCode(self, address, block=None):
+        return "0x" + self.code.hex() if _addr(address) == self.address else "0x"
+
+    def _rpc_eth_getBalance(self, address, block=None):
+        return hex(self.contract.balances.get(_addr(address), 0))
+
+    def _rpc_eth_getTransactionCount(self, address, block=None):
+        return hex(self.nonces.get(_addr(address), 0))
+
+    def _rpc_eth_getBlockByNumber(self, tag, full=False):
+        block = self.blocks[self._block_arg(tag)]
+        return {
+            'number': hex(block['number']), 'hash': block['hash'].hex(), 'parentHash': block['parentHash'].hex(),
+            'timestamp': hex(block['timestamp']), 'gasLimit': hex(BLOCK_GAS_LIMIT),
+            'gasUsed': hex(block['gasUsed']), 'baseFeePerGas': hex(0), 'miner': ZERO_ADDRESS,
+            'difficulty': "0x0", 'totalDifficulty': "0x0", 'extraData': "0x", 'size': "0x0",
+            'nonce': "0x0000000000000000", 'transactions': [h.hex() for h in block['transactions']],
+            'uncles': [],
+        }
+
+    def _rpc_eth_call(self, tx, block=None):
+        data = tx.get('data') or tx.get('input')
+        name, entry, args = self._decode_call(data)
+        if entry.get('stateMutability') in ('view', 'pure'):
+            result = self._invoke(self.contract, name, entry, args, None)
+        else:
+            _, entry, result = self._dry_run(tx.get('from'), data, self._int(tx.get('value')))
+        return "0x" + self._encode_output(entry, result).hex()
+
+    def _rpc_eth_estimateGas(self, tx, block=None):
+        data = tx.get('data') or tx.get('input')
+        if not data:
+            return hex(21000)
+        name, _, _ = self._dry_run(tx.get('from'), data, self._int(tx.get('value')))
+        return hex(_gas_used(name, self._decode_call(data)[2]))
+
+    def _rpc_eth_sendTransaction(self, tx):
+        sender = tx['from']
+        _require(_addr(sender) in self.accounts, "unknown account")
+        tx_hash = self._run_transaction(sender, tx.get('to'), tx.get('data') or tx.get('input'),
+                                        self._int(tx.get('value')), self._int(tx.get('gasPrice'), DEFAULT_GAS_PRICE))
+        return tx_hash.hex()
+
+    def _format_log(self, log):
+        return {
+            'address': log['address'],
+            'topics': [t.hex() for t in log['topics']],
+            'data': log['data'].hex(),
+            'blockNumber': hex(log['blockNumber']),
+            'blockHash': log['blockHash'].hex(),
+            'transactionHash': log['transactionHash'].hex(),
+            'transactionIndex': hex(log['transactionIndex']),
+            'logIndex': hex(log['logIndex']),
+            'removed': False,
+        }
+
+    def _rpc_eth_getTransactionReceipt(self, tx_hash):
+        receipt = self.receipts.get(HexBytes(tx_hash))
+        if receipt is None:
+            return None
+        formatted = {key: hex(value) if isinstance(value, int) else value for key, value in receipt.items()}
+        formatted.update({
+            'transactionHash': receipt['transactionHash'].hex(),
+            'blockHash': receipt['blockHash'].hex(),
+            'logs': [self._format_log(log) for log in receipt['logs']],
+            'logsBloom': "0x" + "00" * 256,
+        })
+        return formatted
+
+    def _rpc_eth_getTransactionByHash(self, tx_hash):
+        tx = self.transactions.get(HexBytes(tx_hash))
+        if tx is None:
+            return None
+        receipt = self.receipts[tx['hash']]
+        return {
+            'hash': tx['hash'].hex(), 'from': tx['from'], 'to': tx['to'], 'value': hex(tx['value']),
+            'nonce': hex(tx['nonce']), 'gas': hex(tx['gas']), 'gasPrice': hex(tx['gasPrice']), 'input': "0x",
+            'blockNumber': hex(receipt['blockNumber']), 'blockHash': receipt['blockHash'].hex(),
+            'transactionIndex': "0x0",
+        }
+
+    def _match_logs(self, logs, params):
+        address = params.get('address')
+        addresses = None
+        if address:
+            addresses = {_addr(a) for a in (address if isinstance(address, list) else [address])}
+        topic0 = (params.get('topics') or [None])[0]
+        wanted = None
+        if topic0:
+            wanted = {HexBytes(t) for t in (topic0 if isinstance(topic0, list) else [topic0])}
+        return [
+            log for log in logs
+            if (addresses is None or log['address'] in addresses)
+            and (wanted is None or log['topics'][0] in wanted)
+        ]
+
+    def _rpc_eth_getLogs(self, params):
+        from_block = self._block_arg(params.get('fromBlock', 'latest'))
+        to_block = self._block_arg(params.get('toBlock', 'latest'))
+        in_range = [log for log in self.logs if from_block <= log['blockNumber'] <= to_block]
+        return [self._format_log(log) for log in self._match_logs(in_range, params)]
+
+    def _rpc_eth_newFilter(self, params):
+        filter_id = hex(next(self._filter_ids))
+        self.filters[filter_id] = [params, len(self.logs)]
+        return filter_id
+
+    def _rpc_eth_getFilterChanges(self, filter_id):
+        entry = self.filters.get(filter_id)
+        _require(entry is not None, "filter not found")
+        params, cursor = entry
+        entry[1] = len(self.logs)
+        return [self._format_log(log) for log in self._match_logs(self.logs[cursor:], params)]
+
+    def _rpc_eth_uninstallFilter(self, filter_id):
+        return self.filters.pop(filter_id, None) is not None
+
+
+class SimulatedProvider(BaseProvider):
+    """把 web3 请求交给 SimulatedChain 处理，每个请求附加 latency 秒的人工延迟"""
+
+    def __init__(self, chain, latency=0.0):
+        self.chain = chain
+        self.latency = latency
+        self.endpoint_uri = "sim://local"
+        self.requests = 0
+        self._ids = itertools.count()
+
+    def make_request(self, method, params):
+        if self.latency:
+            time.sleep(self.latency)
+        self.requests += 1
+        request_id = next(self._ids)
+        try:
+            result = self.chain.handle(method, params)
+        except Revert as e:
+            data = "0x08c379a0" + abi_encode(["string"], [str(e)]).hex()
+            return {'jsonrpc': "2.0", 'id': request_id,
+                    'error': {'code': 3, 'message': f"execution reverted: {e}", 'data': data}}
+        except NotImplementedError as e:
+            return {'jsonrpc': "2.0", 'id': request_id, 'error': {'code': -32601, 'message': str(e)}}
+        return {'jsonrpc': "2.0", 'id': request_id, 'result': result}
+
+    def is_connected(self, show_traceback=False):
+        return True
+
+    def health(self) -> dict:
+        return {
+            'state': "closed", 'failures': 0, 'retry_in': 0.0, 'last_error': "",
+            'latency_ms': self.latency * 1000, 'requests': self.requests, 'retries': 0,
+        }
+
+
+class SimulatedChainBackend(BlockchainManager):
+    """
+    与 BlockchainManager 接口相同的进程内后端：合约逻辑由 SimulatedWeedCutter 执行，
+    请求仍经过 web3 的 ABI 编解码、view 缓存和事件解码，游戏的所有链上路径都会被完整走一遍
+    同一个 seed 得到相同的开箱结果，适合确定性的压测和基准测试
+    """
+
+    def __init__(self, account_index: int = 0, latency: float = 0.0, seed: int = 0, block_time: float = 0.0):
+        super().__init__(account_index)
+        self.rpc_urls = ["sim://local"]
+        self.rpc_url = "sim://local"
+        self.latency = latency
+        self.seed = seed
+        self.block_time = block_time
+        self.chain = None
+
+    def _create_provider(self):
+        abi_data, _ = self._load_json_with_fallback(
+            ["WeedCutterNFT.json", "scripts/WeedCutterNFT.json"],
+            "合约 ABI"
+        )
+        self.chain = SimulatedChain(abi_data['abi'], seed=self.seed, block_time=self.block_time)
+        print(f"🧪 使用模拟链 (seed={self.seed}, 延迟 {self.latency * 1000:.0f} ms)")
+        return SimulatedProvider(self.chain, latency=self.latency)
+
+    def _resolve_contract_address(self, candidates):
+        return self.chain.address, {'address': self.chain.address}, candidates[0], self.chain.code
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+启动任务依赖图 - 互不依赖的初始化步骤并发执行，并记录启动到登录界面的耗时分解
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class StartupGraph:
+    """
+    每个任务声明依赖的任务名，依赖全部完成后立即提交到线程池执行
+    任务失败时依赖它的任务不再执行，result() 重新抛出原始异常
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.tasks = {}  # 名称 -> (函数, 依赖)
+        self.results = {}
+        self.errors = {}
+        self.timings = {}  # 名称 -> (开始, 结束)，相对 run() 开始的秒数
+        self.elapsed = 0.0
+
+    def add(self, name, func, deps=()):
+        self.tasks[name] = (func, tuple(deps))
+        return self
+
+    def _timed(self, name, func, t0):
+        start = time.perf_counter()
+        try:
+            return func()
+        finally:
+            self.timings[name] = (start - t0, time.perf_counter() - t0)
+
+    def _ready(self, remaining):
+        """取出依赖已满足的任务；依赖失败的任务直接记为失败"""
+        ready = []
+        changed = True
+        while changed:
+            changed = False
+            for name, (func, deps) in list(remaining.items()):
+                failed = [dep for dep in deps if dep in self.errors]
+                if failed:
+                    del remaining[name]
+                    self.errors[name] = RuntimeError(f"依赖的启动任务失败: {', '.join(failed)}")
+                    changed = True
+                elif all(dep in self.results for dep in deps):
+                    del remaining[name]
+                    ready.append((name, func))
+        return ready
+
+    def run(self):
+        """执行全部任务，返回总耗时（秒）"""
+        t0 = time.perf_counter()
+        remaining = dict(self.tasks)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="startup") as executor:
+            while True:
+                for name, func in self._ready(remaining):
+                    running[executor.submit(self._timed, name, func, t0)] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as e:
+                        self.errors[name] = e
+        for name in remaining:
+            self.errors[name] = RuntimeError(f"启动任务 {name} 的依赖不存在或循环依赖")
+        self.elapsed = time.perf_counter() - t0
+        return self.elapsed
+
+    def result(self, name):
+        """任务的返回值；任务失败时抛出其异常"""
+        if name in self.errors:
+            raise self.errors[name]
+        return self.results[name]
+
+
+class StartupProfile:
+    """
+    启动耗时分解：顺序执行的阶段用 mark() 记录，并发阶段用 add_graph() 展开每个任务，
+    登录界面第一帧画出后 report() 打印一次
+    """
+
+    def __init__(self, t0=None):
+        self.t0 = t0 if t0 is not None else time.perf_counter()
+        self.last = self.t0
+        self.phases = []  # (名称, 耗时秒, 是否为并发任务)
+        self.reported = False
+
+    def mark(self, name):
+        """记录从上一个阶段结束到现在的耗时"""
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last, False))
+        self.last = now
+
+    def add_graph(self, name, graph):
+        """记录一次 StartupGraph.run()，逐项列出其中的任务"""
+        self.mark(name)
+        for task, (start, end) in sorted(graph.timings.items(), key=lambda item: item[1][0]):
+            self.phases.append((task, end - start, True))
+
+    def total(self):
+        return self.last - self.t0
+
+    def report(self, title="登录界面"):
+        if self.reported:
+            return
+        self.reported = True
+        print(f"⏱️ 启动到{title}: {self.total() * 1000:.0f} ms")
+        for name, seconds, concurrent in self.phases:
+            prefix = "      ├ " if concurrent else "   "
+            print(f"{prefix}{name}: {seconds * 1000:.0f} ms")
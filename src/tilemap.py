@@ -2,24 +2,150 @@
 """
 地图相关类
 """
+import hashlib
+import json
+import mmap
 import os
+import xml.etree.ElementTree as ET
 import pygame
 import pytmx
 from pytmx.util_pygame import load_pygame
 import random
 
+# 预渲染地图缓存的格式版本（缓存内容或草地判定规则变化时 +1）
+MAP_CACHE_VERSION = 1
+# ARGB32（小端内存顺序为 B,G,R,A）是 convert_alpha() 的常见格式，按此存储时 frombuffer 得到的表面无需再转换
+_ARGB_MASKS = (0xFF0000, 0xFF00, 0xFF, 0xFF000000)
+# 缓存文件头（一行 JSON，空格补齐）的固定长度，像素数据从这里开始，保持 64 字节对齐
+_CACHE_HEADER_SIZE = 256
+
+
+def tmx_cache_key(tmx_path: str) -> str:
+    """TMX 文件内容的哈希 + 引用的外部图块集 (.tsx) 和图块图片的修改时间"""
+    digest = hashlib.sha1(f"v{MAP_CACHE_VERSION}\n".encode('utf-8'))
+    with open(tmx_path, 'rb') as f:
+        data = f.read()
+    digest.update(data)
+    pending = [(os.path.dirname(os.path.abspath(tmx_path)), ET.fromstring(data))]
+    while pending:
+        base_dir, root = pending.pop()
+        for element in root.iter():
+            source = element.get('source') if element.tag in ('tileset', 'image') else None
+            if not source:
+                continue
+            path = os.path.normpath(os.path.join(base_dir, source))
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime = -1
+            digest.update(f"{path}:{mtime}\n".encode('utf-8'))
+            if element.tag == 'tileset' and mtime >= 0:
+                with open(path, 'rb') as f:
+                    pending.append((os.path.dirname(path), ET.fromstring(f.read())))
+    return digest.hexdigest()
+
+
+def build_grass_mask(pixels: bytes, pixel_format: str) -> bytes:
+    """
+    looks_like_grass 的逐像素结果（非 0 = 草地）：不透明且 g > r + 10 且 g > b + 10
+    不依赖 numpy：每个通道展开为 16 位一格的大整数，格值 0x8000 + g - r - 11 不会向相邻格借位，
+    其最高位就是 g - r > 10 的判定结果，整幅地图只需几次大整数运算
+    """
+    count = len(pixels) // 4
+    r_offset, b_offset = (0, 2) if pixel_format == "RGBA" else (2, 0)
+
+    def lanes(offset):
+        spread = bytearray(2 * count)
+        spread[0::2] = pixels[offset::4]
+        return int.from_bytes(spread, 'little')
+
+    high = int.from_bytes(b"\x00\x80" * count, 'little')
+    ones = int.from_bytes(b"\x01\x00" * count, 'little')
+    green = lanes(1) | high
+    result = (green - lanes(r_offset) - 11 * ones) & (green - lanes(b_offset) - 11 * ones)
+    result &= (lanes(3) | high) - ones  # alpha > 0
+    result &= high
+    return result.to_bytes(2 * count, 'little')[1::2]
+
 
 class TileMap:
-    """TMX地图加载器"""
+    """
+    TMX地图加载器
+    渲染好的地图像素和草地判定结果缓存到磁盘（按 TMX 内容哈希和图块图片修改时间区分），
+    未变化时通过内存映射 + pygame.image.frombuffer 直接使用，完全跳过 pytmx 解析和逐图块绘制
+    """
     
-    def __init__(self, tmx_path: str):
+    def __init__(self, tmx_path: str, cache_file: str = "map_cache.bin"):
         if not os.path.exists(tmx_path):
             raise FileNotFoundError(f"未找到 TMX 地图: {tmx_path}")
+        self.cache_file = cache_file
+        self.tmx_data = None  # 命中缓存时不解析 TMX
+        self.grass_mask = None  # 每像素 1 字节，非 0 表示草地
+        try:
+            cache_key = tmx_cache_key(tmx_path)
+        except Exception as e:
+            print(f"⚠️ 无法计算地图缓存键，跳过缓存: {e}")
+            cache_key = None
+        if cache_key and self._load_cache(cache_key):
+            return
         self.tmx_data = load_pygame(tmx_path)
         self.pixel_width = self.tmx_data.width * self.tmx_data.tilewidth
         self.pixel_height = self.tmx_data.height * self.tmx_data.tileheight
         self.surface = pygame.Surface((self.pixel_width, self.pixel_height), pygame.SRCALPHA).convert_alpha()
         self._render_layers()
+        pixel_format = "BGRA" if self.surface.get_masks() == _ARGB_MASKS else "RGBA"
+        pixels = pygame.image.tobytes(self.surface, pixel_format)
+        self.grass_mask = build_grass_mask(pixels, pixel_format)
+        if cache_key:
+            self._save_cache(cache_key, pixel_format, pixels)
+
+    def _load_cache(self, cache_key) -> bool:
+        """映射磁盘缓存，像素直接作为表面的缓冲区（写时复制，不读入内存）"""
+        try:
+            with open(self.cache_file, 'rb') as f:
+                header = json.loads(f.readline())
+                if header.get('key') != cache_key:
+                    return False
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"⚠️ 地图缓存读取失败，将重新渲染: {e}")
+            return False
+        try:
+            width, height = header['width'], header['height']
+            offset = _CACHE_HEADER_SIZE
+            size = width * height * 4
+            view = memoryview(buffer)
+            if len(view) < offset + size + width * height:
+                return False
+            self.surface = pygame.image.frombuffer(view[offset:offset + size], (width, height), header['format'])
+            self.grass_mask = view[offset + size:offset + size + width * height]
+        except Exception as e:
+            print(f"⚠️ 地图缓存无效，将重新渲染: {e}")
+            return False
+        self.pixel_width = width
+        self.pixel_height = height
+        return True
+
+    def _save_cache(self, cache_key, pixel_format, pixels):
+        """写入缓存：固定长度的 JSON 头 + 像素 + 草地掩码"""
+        line = json.dumps({
+            'key': cache_key,
+            'width': self.pixel_width,
+            'height': self.pixel_height,
+            'format': pixel_format,
+        }).encode('utf-8')
+        line = line.ljust(_CACHE_HEADER_SIZE - 1) + b"\n"
+        tmp_path = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(line)
+                f.write(pixels)
+                f.write(self.grass_mask)
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            print(f"⚠️ 地图缓存写入失败: {e}")
 
     def _render_layers(self):
         """渲染所有图层到表面"""
@@ -50,11 +176,10 @@ class TileMap:
         return None
 
     def looks_like_grass(self, x: float, y: float) -> bool:
-        """检查指定位置是否看起来像草地"""
-        color = self.sample_color(x, y)
-        if color is None or color.a == 0:
-            return False
-        return color.g > color.r + 10 and color.g > color.b + 10
+        """检查指定位置是否看起来像草地（查预先算好的草地掩码）"""
+        if 0 <= x < self.pixel_width and 0 <= y < self.pixel_height:
+            return self.grass_mask[int(y) * self.pixel_width + int(x)] != 0
+        return False
 
 
 class ProceduralTileMap:
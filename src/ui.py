@@ -32,28 +32,39 @@ THEME = {
     "card_shadow": (203, 213, 225),     # 卡片阴影
 }
 
-# --- 字体定义 ---
-try:
-    font_path = None # 使用默认路径
-    title_font = load_chinese_font(48)
-    header_font = load_chinese_font(32)
-    default_font = load_chinese_font(20)
-    small_font = load_chinese_font(16)
-    icon_font = load_chinese_font(24)
-
-    # --- Emoji字体 ---
-    emoji_title_font = load_emoji_font(48)
-    emoji_header_font = load_emoji_font(32)
-    emoji_default_font = load_emoji_font(20)
-    emoji_small_font = load_emoji_font(16)
-except Exception as e:
-    print(f"字体加载失败: {e}. Pygame将使用默认字体。")
-    title_font = pygame.font.Font(None, 60)
-    header_font = pygame.font.Font(None, 40)
-    default_font = pygame.font.Font(None, 24)
-    small_font = pygame.font.Font(None, 18)
-    icon_font = pygame.font.Font(None, 30)
-    emoji_title_font = emoji_header_font = emoji_default_font = emoji_small_font = None
+# --- 字体定义（登录界面不使用，第一次绘制游戏界面前由 load_fonts() 加载） ---
+title_font = header_font = default_font = small_font = icon_font = None
+emoji_title_font = emoji_header_font = emoji_default_font = emoji_small_font = None
+_fonts_loaded = False
+
+
+def load_fonts():
+    """加载 UI 字体（只加载一次）"""
+    global title_font, header_font, default_font, small_font, icon_font
+    global emoji_title_font, emoji_header_font, emoji_default_font, emoji_small_font, _fonts_loaded
+    if _fonts_loaded:
+        return
+    _fonts_loaded = True
+    try:
+        title_font = load_chinese_font(48)
+        header_font = load_chinese_font(32)
+        default_font = load_chinese_font(20)
+        small_font = load_chinese_font(16)
+        icon_font = load_chinese_font(24)
+
+        # --- Emoji字体 ---
+        emoji_title_font = load_emoji_font(48)
+        emoji_header_font = load_emoji_font(32)
+        emoji_default_font = load_emoji_font(20)
+        emoji_small_font = load_emoji_font(16)
+    except Exception as e:
+        print(f"字体加载失败: {e}. Pygame将使用默认字体。")
+        title_font = pygame.font.Font(None, 60)
+        header_font = pygame.font.Font(None, 40)
+        default_font = pygame.font.Font(None, 24)
+        small_font = pygame.font.Font(None, 18)
+        icon_font = pygame.font.Font(None, 30)
+        emoji_title_font = emoji_header_font = emoji_default_font = emoji_small_font = None
 
 
 def draw_gradient_rect(surface, rect, color1, color2, vertical=True):
@@ -150,8 +161,8 @@ class UIRenderer:
 
         # 分数
         score_text = f"分数: {game.score}"
-        if game.pending_points > 0:
-            score_text += f" (+{game.pending_points}*)"
+        if game.unsettled_points > 0:
+            score_text += f" (+{game.unsettled_points}*)"
         stat_items.append((score_text, THEME["text"], "🏆"))
 
         # 金币
@@ -186,7 +197,7 @@ class UIRenderer:
             current_x += card_width + card_spacing
 
         # 提示信息
-        if game.pending_points > 0:
+        if game.unsettled_points > 0:
             hint = small_font.render("*待上链", True, THEME["danger"])
             hint_rect = pygame.Rect(current_x, stats_y + 15, hint.get_width() + 15, 25)
             hint_surf = pygame.Surface((hint_rect.width, hint_rect.height), pygame.SRCALPHA)
@@ -234,6 +245,11 @@ class UIRenderer:
         error_y = 110
         if not game.blockchain_manager.blockchain_available and game.blockchain_manager.offline_reason:
             warn_text = f"离线: {game.blockchain_manager.offline_reason}"
+            health = game.blockchain_manager.connection_health()
+            if health and health['reconnecting']:
+                warn_text += "  · 正在重连..."
+            elif health:
+                warn_text += f"  · {max(health['retry_in'], health['next_probe_in']):.0f} 秒后重连"
             warn_surf = default_font.render(warn_text, True, THEME["white"])
             warn_rect = pygame.Rect(20, error_y, warn_surf.get_width() + 30, 35)
 
@@ -274,7 +290,12 @@ class UIRenderer:
         title = title_font.render(title_text, True, THEME["white"])
         surface.blit(title, (WIDTH // 2 - title.get_width() // 2, 30))
 
-        if not game.weapons:
+        inventory = game.inventory_weapons
+        equipped_id = game.get_current_weapon()['id']
+        if not inventory and inventory.is_loading():
+            loading_text = default_font.render("加载中...", True, THEME["mid_gray"])
+            surface.blit(loading_text, (WIDTH // 2 - loading_text.get_width() // 2, HEIGHT // 2))
+        elif not inventory:
             empty_card = pygame.Rect(WIDTH // 2 - 200, HEIGHT // 2 - 60, 400, 120)
             draw_card_with_shadow(surface, empty_card, THEME["card_bg"], THEME["light_gray"], 2, 15)
 
@@ -290,12 +311,19 @@ class UIRenderer:
             line_height = 90
             max_visible = 6
             offset = max(0, game.inventory_selection - max_visible + 1)
+            inventory.ensure_window(offset, max_visible)
 
-            for idx in range(offset, min(len(game.weapons), offset + max_visible)):
-                weapon = game.weapons[idx]
+            for idx in range(offset, min(len(inventory), offset + max_visible)):
+                weapon = inventory[idx]
                 y = start_y + (idx - offset) * line_height
 
                 card_rect = pygame.Rect(80, y, WIDTH - 160, line_height - 10)
+                if weapon is None:
+                    # 所在页还在后台加载
+                    draw_card_with_shadow(surface, card_rect, THEME["card_bg"], THEME["light_gray"], 1, 12)
+                    loading_text = small_font.render("加载中...", True, THEME["mid_gray"])
+                    surface.blit(loading_text, (card_rect.x + 30, card_rect.centery - loading_text.get_height() // 2))
+                    continue
 
                 # 选中状态
                 is_selected = idx == game.inventory_selection
@@ -365,12 +393,18 @@ class UIRenderer:
                 status_x = card_rect.right - 100
                 status_y = card_rect.centery - 12
 
-                if idx == game.current_weapon_index:
+                if weapon['id'] == equipped_id:
                     equipped_badge = pygame.Rect(status_x, status_y, 80, 26)
                     pygame.draw.rect(surface, THEME["success"], equipped_badge, border_radius=6)
                     equipped_text = small_font.render("已装备", True, THEME["white"])
                     equipped_text_x = equipped_badge.centerx - equipped_text.get_width() // 2
                     surface.blit(equipped_text, (equipped_text_x, equipped_badge.y + 6))
+                elif weapon.get('for_sale', False):
+                    listed_badge = pygame.Rect(status_x, status_y, 80, 26)
+                    pygame.draw.rect(surface, THEME["accent"], listed_badge, border_radius=6)
+                    listed_text = small_font.render("已上架", True, THEME["white"])
+                    listed_text_x = listed_badge.centerx - listed_text.get_width() // 2
+                    surface.blit(listed_text, (listed_text_x, listed_badge.y + 6))
 
         # 底部操作栏
         bottom_rect = pygame.Rect(0, HEIGHT - 80, WIDTH, 80)
@@ -456,8 +490,7 @@ class UIRenderer:
             surface.blit(rarity_text, (left_x, content_y + 65))
 
             # 武器类型
-            weapon_type = game.weapon_manager.detect_weapon_type(weapon.get('original_name', ''))
-            type_text = default_font.render(f"类型: {weapon_type}", True, THEME["dark"])
+            type_text = default_font.render(f"类型: {weapon['weapon_type'].value}", True, THEME["dark"])
             surface.blit(type_text, (left_x, content_y + 100))
 
             # 伤害倍率
@@ -520,8 +553,7 @@ class UIRenderer:
 
             # 装备状态显示
             status_y = content_y + 280
-            weapon_index = game.weapons.index(weapon)
-            is_equipped = weapon_index == game.current_weapon_index
+            is_equipped = weapon['id'] == equipped_id
 
             if is_equipped:
                 status_rect = pygame.Rect(left_x, status_y, 280, 40)
@@ -577,8 +609,8 @@ class UIRenderer:
                                      close_btn.centery - close_text.get_height() // 2))
 
         # 上架输入框 - 精美设计，包含完整武器信息
-        if game.listing_input_active:
-            weapon = game.weapons[game.inventory_selection]
+        if game.listing_input_active and game.listing_weapon:
+            weapon = game.listing_weapon
 
             # 半透明遮罩
             overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
@@ -630,8 +662,7 @@ class UIRenderer:
             surface.blit(rarity_text, (left_x, content_y + 35))
 
             # 武器类型
-            weapon_type = game.weapon_manager.detect_weapon_type(weapon.get('original_name', ''))
-            type_text = default_font.render(f"类型: {weapon_type}", True, THEME["dark"])
+            type_text = default_font.render(f"类型: {weapon['weapon_type'].value}", True, THEME["dark"])
             surface.blit(type_text, (left_x, content_y + 70))
 
             # 伤害倍率
@@ -775,7 +806,18 @@ class UIRenderer:
         title = title_font.render(title_text, True, THEME["white"])
         surface.blit(title, (WIDTH // 2 - title.get_width() // 2, 30))
 
-        if not game.market_weapons:
+        # 筛选条件
+        type_label = game.market_type_filter.value if game.market_type_filter else "全部"
+        rarity_label = game.market_rarity_filter.name if game.market_rarity_filter else "全部"
+        filter_text = small_font.render(
+            f"类型: {type_label}  稀有度: {rarity_label}", True, THEME["white"]
+        )
+        surface.blit(filter_text, (WIDTH - filter_text.get_width() - 30, 72))
+
+        if not game.market_weapons and game.market_weapons.is_loading():
+            loading_text = default_font.render("加载中...", True, THEME["mid_gray"])
+            surface.blit(loading_text, (WIDTH // 2 - loading_text.get_width() // 2, HEIGHT // 2))
+        elif not game.market_weapons:
             # 空状态卡片
             empty_card = pygame.Rect(WIDTH // 2 - 200, HEIGHT // 2 - 60, 400, 120)
             draw_card_with_shadow(surface, empty_card, THEME["card_bg"], THEME["light_gray"], 2, 15)
@@ -792,6 +834,7 @@ class UIRenderer:
             line_height = 95
             max_visible = 6
             offset = max(0, game.market_selection - max_visible + 1)
+            game.market_weapons.ensure_window(offset, max_visible)
             
             for idx in range(offset, min(len(game.market_weapons), offset + max_visible)):
                 weapon = game.market_weapons[idx]
@@ -807,6 +850,13 @@ class UIRenderer:
                 # 绘制卡片
                 draw_card_with_shadow(surface, card_rect, bg_color, border_color, border_width, 15)
 
+                if weapon is None:
+                    # 所在页仍在后台加载
+                    loading_text = default_font.render("加载中...", True, THEME["mid_gray"])
+                    surface.blit(loading_text, (card_rect.centerx - loading_text.get_width() // 2,
+                                                card_rect.centery - loading_text.get_height() // 2))
+                    continue
+
                 # 稀有度色条
                 rarity_color = game.get_rarity_color(weapon['rarity'])
                 rarity_bar = pygame.Rect(card_rect.x + 10, card_rect.y + 12, 6, card_rect.height - 24)
@@ -875,7 +925,7 @@ class UIRenderer:
                     price_text = f"{weapon['coin_price']} 金币"
                     price_color = THEME["accent"]
                 else:
-                    eth_price = game.blockchain_manager.w3.from_wei(weapon['price'], 'ether')
+                    eth_price = weapon['price_eth']
                     price_text = f"{eth_price:.4f} ETH"
                     price_color = THEME["primary"]
 
@@ -904,6 +954,7 @@ class UIRenderer:
             ("↑↓", "选择", THEME["secondary"]),
             ("Enter", "购买", THEME["primary"]),
             ("R", "刷新", THEME["accent"]),
+            ("T/F", "筛选", THEME["secondary"]),
             ("M/ESC", "返回", THEME["mid_gray"])
         ]
 
@@ -983,8 +1034,7 @@ class UIRenderer:
             surface.blit(rarity_text, (left_x, content_y + 35))
 
             # 武器类型
-            weapon_type = game.weapon_manager.detect_weapon_type(weapon.get('original_name', ''))
-            type_text = default_font.render(f"类型: {weapon_type}", True, THEME["dark"])
+            type_text = default_font.render(f"类型: {weapon['weapon_type'].value}", True, THEME["dark"])
             surface.blit(type_text, (left_x, content_y + 70))
 
             # 伤害倍率
@@ -1068,7 +1118,7 @@ class UIRenderer:
                 balance_text = small_font.render(f"你的金币: {game.coins}", True, THEME["mid_gray"])
                 surface.blit(balance_text, (price_rect.x + 20, price_y + 55))
             else:
-                eth_price = game.blockchain_manager.w3.from_wei(weapon['price'], 'ether')
+                eth_price = weapon['price_eth']
                 price_value = f"{eth_price:.4f} ETH"
                 price_color = THEME["primary"]
 
@@ -1424,10 +1474,11 @@ class UIRenderer:
         # 排行榜内容
         start_y = 180
         line_height = 60
-        max_visible = 9
+        max_visible = game.leaderboard_page_size
+        total_rows = len(game.leaderboard)
         offset = max(0, game.leaderboard_selection - max_visible + 1)
 
-        for idx in range(offset, min(len(game.leaderboard), offset + max_visible)):
+        for idx in range(offset, min(total_rows, offset + max_visible)):
             entry = game.leaderboard[idx]
             y = start_y + (idx - offset) * line_height
 
@@ -1527,14 +1578,21 @@ class UIRenderer:
             rank_value = header_font.render(f"#{game.player_rank} / {game.total_players}", True, THEME["secondary"])
             surface.blit(rank_value, (your_rank_card.x + 15, your_rank_card.y + 25))
 
+        # 滚动位置
+        if total_rows > max_visible:
+            position = small_font.render(f"{game.leaderboard_selection + 1} / {total_rows}", True, THEME["mid_gray"])
+            surface.blit(position, (WIDTH - 60 - position.get_width(), 90 + (20 - position.get_height()) // 2))
+
         # 操作提示
         hints = [
             ("↑↓", "滚动", THEME["accent"]),
+            ("PgUp/PgDn", "翻页", THEME["accent"]),
+            ("M", "我的位置", THEME["secondary"]),
             ("R", "刷新", THEME["primary"]),
             ("ESC", "返回", THEME["mid_gray"])
         ]
 
-        hint_x = 400
+        hint_x = 340
         for key, action, color in hints:
             key_rect = pygame.Rect(hint_x, HEIGHT - 60, len(key) * 15 + 10, 30)
             pygame.draw.rect(surface, color, key_rect, border_radius=5)
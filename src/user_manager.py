@@ -5,87 +5,301 @@
 import json
 import os
 import hashlib
+import hmac
 import secrets
+import threading
+import time
+import functools
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, Future
 from typing import Optional, Dict, List, Tuple
 from datetime import datetime
 from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
+from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.backends import default_backend
+from .key_pool import RSAKeyPool
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# Hardhat 的前 20 个测试账户地址（这些地址是固定的）
+HARDHAT_ACCOUNTS = [
+    "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266",  # Account #0
+    "0x70997970C51812dc3A010C7d01b50e0d17dc79C8",  # Account #1
+    "0x3C44CdDdB6a900fa2b585dd299e03d12FA4293BC",  # Account #2
+    "0x90F79bf6EB2c4f870365E785982E1f101E93b906",  # Account #3
+    "0x15d34AAf54267DB7D7c367839AAf71A00a2C6A65",  # Account #4
+    "0x9965507D1a55bcC2695C58ba16FB37d819B0A4dc",  # Account #5
+    "0x976EA74026E726554dB657fA54763abd0C3a0aa9",  # Account #6
+    "0x14dC79964da2C08b23698B3D3cc7Ca32193d9955",  # Account #7
+    "0x23618e81E3f5cdF7f54C3d65f7FBc0aBf5B21E8f",  # Account #8
+    "0xa0Ee7A142d267C1f36714E4a8F75612F20a79720",  # Account #9
+    "0xBcd4042DE499D14e55001CcbB24a551F3b954096",  # Account #10
+    "0x71bE63f3384f5fb98995898A86B02Fb2426c5788",  # Account #11
+    "0xFABB0ac9d68B0B445fB7357272Ff202C5651694a",  # Account #12
+    "0x1CBd3b2770909D4e10f157cABC84C7264073C9Ec",  # Account #13
+    "0xdF3e18d64BC6A983f673Ab319CCaE4f1a57C7097",  # Account #14
+    "0xcd3B766CCDd6AE721141F452C550Ca635964ce71",  # Account #15
+    "0x2546BcD3c84621e976D8185a91A922aE77ECEc30",  # Account #16
+    "0xbDA5747bFD65F08deb54cb465eB87D40e51B197E",  # Account #17
+    "0xdD2FD4581271e230360230F9337D5c0430Bf44C0",  # Account #18
+    "0x8626f6940E2eb28930eFb4CeF49B2d1F2C9C1199",  # Account #19
+]
+
+# 数据文件中保存 schema 信息的保留键（不是用户名）
+SCHEMA_KEY = "__schema__"
+
+
+def _migrate_wallet_addresses(users: Dict):
+    """
+    迁移旧用户的钱包地址
+    将随机生成的地址替换为 Hardhat 固定测试账户地址
+    """
+    for i, (username, user_data) in enumerate(users.items()):
+        old_address = user_data.get('wallet_address', '')
+
+        # 检查地址是否需要迁移（不在 Hardhat 账户列表中）
+        if old_address not in HARDHAT_ACCOUNTS:
+            # 分配 Hardhat 账户
+            new_index = i % len(HARDHAT_ACCOUNTS)
+            new_address = HARDHAT_ACCOUNTS[new_index]
+            user_data['wallet_address'] = new_address
+            print(f"🔄 迁移用户 {username}: {old_address[:10]}... -> {new_address}")
+
+
+# 数据迁移列表：(版本号, 名称, 迁移函数)，按版本号递增，每个只执行一次
+MIGRATIONS = [
+    (1, "wallet_addresses", _migrate_wallet_addresses),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+# 交易信息加密使用的 OAEP 填充（无状态，可复用）
+_TRADE_OAEP_PADDING = padding.OAEP(
+    mgf=padding.MGF1(algorithm=hashes.SHA256()),
+    algorithm=hashes.SHA256(),
+    label=None
+)
+
+
+def _lock_fd(fd):
+    """对文件描述符加独占锁（阻塞直到获得）"""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+
+
+def _unlock_fd(fd):
+    """释放文件锁"""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def _shared_write(method):
+    """在跨进程锁内执行：先合并其他客户端的修改，再执行写操作"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._transaction():
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 class UserManager:
     """用户管理器 - 处理用户认证和好友系统"""
     
-    def __init__(self, data_file="user_data.json"):
+    def __init__(self, data_file="user_data.json", session_ttl=600, key_pool_size=2, auto_migrate=True):
         self.data_file = data_file
+        self.lock_file = data_file + ".lock"
         self.users = {}
+        self.schema = {'version': SCHEMA_VERSION, 'applied': []}
         self.current_user = None
+        # 多个游戏实例共享同一个数据文件：用文件锁串行化写入，
+        # 用 (mtime, size) 检测其他进程的修改，用每个用户的 _rev 做增量合并
+        self._thread_lock = threading.RLock()
+        self._lock_fd = None
+        self._lock_depth = 0
+        self._file_stamp = None
+        self._dirty = set()  # 本进程修改过、尚未写盘的用户名（由写操作显式登记）
+        # 会话缓存：最近验证过的用户再次登录时跳过 PBKDF2（仅存于内存，session_ttl=0 关闭）
+        self.session_ttl = session_ttl
+        self._session_secret = secrets.token_bytes(32)
+        self._sessions = {}  # username -> (password_hash, 密码摘要, 过期时间)
+        self._auth_executor = None
+        self._public_key_cache = {}  # username -> (PEM, 已解析的公钥对象)
+        # 预生成 RSA 密钥对，注册时 O(1) 取用（打开注册界面或第一次注册时才开始生成）
+        self.key_pool = RSAKeyPool(size=key_pool_size)
         self.load_data()
-        self.migrate_wallet_addresses()  # 迁移旧用户的钱包地址
+        if auto_migrate and self.pending_migrations():
+            self.run_migrations()
+
+    # ==================== 共享存储 ====================
+
+    @contextmanager
+    def _file_lock(self):
+        """跨进程独占锁（可重入）"""
+        with self._thread_lock:
+            if self._lock_depth == 0:
+                self._lock_fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+                _lock_fd(self._lock_fd)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    _unlock_fd(self._lock_fd)
+                    os.close(self._lock_fd)
+                    self._lock_fd = None
+
+    @contextmanager
+    def _transaction(self):
+        """读-改-写事务：持锁期间先同步磁盘上的最新数据"""
+        with self._file_lock():
+            self.refresh_if_changed()
+            yield
+
+    def _stat_stamp(self):
+        """数据文件的变化戳 (mtime_ns, size)，文件不存在时返回 None"""
+        try:
+            st = os.stat(self.data_file)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _read_disk(self) -> Tuple[Dict, Dict]:
+        """读取磁盘上的用户数据，返回 (用户字典, schema 信息)"""
+        with open(self.data_file, 'r', encoding='utf-8') as f:
+            users = json.load(f)
+        # 没有 schema 信息的旧文件视为版本 0
+        schema = users.pop(SCHEMA_KEY, None) or {'version': 0, 'applied': []}
+        return users, schema
 
     def load_data(self):
         """加载用户数据"""
         if os.path.exists(self.data_file):
             try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    self.users = json.load(f)
+                with self._file_lock():
+                    self._file_stamp = self._stat_stamp()
+                    self.users, self.schema = self._read_disk()
                 print(f"✅ 加载了 {len(self.users)} 个用户数据")
             except Exception as e:
                 print(f"⚠️ 加载用户数据失败: {e}")
                 self.users = {}
         else:
             self.users = {}
+        self._dirty.clear()
+
+    def refresh_if_changed(self) -> List[str]:
+        """
+        检查其他客户端是否修改了数据文件，只替换 _rev 有变化的用户
+        返回: 发生变化的用户名列表
+        """
+        stamp = self._stat_stamp()
+        if stamp is None or stamp == self._file_stamp:
+            return []
+
+        try:
+            with self._file_lock():
+                stamp = self._stat_stamp()
+                disk_users, disk_schema = self._read_disk()
+        except Exception as e:
+            print(f"⚠️ 同步用户数据失败: {e}")
+            return []
+
+        with self._thread_lock:
+            self._file_stamp = stamp
+            if disk_schema.get('version', 0) >= self.schema.get('version', 0):
+                self.schema = disk_schema
+            dirty = self._dirty
+            changed = []
+            for username, disk_data in disk_users.items():
+                if username in dirty:
+                    continue
+                local_data = self.users.get(username)
+                if local_data is None or local_data.get('_rev', 0) != disk_data.get('_rev', 0):
+                    self.users[username] = disk_data
+                    changed.append(username)
+            for username in list(self.users):
+                if username not in disk_users and username not in dirty:
+                    del self.users[username]
+                    changed.append(username)
+
+        if changed:
+            print(f"🔄 同步了其他客户端的修改: {', '.join(changed)}")
+        return changed
     
-    def migrate_wallet_addresses(self):
+    def pending_migrations(self) -> List[Tuple[int, str]]:
+        """尚未应用的迁移 [(版本号, 名称), ...]，数据已是最新时不遍历用户"""
+        current = self.schema.get('version', 0)
+        return [(version, name) for version, name, _ in MIGRATIONS if version > current]
+
+    def run_migrations(self) -> List[str]:
         """
-        迁移旧用户的钱包地址
-        将随机生成的地址替换为 Hardhat 固定测试账户地址
+        按版本顺序执行尚未应用的迁移，并把完成记录写入数据文件
+        返回: 本次执行的迁移名称
         """
-        HARDHAT_ACCOUNTS = [
-            "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266",
-            "0x70997970C51812dc3A010C7d01b50e0d17dc79C8",
-            "0x3C44CdDdB6a900fa2b585dd299e03d12FA4293BC",
-            "0x90F79bf6EB2c4f870365E785982E1f101E93b906",
-            "0x15d34AAf54267DB7D7c367839AAf71A00a2C6A65",
-            "0x9965507D1a55bcC2695C58ba16FB37d819B0A4dc",
-            "0x976EA74026E726554dB657fA54763abd0C3a0aa9",
-            "0x14dC79964da2C08b23698B3D3cc7Ca32193d9955",
-            "0x23618e81E3f5cdF7f54C3d65f7FBc0aBf5B21E8f",
-            "0xa0Ee7A142d267C1f36714E4a8F75612F20a79720",
-            "0xBcd4042DE499D14e55001CcbB24a551F3b954096",
-            "0x71bE63f3384f5fb98995898A86B02Fb2426c5788",
-            "0xFABB0ac9d68B0B445fB7357272Ff202C5651694a",
-            "0x1CBd3b2770909D4e10f157cABC84C7264073C9Ec",
-            "0xdF3e18d64BC6A983f673Ab319CCaE4f1a57C7097",
-            "0xcd3B766CCDd6AE721141F452C550Ca635964ce71",
-            "0x2546BcD3c84621e976D8185a91A922aE77ECEc30",
-            "0xbDA5747bFD65F08deb54cb465eB87D40e51B197E",
-            "0xdD2FD4581271e230360230F9337D5c0430Bf44C0",
-            "0x8626f6940E2eb28930eFb4CeF49B2d1F2C9C1199",
-        ]
-
-        migrated = False
-        for i, (username, user_data) in enumerate(self.users.items()):
-            old_address = user_data.get('wallet_address', '')
-
-            # 检查地址是否需要迁移（不在 Hardhat 账户列表中）
-            if old_address not in HARDHAT_ACCOUNTS:
-                # 分配 Hardhat 账户
-                new_index = i % len(HARDHAT_ACCOUNTS)
-                new_address = HARDHAT_ACCOUNTS[new_index]
-                user_data['wallet_address'] = new_address
-                print(f"🔄 迁移用户 {username}: {old_address[:10]}... -> {new_address}")
-                migrated = True
-
-        if migrated:
-            self.save_data()
-            print("✅ 钱包地址迁移完成")
-
-    def save_data(self):
-        """保存用户数据"""
+        applied = []
+        with self._transaction():
+            for version, name, migrate in MIGRATIONS:
+                if version <= self.schema.get('version', 0):
+                    continue
+                print(f"🔄 执行数据迁移 v{version}: {name}")
+                migrate(self.users)
+                self._dirty.update(self.users)
+                self.schema['version'] = version
+                self.schema.setdefault('applied', []).append({
+                    'version': version,
+                    'name': name,
+                    'applied_at': datetime.now().isoformat()
+                })
+                applied.append(name)
+            if applied:
+                self.save_data()
+                print(f"✅ 数据迁移完成，当前版本 v{self.schema['version']}")
+        return applied
+
+    def save_data(self, *usernames):
+        """
+        保存用户数据：只写入本进程修改过的用户（usernames 加上之前登记的），其余保留磁盘上的最新版本
+        """
+        self._dirty.update(usernames)
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.users, f, indent=2, ensure_ascii=False)
+            with self._file_lock():
+                exists = self._stat_stamp() is not None
+                if exists:
+                    disk_users, disk_schema = self._read_disk()
+                else:
+                    disk_users, disk_schema = {}, {'version': 0, 'applied': []}
+                if disk_schema.get('version', 0) > self.schema.get('version', 0):
+                    self.schema = disk_schema
+                dirty = [username for username in self._dirty if username in self.users]
+                if not dirty and exists and disk_schema == self.schema:
+                    return
+                for username in dirty:
+                    user_data = self.users[username]
+                    disk_rev = disk_users.get(username, {}).get('_rev', 0)
+                    user_data['_rev'] = max(disk_rev, user_data.get('_rev', 0)) + 1
+                    disk_users[username] = user_data
+
+                tmp_path = f"{self.data_file}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({SCHEMA_KEY: self.schema, **disk_users}, f, indent=2, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.data_file)
+
+                self._file_stamp = self._stat_stamp()
+                self.users = disk_users
+                self._dirty.clear()
             print("✅ 用户数据已保存")
         except Exception as e:
             print(f"❌ 保存用户数据失败: {e}")
@@ -116,30 +330,6 @@ class UserManager:
         Hardhat 提供了 20 个固定的测试账户，地址是确定性的
         我们根据已注册用户数量来分配账户
         """
-        # Hardhat 的前 20 个测试账户地址（这些地址是固定的）
-        HARDHAT_ACCOUNTS = [
-            "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266",  # Account #0
-            "0x70997970C51812dc3A010C7d01b50e0d17dc79C8",  # Account #1
-            "0x3C44CdDdB6a900fa2b585dd299e03d12FA4293BC",  # Account #2
-            "0x90F79bf6EB2c4f870365E785982E1f101E93b906",  # Account #3
-            "0x15d34AAf54267DB7D7c367839AAf71A00a2C6A65",  # Account #4
-            "0x9965507D1a55bcC2695C58ba16FB37d819B0A4dc",  # Account #5
-            "0x976EA74026E726554dB657fA54763abd0C3a0aa9",  # Account #6
-            "0x14dC79964da2C08b23698B3D3cc7Ca32193d9955",  # Account #7
-            "0x23618e81E3f5cdF7f54C3d65f7FBc0aBf5B21E8f",  # Account #8
-            "0xa0Ee7A142d267C1f36714E4a8F75612F20a79720",  # Account #9
-            "0xBcd4042DE499D14e55001CcbB24a551F3b954096",  # Account #10
-            "0x71bE63f3384f5fb98995898A86B02Fb2426c5788",  # Account #11
-            "0xFABB0ac9d68B0B445fB7357272Ff202C5651694a",  # Account #12
-            "0x1CBd3b2770909D4e10f157cABC84C7264073C9Ec",  # Account #13
-            "0xdF3e18d64BC6A983f673Ab319CCaE4f1a57C7097",  # Account #14
-            "0xcd3B766CCDd6AE721141F452C550Ca635964ce71",  # Account #15
-            "0x2546BcD3c84621e976D8185a91A922aE77ECEc30",  # Account #16
-            "0xbDA5747bFD65F08deb54cb465eB87D40e51B197E",  # Account #17
-            "0xdD2FD4581271e230360230F9337D5c0430Bf44C0",  # Account #18
-            "0x8626f6940E2eb28930eFb4CeF49B2d1F2C9C1199",  # Account #19
-        ]
-
         # 计算当前用户索引（用于分配账户）
         user_index = len(self.users)
 
@@ -155,54 +345,71 @@ class UserManager:
     def register_user(self, username: str, email: str, password: str) -> Tuple[bool, str, Optional[str]]:
         """
         注册新用户
+        PBKDF2 和取密钥在跨进程锁外完成，持锁期间只做唯一性检查和写盘
         返回: (成功, 消息, 钱包地址)
         """
+        error = self._validate_registration(username, email, password)
+        credentials = None if error else self._derive_credentials(password)
+        return self.finish_register((username, email, error, credentials))
+
+    def _validate_registration(self, username: str, email: str, password: str) -> Optional[str]:
+        """注册表单校验和按本地数据的重复检查（持锁写入时会按磁盘最新数据再检查一次），返回错误消息"""
         # 验证用户名
         if not username or len(username) < 3:
-            return False, "用户名至少需要3个字符", None
-        
-        if username in self.users:
-            return False, "用户名已存在", None
-        
+            return "用户名至少需要3个字符"
+
+        if username == SCHEMA_KEY:
+            return "用户名不可用"
+
         # 验证邮箱
         if not email or '@' not in email:
-            return False, "请输入有效的邮箱地址", None
-        
-        # 检查邮箱是否已被使用
-        for user_data in self.users.values():
-            if user_data.get('email') == email:
-                return False, "邮箱已被注册", None
-        
+            return "请输入有效的邮箱地址"
+
         # 验证密码强度
         if len(password) < 6:
-            return False, "密码至少需要6个字符", None
-        
-        # 生成密码哈希
+            return "密码至少需要6个字符"
+
+        # 先检查重复，避免白白派生密钥
+        return self._check_new_user(username, email)
+
+    def _derive_credentials(self, password: str) -> Tuple[str, str, str, str]:
+        """注册的耗时部分（不读写 self.users，可在后台线程执行）：返回 (密码哈希, 盐, 私钥 PEM, 公钥 PEM)"""
         password_hash, salt = self.hash_password(password)
-        
+        # 从密钥池取 RSA 密钥对用于好友交易加密
+        private_pem, public_pem = self.key_pool.take()
+        return password_hash, salt, private_pem, public_pem
+
+    def finish_register(self, prepared) -> Tuple[bool, str, Optional[str]]:
+        """
+        写入注册结果（在主线程调用）
+        prepared: (用户名, 邮箱, 错误消息, _derive_credentials 的结果)
+        """
+        username, email, error, credentials = prepared
+        if error:
+            return False, error, None
+        return self._insert_user(username, email, *credentials)
+
+    def _check_new_user(self, username: str, email: str) -> Optional[str]:
+        """用户名/邮箱是否已被使用，返回错误消息"""
+        if username in self.users:
+            return "用户名已存在"
+
+        # 检查邮箱是否已被使用
+        for user_data in self.users.values():
+            if user_data.get('email') == email:
+                return "邮箱已被注册"
+        return None
+
+    @_shared_write
+    def _insert_user(self, username, email, password_hash, salt, private_pem, public_pem):
+        """持锁写入新用户（register_user 的最后一步）"""
+        error = self._check_new_user(username, email)
+        if error:
+            return False, error, None
+
         # 生成钱包地址
         wallet_address = self.generate_wallet_address(username)
-        
-        # 生成 RSA 密钥对用于好友交易加密
-        private_key = rsa.generate_private_key(
-            public_exponent=65537,
-            key_size=2048,
-            backend=default_backend()
-        )
-        public_key = private_key.public_key()
-        
-        # 序列化密钥
-        private_pem = private_key.private_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PrivateFormat.PKCS8,
-            encryption_algorithm=serialization.NoEncryption()
-        ).decode('utf-8')
-        
-        public_pem = public_key.public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
-        ).decode('utf-8')
-        
+
         # 创建用户数据
         user_data = {
             'username': username,
@@ -224,25 +431,110 @@ class UserManager:
         }
         
         self.users[username] = user_data
-        self.save_data()
+        self.save_data(username)
         
         return True, "注册成功！", wallet_address
     
+    def _session_digest(self, password: str) -> str:
+        """会话缓存用的快速摘要（进程内随机密钥，不落盘）"""
+        return hmac.new(self._session_secret, password.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def _check_session(self, username: str, password: str, password_hash: str) -> bool:
+        """命中会话缓存则无需重新派生密钥"""
+        entry = self._sessions.get(username)
+        if not entry:
+            return False
+        cached_hash, digest, expires_at = entry
+        if time.time() > expires_at or cached_hash != password_hash:
+            self._sessions.pop(username, None)
+            return False
+        return hmac.compare_digest(digest, self._session_digest(password))
+
+    def _remember_session(self, username: str, password: str, password_hash: str):
+        """记录一次成功的密码验证"""
+        if self.session_ttl <= 0:
+            return
+        self._sessions[username] = (
+            password_hash,
+            self._session_digest(password),
+            time.time() + self.session_ttl
+        )
+
     def login(self, username: str, password: str) -> Tuple[bool, str]:
         """
         用户登录
         返回: (成功, 消息)
         """
-        if username not in self.users:
+        prepared = self._prepare_login(username, password)
+        if prepared[3] is None:
+            prepared = self._verify_login(*prepared)
+        return self.finish_login(prepared)
+
+    def _prepare_login(self, username: str, password: str):
+        """
+        登录的第一步（读 self.users，在调用方线程执行）：取出用户的密码哈希和盐，命中会话缓存时直接通过
+        返回: (用户名, 密码, (密码哈希, 盐) 或 None, 是否通过；None 表示还需要派生密钥验证)
+        """
+        self.refresh_if_changed()  # 其他客户端可能刚注册了该用户
+        user_data = self.users.get(username)
+        if user_data is None:
+            return username, password, None, False
+        stored = (user_data['password_hash'], user_data['salt'])
+        if self._check_session(username, password, stored[0]):
+            return username, password, stored, True
+        return username, password, stored, None
+
+    def _verify_login(self, username, password, stored, verified):
+        """登录的耗时部分（只做 PBKDF2，不读写 self.users，可在后台线程执行）"""
+        return username, password, stored, self.verify_password(password, *stored)
+
+    def finish_login(self, prepared) -> Tuple[bool, str]:
+        """应用登录结果（在主线程调用），返回: (成功, 消息)"""
+        username, password, stored, verified = prepared
+        if stored is None:
             return False, "用户名不存在"
-        
-        user_data = self.users[username]
-        
-        if self.verify_password(password, user_data['password_hash'], user_data['salt']):
-            self.current_user = username
-            return True, "登录成功！"
-        else:
+        if not verified:
+            return False, "密码错误"
+        user_data = self.users.get(username)
+        if user_data is None or user_data['password_hash'] != stored[0]:
+            # 验证期间其他客户端删除了用户或改了密码
             return False, "密码错误"
+        self._remember_session(username, password, stored[0])
+        self.current_user = username
+        return True, "登录成功！"
+
+    def _submit_auth(self, fn, *args) -> Future:
+        """把耗时的认证操作放到后台线程（PBKDF2 / RSA 运算期间会释放 GIL）"""
+        if self._auth_executor is None:
+            self._auth_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="auth")
+        return self._auth_executor.submit(fn, *args)
+
+    @staticmethod
+    def _completed(result) -> Future:
+        future = Future()
+        future.set_result(result)
+        return future
+
+    def login_async(self, username: str, password: str) -> Future:
+        """
+        后台登录：self.users 只在调用方线程读取，后台线程只做密钥派生
+        Future 结果交给 finish_login（在主线程调用）应用
+        """
+        prepared = self._prepare_login(username, password)
+        if prepared[3] is not None:
+            return self._completed(prepared)
+        return self._submit_auth(self._verify_login, *prepared)
+
+    def register_user_async(self, username: str, email: str, password: str) -> Future:
+        """
+        后台注册：校验和写入在调用方线程，后台线程只做密钥派生和取 RSA 密钥
+        Future 结果交给 finish_register（在主线程调用）应用
+        """
+        error = self._validate_registration(username, email, password)
+        if error:
+            return self._completed((username, email, error, None))
+        return self._submit_auth(
+            lambda: (username, email, None, self._derive_credentials(password)))
     
     def logout(self):
         """登出"""
@@ -263,6 +555,7 @@ class UserManager:
     
     # ==================== 好友系统 ====================
     
+    @_shared_write
     def send_friend_request(self, target_username: str) -> Tuple[bool, str]:
         """发送好友请求"""
         if not self.current_user:
@@ -287,10 +580,11 @@ class UserManager:
         
         # 添加好友请求
         target_data['friend_requests'].append(self.current_user)
-        self.save_data()
+        self.save_data(target_username)
         
         return True, f"已向 {target_username} 发送好友请求"
     
+    @_shared_write
     def accept_friend_request(self, requester_username: str) -> Tuple[bool, str]:
         """接受好友请求"""
         if not self.current_user:
@@ -311,10 +605,11 @@ class UserManager:
         current_data['friends'].append(requester_username)
         self.users[requester_username]['friends'].append(self.current_user)
         
-        self.save_data()
+        self.save_data(self.current_user, requester_username)
         
         return True, f"已添加 {requester_username} 为好友"
     
+    @_shared_write
     def reject_friend_request(self, requester_username: str) -> Tuple[bool, str]:
         """拒绝好友请求"""
         if not self.current_user:
@@ -326,7 +621,7 @@ class UserManager:
             return False, "没有来自该用户的好友请求"
         
         current_data['friend_requests'].remove(requester_username)
-        self.save_data()
+        self.save_data(self.current_user)
         
         return True, f"已拒绝 {requester_username} 的好友请求"
     
@@ -348,11 +643,53 @@ class UserManager:
     
     # ==================== 好友交易系统 ====================
     
+    def get_public_key(self, username: str):
+        """
+        获取用户已解析的公钥对象（按用户缓存，PEM 变化时重新解析）
+        """
+        user_data = self.users.get(username)
+        if not user_data or not user_data.get('public_key'):
+            self._public_key_cache.pop(username, None)
+            return None
+
+        public_key_pem = user_data['public_key']
+        cached = self._public_key_cache.get(username)
+        if cached and cached[0] == public_key_pem:
+            return cached[1]
+
+        public_key = serialization.load_pem_public_key(
+            public_key_pem.encode('utf-8'),
+            backend=default_backend()
+        )
+        self._public_key_cache[username] = (public_key_pem, public_key)
+        return public_key
+
+    @_shared_write
     def create_trade_request(self, friend_username: str, weapon_id: int, price_eth: float) -> Tuple[bool, str]:
         """
         创建好友交易请求
         使用 RSA 加密交易信息确保安全
         """
+        success, message = self._add_trade_request(friend_username, weapon_id, price_eth)
+        if success:
+            self.save_data(friend_username)
+        return success, message
+
+    @_shared_write
+    def create_trade_requests(self, trades: List[Tuple[str, int, float]]) -> List[Tuple[bool, str]]:
+        """
+        批量创建交易请求，trades 为 [(好友用户名, 武器ID, 价格ETH), ...]
+        复用已解析的公钥，全部处理完后只写一次盘
+        返回: 与 trades 一一对应的 (成功, 消息)
+        """
+        results = [self._add_trade_request(*trade) for trade in trades]
+        changed = [trade[0] for trade, (success, _) in zip(trades, results) if success]
+        if changed:
+            self.save_data(*changed)
+        return results
+
+    def _add_trade_request(self, friend_username: str, weapon_id: int, price_eth: float) -> Tuple[bool, str]:
+        """把一条交易请求加入好友的列表（不写盘）"""
         if not self.current_user:
             return False, "请先登录"
         
@@ -380,21 +717,13 @@ class UserManager:
         
         # 使用好友的公钥加密交易信息（这里简化处理，实际可以加密敏感信息）
         try:
-            # 获取好友公钥
-            public_key_pem = friend_data['public_key']
-            public_key = serialization.load_pem_public_key(
-                public_key_pem.encode('utf-8'),
-                backend=default_backend()
-            )
+            # 获取好友公钥（已解析的对象会被缓存）
+            public_key = self.get_public_key(friend_username)
             
             # 加密交易数据（这里加密交易ID作为示例）
             trade_signature = public_key.encrypt(
                 trade_request['trade_id'].encode('utf-8'),
-                padding.OAEP(
-                    mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                    algorithm=hashes.SHA256(),
-                    label=None
-                )
+                _TRADE_OAEP_PADDING
             )
             
             trade_request['encrypted_signature'] = trade_signature.hex()
@@ -408,7 +737,6 @@ class UserManager:
             friend_data['trade_requests'] = []
         
         friend_data['trade_requests'].append(trade_request)
-        self.save_data()
         
         return True, f"已向 {friend_username} 发送交易请求"
     
@@ -421,6 +749,7 @@ class UserManager:
         return current_data.get('trade_requests', [])
     
 
+    @_shared_write
     def accept_trade_request(self, trade_id: str) -> Tuple[bool, str]:
         """接受交易请求（不再处理本地武器转移，由区块链处理）"""
         if not self.current_user:
@@ -479,9 +808,10 @@ class UserManager:
                 'type': 'sent'
             })
 
-        self.save_data()
+        self.save_data(to_user, from_user)
         return True, "交易请求已接受，NFT 所有权已在区块链上转移"
 
+    @_shared_write
     def reject_trade_request(self, trade_id: str) -> Tuple[bool, str]:
         """拒绝交易请求"""
         if not self.current_user:
@@ -494,7 +824,7 @@ class UserManager:
         for i, req in enumerate(trade_requests):
             if req.get('trade_id') == trade_id:
                 trade_requests.pop(i)
-                self.save_data()
+                self.save_data(self.current_user)
                 return True, "交易请求已拒绝"
 
         return False, "找不到交易请求"
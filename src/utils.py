@@ -3,10 +3,10 @@
 工具函数
 """
 import pygame
-from .config import FONT_CANDIDATES
+from .font_resolver import FontResolver
 
-# 字体缓存，避免重复加载和打印
-_font_cache = {}
+# 字体解析器：字体文件路径缓存到磁盘，Font 对象按字号缓存
+_font_resolver = FontResolver()
 
 
 def load_chinese_font(size: int):
@@ -19,70 +19,11 @@ def load_chinese_font(size: int):
     Returns:
         pygame.font.Font: 字体对象
     """
-    # 检查缓存
-    if size in _font_cache:
-        return _font_cache[size]
-
-    available = set(pygame.font.get_fonts())  # 全部小写
-    # 允许使用本地 assets 字体文件（若用户自行放置）
-    custom_paths = [
-        f"assets/fonts/SimHei.ttf",
-        f"assets/fonts/simhei.ttf",
-        f"assets/fonts/NotoSansSC-Regular.otf",
-        f"assets/fonts/NotoSansSC-Regular.ttf",
-    ]
-    for p in custom_paths:
-        try:
-            font = pygame.font.Font(p, size)
-            _font_cache[size] = font
-            return font
-        except Exception:
-            pass
-    for name in FONT_CANDIDATES:
-        key = name.lower().replace(" ", "")
-        # pygame.font.get_fonts() 去掉空格，只保留字母数字；简化匹配
-        # 这里做宽松包含匹配
-        if any(key in f for f in available):
-            try:
-                fnt = pygame.font.SysFont(name, size)
-                # 简单测试中文是否宽度正常（>0 且不是仅方块宽度异常）
-                test_surface = fnt.render("测试中文", True, (0, 0, 0))
-                if test_surface.get_width() > 0:
-                    print(f"✅ 使用中文字体: {name} (size={size})")
-                    _font_cache[size] = fnt
-                    return fnt
-            except Exception:
-                continue
-    print(f"⚠️ 未找到合适中文字体，回退默认字体 size={size}. 建议安装：fonts-wqy-microhei 或 fonts-noto-cjk")
-    font = pygame.font.Font(None, size)
-    _font_cache[size] = font
-    return font
+    return _font_resolver.font('chinese', size)
 
 def load_emoji_font(size):
-    """加载支持Emoji的字体"""
-    # 尝试多个可能的emoji字体
-    emoji_fonts = [
-        'NotoColorEmoji',
-        'Noto Color Emoji',
-        'Segoe UI Emoji',
-        'Apple Color Emoji',
-        'Android Emoji',
-        'EmojiOne Color',
-    ]
-
-    for font_name in emoji_fonts:
-        try:
-            font = pygame.font.SysFont(font_name, size)
-            # 测试是否能渲染emoji
-            test_surf = font.render("😀", True, (0, 0, 0))
-            if test_surf and test_surf.get_width() > 0:
-                print(f"✅ 使用Emoji字体: {font_name} (size={size})")
-                return font
-        except:
-            continue
-
-    print(f"⚠️ 未找到Emoji字体，将使用文本代替Emoji (size={size})")
-    return None
+    """加载支持Emoji的字体，没有可用字体时返回 None"""
+    return _font_resolver.font('emoji', size)
 
 def render_text_with_emoji(font, emoji_font, text, color, antialias=True):
     """
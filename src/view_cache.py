@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+合约只读调用缓存 - 同一区块内相同的 view 调用只发一次 RPC
+"""
+import threading
+from web3 import Web3
+
+# 事件 -> 受影响的 view 函数（同一区块内收到这些事件时提前失效）
+EVENT_INVALIDATES = {
+    "WeedCut": ("getPlayerStats", "getPlayerRank", "getLeaderboard", "scores", "coins", "players", "hasPlayed"),
+    "PlayerNameSet": ("playerNames", "getLeaderboard", "getPlayerRank", "players", "hasPlayed"),
+    "WeaponMinted": ("getUserWeapons", "getUserWeaponsPage", "getUserWeaponCount", "getUserWeaponIdAt",
+                     "getNextWeaponId", "balanceOf"),
+    "WeaponListed": ("getWeaponsForSale", "getWeaponsForSalePage", "getWeaponDetails", "getWeaponDetailsBatch",
+                     "getUserWeaponsPage", "weapons"),
+    "WeaponSold": ("getWeaponsForSale", "getWeaponsForSalePage", "getWeaponDetails", "getWeaponDetailsBatch",
+                   "getUserWeapons", "getUserWeaponsPage", "getUserWeaponCount", "getUserWeaponIdAt",
+                   "weapons", "balanceOf", "ownerOf"),
+    "Transfer": ("getUserWeapons", "getUserWeaponsPage", "getUserWeaponCount", "getUserWeaponIdAt",
+                 "getWeaponDetails", "getWeaponDetailsBatch", "weapons", "balanceOf", "ownerOf"),
+    "CaseOpened": ("getPlayerStats", "coins", "getUserCaseInventory", "getAllUserCaseInventory", "userCaseInventory"),
+    "CasePurchased": ("getPlayerStats", "coins", "getUserCaseInventory", "getAllUserCaseInventory",
+                      "userCaseInventory"),
+    "CaseCreated": ("getNextCaseId", "getCaseDetails", "getCaseWeaponConfigCount", "getCaseWeaponConfigIdAt", "cases"),
+    "TradeOfferCreated": ("getTradeOffer", "getUserActiveOffers", "getUserReceivedActiveOffers", "tradeOffers"),
+    "TradeOfferAccepted": ("getTradeOffer", "getUserActiveOffers", "getUserReceivedActiveOffers", "tradeOffers"),
+    "TradeOfferCancelled": ("getTradeOffer", "getUserActiveOffers", "getUserReceivedActiveOffers", "tradeOffers"),
+}
+
+
+def _freeze(value):
+    """把参数转换为可哈希的缓存键"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, str):
+        return value.lower()
+    return value
+
+
+def event_topics(abi) -> dict:
+    """ABI 中事件签名哈希 (topic0) -> 事件名"""
+    topics = {}
+    for entry in abi or []:
+        if entry.get('type') != 'event':
+            continue
+        signature = f"{entry['name']}({','.join(i['type'] for i in entry.get('inputs', []))})"
+        topics[Web3.keccak(text=signature).hex().lower()] = entry['name']
+    return topics
+
+
+class ViewCache:
+    """
+    按 (函数名, 参数, 区块号) 缓存 view 调用结果
+    区块前进时整体失效；收到相关事件时按 EVENT_INVALIDATES 提前失效对应函数
+    """
+
+    def __init__(self):
+        self.block = None  # 当前已知的最新区块，None 表示未知（不缓存）
+        self._entries = {}  # (函数名, 参数) -> 结果
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def advance(self, block_number, rewind=False):
+        """
+        最新区块前进时清空缓存，返回区块是否变化
+        rewind=True 时也接受更小的区块号（节点重启或链重置）
+        """
+        with self._lock:
+            if block_number is None or block_number == self.block:
+                return False
+            if self.block is not None and block_number < self.block and not rewind:
+                return False
+            self.block = block_number
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            return True
+
+    def invalidate(self, function_names=None):
+        """失效指定函数（None 表示全部）的缓存"""
+        with self._lock:
+            if function_names is None:
+                self._entries.clear()
+            else:
+                names = set(function_names)
+                self._entries = {k: v for k, v in self._entries.items() if k[0] not in names}
+            self.invalidations += 1
+
+    def invalidate_event(self, event_name):
+        """按事件名失效相关的 view 函数"""
+        if event_name in EVENT_INVALIDATES:
+            self.invalidate(EVENT_INVALIDATES[event_name])
+
+    def call(self, function_name, args, loader):
+        """
+        读取缓存，未命中时调用 loader(block) 并写入
+        loader 收到当前区块号，用于把 eth_call 固定在该区块上
+        """
+        with self._lock:
+            block = self.block
+            if block is None:
+                self.misses += 1
+                cacheable = False
+            else:
+                key = (function_name, _freeze(args))
+                if key in self._entries:
+                    self.hits += 1
+                    return self._entries[key]
+                self.misses += 1
+                cacheable = True
+        value = loader(block)
+        if cacheable:
+            with self._lock:
+                if self.block == block:  # 加载期间区块没有前进才写入
+                    self._entries[key] = value
+        return value
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self._entries),
+            'invalidations': self.invalidations,
+            'block': self.block,
+        }
+
+
+class _CachedFunction:
+    """包装 contract.functions.X(...)：call() 走缓存，其他方法（build_transaction 等）原样转发"""
+
+    def __init__(self, function, name, args, cache):
+        self._function = function
+        self._name = name
+        self._args = args
+        self._cache = cache
+
+    def call(self, transaction=None, block_identifier=None, **kwargs):
+        if transaction is not None or block_identifier is not None or kwargs:
+            return self._function.call(transaction, block_identifier or 'latest', **kwargs)
+        return self._cache.call(
+            self._name,
+            self._args,
+            lambda block: self._function.call(block_identifier=block if block is not None else 'latest')
+        )
+
+    def __getattr__(self, item):
+        return getattr(self._function, item)
+
+
+class _CachedFunctions:
+    def __init__(self, functions, cache):
+        self._functions = functions
+        self._cache = cache
+
+    def __getattr__(self, name):
+        factory = getattr(self._functions, name)
+
+        def build(*args, **kwargs):
+            return _CachedFunction(factory(*args, **kwargs), name, (args, tuple(sorted(kwargs.items()))), self._cache)
+        return build
+
+
+class CachedContract:
+    """透明包装 web3 合约对象，只有 functions.X(...).call() 经过 ViewCache"""
+
+    def __init__(self, contract, cache):
+        self._contract = contract
+        self.functions = _CachedFunctions(contract.functions, cache)
+
+    def __getattr__(self, item):
+        return getattr(self._contract, item)
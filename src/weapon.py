@@ -3,19 +3,73 @@
 武器相关逻辑
 """
 import os
+import functools
 import pygame
 import random
 from .enums import Rarity, WeaponType
 from .config import BASE_DIR
 
 
+# 武器名称到类型的映射（来自智能合约配置）
+_WEAPON_TYPE_BY_NAME = {
+    # 刀类
+    "starter knife": WeaponType.KNIFE,
+    "sharp knife": WeaponType.KNIFE,
+    "epic knife": WeaponType.KNIFE,
+    "legendary knife": WeaponType.KNIFE,
+    "starter cutter": WeaponType.KNIFE,
+
+    # 剑类
+    "basic sword": WeaponType.SWORD,
+    "golden blade": WeaponType.SWORD,
+    "epic sword": WeaponType.SWORD,
+    "legendary blade": WeaponType.SWORD,
+
+    # 斧头类
+    "basic axe": WeaponType.AXE,
+    "battle axe": WeaponType.AXE,
+    "epic axe": WeaponType.AXE,
+    "legendary axe": WeaponType.AXE,
+
+    # 镰刀类
+    "basic sickle": WeaponType.SICKLE,
+    "steel sickle": WeaponType.SICKLE,
+    "epic scythe": WeaponType.SICKLE,
+    "legendary scythe": WeaponType.SICKLE,
+    "sharp sickle": WeaponType.SICKLE,
+}
+
+
+@functools.lru_cache(maxsize=1024)
+def classify_weapon_type(weapon_name: str) -> WeaponType:
+    """检测武器类型（从名称推断），同名结果会被缓存"""
+    name = (weapon_name or "").lower()
+
+    # 先尝试精确匹配
+    if name in _WEAPON_TYPE_BY_NAME:
+        return _WEAPON_TYPE_BY_NAME[name]
+
+    # 如果没有精确匹配，使用关键词判断
+    if "axe" in name or "斧" in name:
+        return WeaponType.AXE
+    if "sickle" in name or "scythe" in name or "镰" in name:
+        return WeaponType.SICKLE
+    if "sword" in name or "blade" in name or "剑" in name:
+        return WeaponType.SWORD
+    if "knife" in name or "cutter" in name or "刀" in name:
+        return WeaponType.KNIFE
+
+    # 默认返回刀
+    return WeaponType.KNIFE
+
+
 class WeaponManager:
     """武器管理器"""
     
     def __init__(self):
-        self.weapon_sprite_cache = {}  # (type, level) -> surface (基础贴图缓存)
-        self.weapon_with_wear_cache = {}  # (type, level, wear_int) -> surface (带磨损贴图缓存)
-        self.weapon_anchor_cache = {}  # (type, rarity) -> (handle_x, handle_y)
+        self.weapon_sprite_cache = {}  # (WeaponType, level) -> surface (基础贴图缓存)
+        self.weapon_with_wear_cache = {}  # (WeaponType, level, wear_int) -> surface (带磨损贴图缓存)
+        self.weapon_anchor_cache = {}  # (WeaponType, level) -> (handle_x, handle_y)
     
     @staticmethod
     def roll_weapon_rarity() -> Rarity:
@@ -81,55 +135,9 @@ class WeaponManager:
         }
         return damage_multipliers[rarity]
 
-    def detect_weapon_type(self, weapon_name: str) -> str:
+    def detect_weapon_type(self, weapon_name: str) -> WeaponType:
         """检测武器类型（从名称推断）"""
-        name = (weapon_name or "").lower()
-
-        # 武器名称到类型的映射（来自智能合约配置）
-        weapon_type_map = {
-            # 刀类
-            "starter knife": "刀",
-            "sharp knife": "刀",
-            "epic knife": "刀",
-            "legendary knife": "刀",
-            "starter cutter": "刀",
-
-            # 剑类
-            "basic sword": "剑",
-            "golden blade": "剑",
-            "epic sword": "剑",
-            "legendary blade": "剑",
-
-            # 斧头类
-            "basic axe": "斧头",
-            "battle axe": "斧头",
-            "epic axe": "斧头",
-            "legendary axe": "斧头",
-
-            # 镰刀类
-            "basic sickle": "镰刀",
-            "steel sickle": "镰刀",
-            "epic scythe": "镰刀",
-            "legendary scythe": "镰刀",
-            "sharp sickle": "镰刀",
-        }
-
-        # 先尝试精确匹配
-        if name in weapon_type_map:
-            return weapon_type_map[name]
-
-        # 如果没有精确匹配，使用关键词判断
-        if "axe" in name or "斧" in name:
-            return "斧头"
-        if "sickle" in name or "scythe" in name or "镰" in name:
-            return "镰刀"
-        if "sword" in name or "blade" in name or "剑" in name:
-            return "剑"
-        if "knife" in name or "cutter" in name or "刀" in name:
-            return "刀"
-
-        # 默认返回刀
-        return "刀"
+        return classify_weapon_type(weapon_name)
     
     def get_weapon_display_name(self, weapon_name: str, rarity: Rarity) -> str:
         """
@@ -143,15 +151,18 @@ class WeaponManager:
         if not weapon:
             return None
 
-        wtype = self.detect_weapon_type(weapon.get('original_name') or weapon.get('name'))
-        level = weapon['rarity'].value + 1  # 1~4 级对应 COMMON~LEGENDARY
         wear = weapon.get('wear', 0)
-
-        # 将wear转换为整数用于缓存key（保留4位小数精度）
-        wear_int = int(wear * 10000) if wear else 0
+        # 解码时已预先算好 (类型, 等级, 磨损) 缓存键；本地存储的旧字典则现场计算
+        cache_key = weapon.get('sprite_key')
+        if cache_key is None:
+            wtype = self.detect_weapon_type(weapon.get('original_name') or weapon.get('name'))
+            level = weapon['rarity'].value + 1  # 1~4 级对应 COMMON~LEGENDARY
+            # 将wear转换为整数用于缓存key（保留4位小数精度）
+            wear_int = int(wear * 10000) if wear else 0
+            cache_key = (wtype, level, wear_int)
+        wtype, level, _ = cache_key
 
         # 检查带磨损度的缓存
-        cache_key = (wtype, level, wear_int)
         if cache_key in self.weapon_with_wear_cache:
             return self.weapon_with_wear_cache[cache_key].copy()
 
@@ -159,7 +170,7 @@ class WeaponManager:
         base_key = (wtype, level)
         if base_key not in self.weapon_sprite_cache:
             filename = f"{level}级.png"
-            sprite_path = os.path.join(BASE_DIR, "武器图片", wtype, filename)
+            sprite_path = os.path.join(BASE_DIR, "武器图片", wtype.value, filename)
             if not os.path.exists(sprite_path):
                 return None
             try:
@@ -251,7 +262,7 @@ class WeaponManager:
         """获取武器手柄锚点位置"""
         if not weapon or not sprite:
             return None
-        wtype = self.detect_weapon_type(weapon.get('original_name') or weapon.get('name'))
+        wtype = weapon.get('weapon_type') or self.detect_weapon_type(weapon.get('original_name') or weapon.get('name'))
         level = weapon['rarity'].value + 1
         key = (wtype, level)
         if key in self.weapon_anchor_cache:
@@ -260,13 +271,13 @@ class WeaponManager:
         
         # 根据武器类型设置手柄锚点位置（修正后）
         # 刀：手柄在左下角（原本刃在右上角，所以手柄在对角）
-        if wtype == "刀":
+        if wtype is WeaponType.KNIFE:
             anchor = (width * 0.15, height * 0.85)
         # 剑和斧头：手柄在右上角（原本刃在左下角，所以手柄在对角）
-        elif wtype in ["剑", "斧头"]:
+        elif wtype in (WeaponType.SWORD, WeaponType.AXE):
             anchor = (width * 0.85, height * 0.15)
         # 镰刀：手柄在左上角（原本刃在右下角，所以手柄在对角）
-        elif wtype == "镰刀":
+        elif wtype is WeaponType.SICKLE:
             anchor = (width * 0.15, height * 0.15)
         # 默认：中心偏上
         else:
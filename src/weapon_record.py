@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+武器记录 - 合约 getWeaponDetails 返回值的统一解码
+"""
+from web3 import Web3
+from .enums import Rarity, Condition
+from .weapon import classify_weapon_type
+
+
+class Weapon:
+    """
+    不可变的武器记录（__slots__），类型、贴图键、ETH 价格等派生字段在解码时计算一次
+    兼容旧的字典写法：weapon['name'] / weapon.get('wear')
+    """
+
+    __slots__ = (
+        'id', 'name', 'original_name', 'rarity', 'damage_multiplier', 'owner',
+        'price', 'for_sale', 'wear', 'condition',
+        'weapon_type', 'sprite_key', 'price_eth',
+    )
+
+    def __init__(self, id, name, original_name, rarity, damage_multiplier, owner,
+                 price, for_sale, wear=None, condition=None):
+        weapon_type = classify_weapon_type(original_name or name)
+        wear_int = int(wear * 10000) if wear else 0  # 保留4位小数精度
+        values = {
+            'id': id,
+            'name': name,
+            'original_name': original_name,
+            'rarity': rarity,
+            'damage_multiplier': damage_multiplier,
+            'owner': owner,
+            'price': price,
+            'for_sale': for_sale,
+            'wear': wear,
+            'condition': condition,
+            'weapon_type': weapon_type,
+            'sprite_key': (weapon_type, rarity.value + 1, wear_int),  # (类型, 等级, 磨损)
+            'price_eth': Web3.from_wei(price, 'ether'),
+        }
+        for key, value in values.items():
+            object.__setattr__(self, key, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Weapon 记录不可修改，请使用 replace()")
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def replace(self, **changes) -> "Weapon":
+        """返回修改了部分字段的新记录"""
+        fields = {key: getattr(self, key) for key in self.__slots__[:10]}
+        fields.update(changes)
+        return Weapon(**fields)
+
+    def __repr__(self):
+        return f"Weapon(id={self.id}, name={self.name!r}, rarity={self.rarity.name}, price={self.price})"
+
+
+def decode_weapon(raw, display_name_func=None) -> Weapon:
+    """
+    解码 getWeaponDetails / getWeaponsForSale 的元组
+    (id, name, rarity, damageMultiplier, owner, price, forSale[, wear[, condition]])
+    """
+    rarity = Rarity(raw[2])
+    original_name = raw[1]
+    name = display_name_func(original_name, rarity) if display_name_func else original_name
+
+    # 旧版合约没有磨损度和品相字段
+    wear = raw[7] / 1e10 if len(raw) > 7 and isinstance(raw[7], int) else None  # 转换为0-1的浮点数
+    condition = None
+    if len(raw) > 8:
+        try:
+            condition = Condition(raw[8])
+        except ValueError:
+            pass
+
+    return Weapon(
+        id=raw[0],
+        name=name,
+        original_name=original_name,
+        rarity=rarity,
+        damage_multiplier=raw[3] / 100.0,
+        owner=raw[4],
+        price=raw[5],
+        for_sale=raw[6],
+        wear=wear,
+        condition=condition,
+    )